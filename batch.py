@@ -0,0 +1,168 @@
+from multiprocessing.connection import wait
+from pathlib import Path
+import glob
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from bench import PHASES, run_file
+
+# Statuses of the results that resume does not solve again
+FINAL_STATUSES = ("ok", "invalid", "no_path")
+
+# Maze files of a glob pattern
+def get_maze_files(pattern):
+    """
+    Return sorted list of the files matching glob 'pattern' ("**" allowed),
+    relative to this folder unless absolute
+    """
+    return sorted(Path(path) for path in glob.glob(str(Path(__file__).parent/pattern), recursive=True))
+
+# Results already in a JSONL file
+def read_results(path):
+    """
+    Return dictionary of the last result of every maze file in JSONL file
+    'path' (empty if there is no such file). Lines cut short by an
+    interrupted run are skipped.
+    """
+    results = {}
+    if not Path(path).exists(): return results
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[result["file"]] = result
+    return results
+
+# Solve one maze in a worker process
+def solve_job(connection, path, options):
+    """
+    Send the result of run_file('path', **'options') through 'connection'
+    """
+    try:
+        result = run_file(path, **options)
+    except Exception as error:
+        result = {"status": "error", "error": f"{type(error).__name__}: {error}"}
+    connection.send(result)
+    connection.close()
+
+# One JSON line per result
+def get_record(path, result, runtime):
+    """
+    Return the line dictionary of maze file 'path': its file, status,
+    path, optimal value, phase times and wall-clock 'runtime' of the job
+    """
+    record = {"file": str(path), "status": result["status"]}
+    found = re.search(r"Size(\d+)[/\\]sample(\d+)\.json$", str(path))
+    if found: record["size"], record["sample"] = int(found.group(1)), int(found.group(2))
+    record["path"] = result.get("points")
+    record["optimal_value"] = result.get("cost")
+    for key in [f"{phase}_s" for phase in PHASES] + ["total_s", "expanded", "graph_nodes", "graph_edges", "error"]:
+        if key in result: record[key] = result[key]
+    record["runtime"] = runtime
+    return record
+
+# Solve many mazes in parallel
+def solve_batch(pattern="Samples/Size*/sample*.json", output=None, workers=None, timeout=None, resume="no", model=2, engine="graph", search="dijkstra", reach_mode="sweep", use_cache="no"):
+    """
+    Solve every maze file matching glob 'pattern' (see get_maze_files) with
+    run_file, 'workers' at a time (os.cpu_count() if None), each in its own
+    process so that it is killed after 'timeout' seconds (no limit if
+    None). As each job finishes, write one JSON line (see get_record;
+    status "ok", "invalid", "no_path", "timeout" or "error") to file
+    'output', or to stdout if None. If 'resume' = "yes", append to
+    'output' and skip the files whose result there has a status of
+    FINAL_STATUSES (timeouts and errors are solved again). Return the list
+    of the new results, in order of completion.
+    """
+    files = get_maze_files(pattern)
+    if resume == "yes" and output is not None:
+        done = {file for file, result in read_results(output).items() if result["status"] in FINAL_STATUSES}
+        files = [path for path in files if str(path) not in done]
+    if workers is None: workers = os.cpu_count() or 1
+    options = {
+        "model": model, "engine": engine, "search": search,
+        "reach_mode": reach_mode, "use_cache": use_cache, "trace_memory": "no",
+    }
+
+    out = sys.stdout
+    if output is not None:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        out = open(output, "a" if resume == "yes" else "w")
+    records = []
+    # Running jobs: receiving end of their pipe -> (process, file, start)
+    running = {}
+    try:
+        pending = list(reversed(files))
+        while pending or running:
+            while pending and len(running) < workers:
+                path = pending.pop()
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=solve_job, args=(sender, path, options), daemon=True)
+                process.start()
+                sender.close()
+                running[receiver] = (process, path, time.perf_counter())
+
+            # Wait for a job to finish, or for the first deadline
+            wait_time = None
+            if timeout is not None:
+                first_start = min(start for _, _, start in running.values())
+                wait_time = max(0.0, first_start + timeout - time.perf_counter())
+            ready = wait(list(running), wait_time)
+
+            finished = []
+            for receiver in ready:
+                process, path, start = running[receiver]
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    process.join()
+                    result = {"status": "error", "error": f"Worker exited with code {process.exitcode}"}
+                finished.append((receiver, get_record(path, result, time.perf_counter() - start)))
+            if timeout is not None:
+                for receiver, (process, path, start) in running.items():
+                    if receiver not in ready and time.perf_counter() - start >= timeout:
+                        process.kill()
+                        finished.append((receiver, get_record(path, {"status": "timeout"}, time.perf_counter() - start)))
+
+            for receiver, record in finished:
+                process = running.pop(receiver)[0]
+                process.join()
+                receiver.close()
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                records.append(record)
+    finally:
+        for receiver, (process, _, _) in running.items():
+            process.kill()
+            process.join()
+            receiver.close()
+        if out is not sys.stdout: out.close()
+    return records
+
+# Proposed solutions from batch results
+def write_path_info(results_path, folder=None):
+    """
+    Write the result of every sample (Samples/SizeN/sampleK.json) of JSONL
+    file 'results_path' to 'folder'/SizeN/sampleK.txt
+    (Proposed_solutions/Path_info if None), in its format: path, optimal
+    value and runtime, or "Invalid" if there is no path.
+    Timeouts and errors are skipped. Return the number of files written.
+    """
+    if folder is None: folder = Path(__file__).parent/"Proposed_solutions"/"Path_info"
+    written = 0
+    for result in read_results(results_path).values():
+        if "size" not in result or result["status"] not in FINAL_STATUSES: continue
+        path = Path(folder)/f"Size{result['size']}"/f"sample{result['sample']}.txt"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if result["status"] == "ok":
+            text = f"Optimal path: {result['path']}\nOptimal value: {result['optimal_value']}\nruntime: {result['runtime']}\n"
+        else:
+            text = "Invalid"
+        path.write_text(text)
+        written += 1
+    return written
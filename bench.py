@@ -0,0 +1,217 @@
+from pathlib import Path
+import csv
+import json
+import re
+import time
+import tracemalloc
+from cache import default_cache
+from maze import MazeGrid
+
+# Phases timed for every sample, in order
+PHASES = ("load", "redundant", "reach", "graph", "search")
+
+# Sample files, by size then index
+def get_sample_paths(sizes=None):
+    """
+    Return list of (size, index, path) of every Samples/Size*/sample*.json,
+    only the sizes in 'sizes' if given
+    """
+    samples = []
+    for path in (Path(__file__).parent/"Samples").glob("Size*/sample*.json"):
+        size, index = int(path.parent.name[4:]), int(path.stem[6:])
+        if sizes is None or size in sizes: samples.append((size, index, path))
+    return sorted(samples)
+
+# Optimal value of the proposed solution of a sample
+def get_golden_value(size, index):
+    """
+    Return the optimal value in Proposed_solutions/Path_info of sample
+    'index' of size 'size', None if it is marked "Invalid" (no valid path).
+    Raise FileNotFoundError if there is no such file.
+    """
+    path = Path(__file__).parent/"Proposed_solutions"/"Path_info"/f"Size{size}"/f"sample{index}.txt"
+    text = path.read_text()
+    found = re.search(r"Optimal value:?\s*([-+0-9.eE]+)", text)
+    return float(found.group(1)) if found else None
+
+# Compare a cost with the proposed solution
+def check_golden(cost, golden, tolerance=1e-4):
+    """
+    Return "match" if 'cost' equals 'golden' (both None: no path), else
+    "improved" if it is lower or finds a path the golden one did not,
+    else "regression". Golden values are printed with 5 decimals, hence
+    'tolerance'.
+    """
+    if cost is None and golden is None: return "match"
+    if cost is None: return "regression"
+    if golden is None: return "improved"
+    if abs(cost - golden) <= tolerance: return "match"
+    return "improved" if cost < golden else "regression"
+
+# Solve one maze file phase by phase
+def run_file(path, model=2, engine="graph", search="dijkstra", reach_mode="sweep", use_cache="no", trace_memory="yes"):
+    """
+    Solve the maze of file 'path' with model 'model' (1 or 2), as
+    solve_with_first_model / solve_with_second_model do, timing each phase
+    of PHASES: loading the maze (MazeGrid), listing the free and redundant
+    points, computing nodes_info ('reach_mode', from scratch unless
+    'use_cache' = "yes"), building the graph (SlopeGraph or TurnGraph) and
+    searching it ('search'). 'engine' = "lazy" uses LazyGraph instead: its
+    reaches are computed while searching. Return dictionary of the phase
+    times, graph size, expanded states, peak traced memory ('trace_memory'
+    = "yes": tracemalloc, NumPy included, in a second untimed run so that
+    the times are not slowed by tracing), status ("ok", "invalid" or
+    "no_path"), cost and points of the path ("points", None if no path).
+    """
+    from fun_with_dijkstar import Constant, get_first_model_heuristic, get_nodes_info, is_empty_dict
+    from lazy import LazyGraph, find_lazy_path
+    from reach import get_all_slopes
+    from search import NoPathError, SlopeGraph, TurnGraph, find_graph_path, find_turn_path
+    if model not in (1, 2): raise ValueError(f"Unknown model: {model}")
+    if engine not in ("graph", "lazy"): raise ValueError(f"Unknown engine: {engine}")
+    if trace_memory == "yes":
+        result = run_file(path, model, engine, search, reach_mode, use_cache, "no")
+        tracemalloc.start()
+        try:
+            run_file(path, model, engine, search, reach_mode, use_cache, "no")
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+        return result
+
+    result = {"model": model, "engine": engine, "search": search}
+    times = dict.fromkeys(PHASES, 0.0)
+    stats = {}
+    status, cost, nums = "ok", None, None
+    enabled, default_cache.enabled = default_cache.enabled, use_cache == "yes"
+    try:
+        phase_start = time.perf_counter()
+        grid = MazeGrid.from_file(path)
+        times["load"] = time.perf_counter() - phase_start
+
+        phase_start = time.perf_counter()
+        grid.get_redundant_points()
+        grid.get_free_points()
+        invalid = grid.validate()
+        times["redundant"] = time.perf_counter() - phase_start
+        start, target = grid.start, grid.target
+        start_num = grid.col * (start[1] - 1) + start[0]
+        target_num = grid.col * (target[1] - 1) + target[0]
+
+        if invalid is not None:
+            status = "invalid"
+        elif engine == "lazy":
+            phase_start = time.perf_counter()
+            graph = LazyGraph(grid, "visibility" if reach_mode == "sweep" else reach_mode)
+            times["graph"] = time.perf_counter() - phase_start
+            phase_start = time.perf_counter()
+            try:
+                path_info = find_lazy_path(graph, start, target, Constant.acute, Constant.right_or_obtuse, model, stats, search)
+                cost, nums = path_info.total_cost, path_info.nodes
+            except NoPathError:
+                status = "no_path"
+            times["search"] = time.perf_counter() - phase_start
+        else:
+            phase_start = time.perf_counter()
+            nodes_info = get_nodes_info(grid, reach_mode)
+            times["reach"] = time.perf_counter() - phase_start
+
+            phase_start = time.perf_counter()
+            nodes_info = {key: info for key, info in nodes_info.items() if not is_empty_dict(info)}
+            slopes = get_all_slopes(grid.row, grid.col)
+            if model == 1:
+                graph = SlopeGraph.from_nodes_info(nodes_info, slopes, grid.row, grid.col, Constant.acute, Constant.right_or_obtuse)
+                result["graph_nodes"], result["graph_edges"] = len(graph), len(graph.indices)
+            else:
+                graph = TurnGraph.from_nodes_info(nodes_info, slopes, grid.row, grid.col)
+                # Nodes are points, edges are moves
+                result["graph_nodes"], result["graph_edges"] = len(nodes_info), len(graph)
+            times["graph"] = time.perf_counter() - phase_start
+
+            phase_start = time.perf_counter()
+            try:
+                if model == 1:
+                    heuristic = get_first_model_heuristic(graph, target) if search == "astar" else None
+                    path_info = find_graph_path(graph, graph.get_endpoints(start), graph.get_endpoints(target), heuristic, stats)
+                    nums = graph.get_points(path_info.nodes).tolist()
+                else:
+                    path_info = find_turn_path(graph, start_num, target_num, Constant.acute, Constant.right_or_obtuse, stats, search)
+                    nums = path_info.nodes
+                cost = path_info.total_cost
+            except NoPathError:
+                status = "no_path"
+            times["search"] = time.perf_counter() - phase_start
+    finally:
+        default_cache.enabled = enabled
+
+    for phase in PHASES:
+        result[f"{phase}_s"] = times[phase]
+    result["total_s"] = sum(times.values())
+    result["expanded"] = stats.get("expanded")
+    result["status"] = status
+    result["cost"] = cost
+    # Points of the path, without the repeated ones (turns)
+    points = None
+    if nums is not None:
+        points = []
+        for num in nums:
+            point = [(num - 1) % grid.col + 1, (num - 1) // grid.col + 1]
+            if not points or point != points[-1]: points.append(point)
+    result["points"] = points
+    return result
+
+# Solve one sample phase by phase
+def run_sample(size, index, model=2, engine="graph", search="dijkstra", reach_mode="sweep", use_cache="no", trace_memory="yes"):
+    """
+    Return the dictionary of run_file (without the points) for sample
+    'index' of size 'size', with the golden check against
+    Proposed_solutions/Path_info
+    """
+    path = Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json"
+    result = {"size": size, "sample": index}
+    result.update(run_file(path, model, engine, search, reach_mode, use_cache, trace_memory))
+    cost = result["cost"]
+    del result["points"]
+    try:
+        result["golden"] = get_golden_value(size, index)
+        result["check"] = check_golden(cost, result["golden"])
+    except FileNotFoundError:
+        result["golden"], result["check"] = None, "no_golden"
+    return result
+
+# Save benchmark results
+def save_results(results, path):
+    """
+    Write list of dictionaries 'results' to 'path', as CSV (one row per
+    result, columns in order of appearance) if it ends with .csv, else as JSON
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".csv":
+        fields = list(dict.fromkeys(key for result in results for key in result))
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(path, "w") as f:
+            json.dump(results, f, indent=1)
+
+# Benchmark a solver over the samples
+def run_benchmark(sizes=None, model=2, engine="graph", search="dijkstra", reach_mode="sweep", use_cache="no", trace_memory="yes", csv_path=None, json_path=None):
+    """
+    Run run_sample on every sample of Samples/ (only the sizes in 'sizes'
+    if given), print each result and save them all to 'csv_path' and/or
+    'json_path'. Print the regressions against Proposed_solutions/Path_info
+    at the end. Return the list of results.
+    """
+    results = []
+    for size, index, _ in get_sample_paths(sizes):
+        result = run_sample(size, index, model, engine, search, reach_mode, use_cache, trace_memory)
+        print(result)
+        results.append(result)
+    for path in (csv_path, json_path):
+        if path is not None: save_results(results, path)
+    regressions = [(result["size"], result["sample"]) for result in results if result["check"] == "regression"]
+    print(f"Regressions: {regressions if regressions else 'none'}")
+    return results
@@ -0,0 +1,105 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import pickle
+
+# Bump when any cached artifact changes meaning or layout, so that old
+# entries are never read again
+CACHE_VERSION = 1
+
+class ArtifactCache:
+    """
+    On-disk cache of maze preprocessing artifacts (redundant points,
+    nodes_info, unreachable nodes...). Entries are keyed by a hash of the
+    maze contents (edges, row, column) and CACHE_VERSION, so they stay valid
+    whatever the sample file is called, and are dropped least recently used
+    first once the cache grows over 'max_size' bytes.
+    """
+    def __init__(self, directory, max_size=2**30, enabled=True):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.enabled = enabled
+
+    def get_key(self, maze):
+        """
+        Return the hash of the parts of 'maze' (a sample dictionary) that
+        preprocessing depends on
+        """
+        contents = json.dumps(
+            [CACHE_VERSION, maze["row"], maze["column"], maze["edges"]], separators=(",", ":"),
+        )
+        return hashlib.sha256(contents.encode()).hexdigest()
+
+    def get_path(self, maze, name):
+        """
+        Return path of artifact 'name' of 'maze'
+        """
+        return self.directory/f"{self.get_key(maze)}_{name}.pkl"
+
+    def get(self, maze, name, compute):
+        """
+        Return artifact 'name' of 'maze', computed with 'compute()' and saved
+        if not cached yet
+        """
+        if not self.enabled: return compute()
+        path = self.get_path(maze, name)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            # Mark as recently used
+            os.utime(path)
+            return value
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+        value = compute()
+        self.store(path, value)
+        return value
+
+    def store(self, path, value):
+        """
+        Save 'value' at 'path', then evict old entries if needed
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so that readers never see a partial file
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits in 'max_size'
+        """
+        entries = []
+        for path in self.directory.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_size: break
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        Delete every entry
+        """
+        for path in self.directory.glob("*.pkl"):
+            path.unlink()
+
+# Cache used by the solvers; set 'enabled' to False to always recompute
+default_cache = ArtifactCache(Path(__file__).parent/".cache")
+
+def get_cached(maze, name, compute):
+    """
+    Return artifact 'name' of 'maze' from the default cache (see ArtifactCache.get)
+    """
+    return default_cache.get(maze, name, compute)
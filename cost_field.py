@@ -0,0 +1,98 @@
+from pathlib import Path
+import numpy as np
+from fun_with_dijkstar import Constant, coords_to_num, get_nodes_info, is_empty_dict, num_to_coords
+from maze import load_maze_grid
+from reach import get_all_slopes
+from search import PathInfo, TurnGraph, descend_turn_costs, find_turn_costs
+
+# Folder of the cost fields of a sample
+def get_field_path(size, index, target):
+    """
+    Return path of the folder holding the cost field to point 'target' of
+    sample 'index' of size 'size'
+    """
+    return Path(__file__).parent/"Cost_fields"/f"Size{size}"/f"sample{index}"/f"target_{target[0]}_{target[1]}"
+
+class CostField:
+    """
+    Cost of model 2 to point 'target' from every lattice point and every
+    heading of TurnGraph 'graph' (see find_turn_costs): 'move_costs' per
+    move of the graph (heading = the move that led to its head),
+    'point_costs' per point number (as coords_to_num) with no heading.
+    Saved as two .npy files. Any start is then answered by descent
+    (get_path), without another search.
+    """
+    def __init__(self, graph, target, move_costs, point_costs):
+        self.graph = graph
+        self.target = target
+        self.move_costs = move_costs
+        self.point_costs = point_costs
+
+    @classmethod
+    def from_grid(cls, grid, target=None, reach_mode="sweep", stats=None):
+        """
+        Build the cost field of MazeGrid 'grid' to 'target' (its own target
+        if None), from the graph of find_second_model_path
+        """
+        if target is None: target = grid.target
+        nodes_info = {key: info for key, info in get_nodes_info(grid, reach_mode).items() if not is_empty_dict(info)}
+        graph = TurnGraph.from_nodes_info(nodes_info, get_all_slopes(grid.row, grid.col), grid.row, grid.col)
+        move_costs, point_costs = find_turn_costs(
+            graph, coords_to_num(*target, grid.col), Constant.acute, Constant.right_or_obtuse, stats,
+        )
+        return cls(graph, target, move_costs, point_costs)
+
+    @classmethod
+    def from_sample(cls, size, index, target=None, reach_mode="sweep", stats=None):
+        """
+        Build the cost field of sample 'index' of size 'size' (see from_grid)
+        """
+        return cls.from_grid(load_maze_grid(size, index), target, reach_mode, stats)
+
+    @classmethod
+    def load(cls, size, index, target=None, graph=None, mmap_mode="r"):
+        """
+        Load the cost field to 'target' (the sample's if None) of sample
+        'index' of size 'size', memory-mapped with 'mmap_mode' (None to
+        read into memory). 'graph' is the TurnGraph it was built on,
+        rebuilt from the sample if None.
+        """
+        grid = load_maze_grid(size, index)
+        if target is None: target = grid.target
+        if graph is None:
+            nodes_info = {key: info for key, info in get_nodes_info(grid).items() if not is_empty_dict(info)}
+            graph = TurnGraph.from_nodes_info(nodes_info, get_all_slopes(size, size), size, size)
+        path = get_field_path(size, index, target)
+        move_costs = np.load(path/"move_costs.npy", mmap_mode=mmap_mode)
+        point_costs = np.load(path/"point_costs.npy", mmap_mode=mmap_mode)
+        if len(move_costs) != len(graph): raise ValueError(f"Cost field of {len(move_costs)} moves, graph of {len(graph)}")
+        return cls(graph, target, move_costs, point_costs)
+
+    def save(self, index):
+        """
+        Save as cost field of sample 'index'
+        """
+        path = get_field_path(self.graph.row, index, self.target)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path/"move_costs.npy", np.asarray(self.move_costs))
+        np.save(path/"point_costs.npy", np.asarray(self.point_costs))
+
+    def get_cost(self, start):
+        """
+        Return cost of the cheapest path from point 'start' [i, j] to the
+        target (inf if there is none)
+        """
+        return float(self.point_costs[coords_to_num(*start, self.graph.col)])
+
+    def get_path(self, start):
+        """
+        Return PathInfo of the cheapest path from point 'start' [i, j] to the
+        target, whose nodes are the points [i, j] of the path. Raise
+        NoPathError if there is none.
+        """
+        col = self.graph.col
+        path_info = descend_turn_costs(
+            self.graph, self.move_costs, self.point_costs, coords_to_num(*start, col),
+            coords_to_num(*self.target, col), Constant.acute, Constant.right_or_obtuse,
+        )
+        return PathInfo([num_to_coords(num, col) for num in path_info[0]], path_info[1], path_info[2], path_info[3])
@@ -0,0 +1,215 @@
+import math
+import numpy as np
+from cache import default_cache
+from fun_with_dijkstar import get_nodes_info
+from maze import MazeGrid
+from reach import get_all_slopes, get_wall_steps
+
+# Number of steps along ('a', 'b') that stay in the grid, element-wise
+def get_steps_inside(cols, rows, a, b, row, col):
+    """
+    Return the largest k such that point [cols, rows] + k*['a', 'b'] is in
+    the 'row'*'col' grid, element-wise
+    """
+    steps = np.full(len(cols), np.iinfo(np.int64).max)
+    steps = np.where(a > 0, np.minimum(steps, (col - cols) // np.maximum(a, 1)), steps)
+    steps = np.where(a < 0, np.minimum(steps, (cols - 1) // np.maximum(-a, 1)), steps)
+    steps = np.where(b > 0, np.minimum(steps, (row - rows) // np.maximum(b, 1)), steps)
+    steps = np.where(b < 0, np.minimum(steps, (rows - 1) // np.maximum(-b, 1)), steps)
+    return steps
+
+# Maximal wall-free runs of whole lattice lines, given the free steps
+def get_line_runs(free, line_starts):
+    """
+    Return (firsts, reaches) of the runs of the lines laid end to end in
+    'free': line k covers items line_starts[k] to line_starts[k + 1] - 1,
+    item t being the step from its t-th point to the next one (the last
+    item of a line, which has no step, must be False). A run begins at
+    item firsts[r] and takes reaches[r] steps.
+    """
+    previous_free = np.zeros(len(free), dtype=bool)
+    previous_free[1:] = free[:-1]
+    previous_free[line_starts[:-1]] = False
+    firsts = np.flatnonzero(free & ~previous_free)
+    blocked = np.flatnonzero(~free)
+    return firsts, blocked[np.searchsorted(blocked, firsts)] - firsts
+
+class DynamicMaze:
+    """
+    Maze whose walls are added or removed one at a time. nodes_info (see
+    get_nodes_info) and, if given, the unreachable_nodes dictionary (see
+    mohinh.get_unreachable_nodes) are patched in place: for every slope,
+    only the lattice lines with a step meeting the edited wall are looked
+    at again, and only the runs that changed are taken out and put back.
+    LazyGraphs given to attach forget the reaches of those lines; graphs
+    of nodes_info (TurnGraph, SlopeGraph) are rebuilt from it.
+    """
+    def __init__(self, grid, reach_mode="sweep", unreachable_nodes=None):
+        self.grid = MazeGrid(dict(grid.maze, edges=[[list(end) for end in edge] for edge in grid.maze["edges"]]))
+        self.slopes = get_all_slopes(self.grid.row, self.grid.col)
+        self.slopes_array = np.array(self.slopes, dtype=np.int64).reshape(-1, 2)
+        self.nodes_info = get_nodes_info(self.grid, reach_mode)
+        self.unreachable_nodes = unreachable_nodes
+        self.graphs = []
+
+    def attach(self, graph):
+        """
+        Keep LazyGraph 'graph' up to date with the edits
+        """
+        graph.update_walls(self.grid, (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)))
+        self.graphs.append(graph)
+
+    def add_wall(self, wall):
+        """
+        Add wall [[x1, y1], [x2, y2]]. Return the counters of edit.
+        """
+        wall = [list(end) for end in wall]
+        for end in wall:
+            if not self.grid.in_grid(end): raise ValueError(f"Wall {wall} is outside the grid")
+        if wall[0] == wall[1]: raise ValueError(f"Wall {wall} is a single point")
+        return self.edit(wall, self.grid.maze["edges"] + [wall])
+
+    def remove_wall(self, wall):
+        """
+        Remove wall [[x1, y1], [x2, y2]] (either way round). Return the
+        counters of edit.
+        """
+        wall = [list(end) for end in wall]
+        edges = self.grid.maze["edges"]
+        for position, edge in enumerate(edges):
+            if [list(end) for end in edge] in (wall, wall[::-1]):
+                return self.edit(wall, edges[:position] + edges[position + 1:])
+        raise ValueError(f"No wall {wall}")
+
+    def edit(self, wall, edges):
+        """
+        Replace the walls by 'edges', which differ from them by 'wall' only,
+        and patch nodes_info, unreachable_nodes and the attached graphs.
+        Return dictionary of the numbers of lines looked at, runs taken out
+        and put back, and points of the lines that changed.
+        """
+        old_grid = self.grid
+        new_grid = MazeGrid(dict(old_grid.maze, edges=edges))
+        row, col = new_grid.row, new_grid.col
+        nodes_info, unreachable_nodes = self.nodes_info, self.unreachable_nodes
+        # Points the wall goes through that get free or blocked
+        changed_points = np.argwhere(old_grid.blocked[1:, 1:] != new_grid.blocked[1:, 1:]) + 1
+        freed = [[i, j] for j, i in changed_points.tolist() if not new_grid.blocked[j, i]]
+        blocked = [[i, j] for j, i in changed_points.tolist() if new_grid.blocked[j, i]]
+        for i, j in freed:
+            nodes_info[f"{i}_{j}"] = {"begin": [], "middle": [], "end": [], "reach": []}
+            if unreachable_nodes is not None: unreachable_nodes[f"{i}_{j}"] = []
+
+        # Lattice lines with a step meeting the wall, laid end to end
+        slope_ids, cols, rows = get_wall_steps(self.slopes, row, col, wall)
+        a, b = self.slopes_array[slope_ids, 0], self.slopes_array[slope_ids, 1]
+        back = get_steps_inside(cols, rows, -a, -b, row, col)
+        line_keys = np.unique(slope_ids * (row * col + 1) + col * (rows - back * b - 1) + cols - back * a)
+        line_slopes, first_nums = np.divmod(line_keys, row * col + 1)
+        first_cols, first_rows = (first_nums - 1) % col + 1, (first_nums - 1) // col + 1
+        a, b = self.slopes_array[line_slopes, 0], self.slopes_array[line_slopes, 1]
+        counts = get_steps_inside(first_cols, first_rows, a, b, row, col) + 1
+        line_starts = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=line_starts[1:])
+        line_ids = np.repeat(np.arange(len(counts)), counts)
+        positions = np.arange(line_starts[-1]) - line_starts[line_ids]
+        item_slopes = line_slopes[line_ids]
+        point_cols = first_cols[line_ids] + positions * a[line_ids]
+        point_rows = first_rows[line_ids] + positions * b[line_ids]
+
+        # Free steps before and after, the last point of a line having none
+        has_step = np.ones(len(positions), dtype=bool)
+        has_step[line_starts[1:] - 1] = False
+        starts = np.stack([point_cols[has_step], point_rows[has_step]], axis=1)
+        ends = starts + self.slopes_array[item_slopes[has_step]]
+        old_free, new_free = np.zeros(len(positions), dtype=bool), np.zeros(len(positions), dtype=bool)
+        old_free[has_step] = ~old_grid.walls.intersects_batch(starts, ends)
+        new_free[has_step] = ~new_grid.walls.intersects_batch(starts, ends)
+        old_runs = set(zip(*(values.tolist() for values in get_line_runs(old_free, line_starts))))
+        new_runs = set(zip(*(values.tolist() for values in get_line_runs(new_free, line_starts))))
+        counters = {
+            "lines": len(counts), "removed_runs": len(old_runs - new_runs),
+            "added_runs": len(new_runs - old_runs), "points": 0,
+        }
+
+        # nodes_info: take out the old runs, put back the new ones
+        keys = [f"{i}_{j}" for i, j in zip(point_cols.tolist(), point_rows.tolist())]
+        for first, reach in old_runs - new_runs:
+            slope = self.slopes[item_slopes[first]]
+            info = nodes_info[keys[first]]
+            index = info["begin"].index(slope)
+            del info["begin"][index], info["reach"][index]
+            for item in range(first + 1, first + reach):
+                nodes_info[keys[item]]["middle"].remove(slope)
+            nodes_info[keys[first + reach]]["end"].remove(slope)
+        for first, reach in new_runs - old_runs:
+            slope = self.slopes[item_slopes[first]]
+            info = nodes_info[keys[first]]
+            info["begin"].append(slope)
+            info["reach"].append(reach)
+            for item in range(first + 1, first + reach):
+                nodes_info[keys[item]]["middle"].append(slope)
+            nodes_info[keys[first + reach]]["end"].append(slope)
+
+        # Lines whose points are split in other runs, or with a point that
+        # got free or blocked
+        def get_groups(free):
+            groups = np.cumsum(~free) - ~free
+            return groups - groups[line_starts[line_ids]]
+        new_groups = get_groups(new_free)
+        changed = np.zeros(len(counts), dtype=bool)
+        np.logical_or.at(changed, line_ids, get_groups(old_free) != new_groups)
+        for point in freed + blocked:
+            changed[line_ids[(point_cols == point[0]) & (point_rows == point[1])]] = True
+        items = np.flatnonzero(changed[line_ids])
+        counters["points"] = len(items)
+        changed_lines = (item_slopes[items], col * (point_rows[items] - 1) + point_cols[items])
+
+        # Unreachable nodes: points of different runs, per changed line
+        changed_slopes, added_points = {}, {}
+        if unreachable_nodes is not None:
+            free_items = items[~new_grid.blocked[point_rows[items], point_cols[items]]]
+            bounds = np.searchsorted(line_ids[free_items], np.arange(len(counts) + 1))
+            for line in np.flatnonzero(changed).tolist():
+                line_items = free_items[bounds[line]:bounds[line + 1]].tolist()
+                groups = new_groups[line_items].tolist()
+                slope_id = int(line_slopes[line])
+                for item, group in zip(line_items, groups):
+                    changed_slopes.setdefault(keys[item], set()).add(slope_id)
+                    added_points.setdefault(keys[item], []).extend(
+                        [int(point_cols[other]), int(point_rows[other])]
+                        for other, other_group in zip(line_items, groups) if other_group != group
+                    )
+
+        # Unreachable nodes: drop the points of the changed lines, then add
+        # the new ones. Two points are on one line only.
+        if unreachable_nodes is not None:
+            slope_table = {tuple(slope): slope_id for slope_id, slope in enumerate(self.slopes)}
+            for key, slope_ids in changed_slopes.items():
+                i, j = map(int, key.split("_"))
+                kept = []
+                for other in unreachable_nodes[key]:
+                    dx, dy = other[0] - i, other[1] - j
+                    divisor = math.gcd(dx, dy)
+                    dx, dy = dx // divisor, dy // divisor
+                    if dy < 0 or (dy == 0 and dx < 0): dx, dy = -dx, -dy
+                    if slope_table[(dx, dy)] not in slope_ids: kept.append(other)
+                unreachable_nodes[key] = kept + added_points[key]
+        for i, j in blocked:
+            del nodes_info[f"{i}_{j}"]
+            if unreachable_nodes is not None: unreachable_nodes.pop(f"{i}_{j}", None)
+
+        self.grid = new_grid
+        for graph in self.graphs:
+            graph.update_walls(new_grid, changed_lines)
+        return counters
+
+    def store_in_cache(self):
+        """
+        Save nodes_info (and unreachable_nodes, if any) in the default cache
+        as those of the current maze, so that solvers given self.grid do
+        not compute them again
+        """
+        default_cache.store(default_cache.get_path(self.grid.maze, "nodes_info"), self.nodes_info)
+        if self.unreachable_nodes is not None:
+            default_cache.store(default_cache.get_path(self.grid.maze, "unreachable_nodes"), self.unreachable_nodes)
@@ -0,0 +1,410 @@
+import heapq
+import math
+import time
+from pathlib import Path
+import numpy as np
+from reach import get_wall_steps
+from search import NoPathError, PathInfo, get_pseudo_angles
+from slopes import get_grid_slopes
+from walls import WallArray
+
+class OnlinePlanner:
+    """
+    D* Lite (Koenig and Likhachev) for model 2 on a 'row'*'col' grid whose
+    walls are only known in part, from point 'start' (where the mouse is,
+    see move) to point 'target': costs to the target are searched backward
+    and repaired, not searched again, when walls are revealed.
+    Points are numbered as coords_to_num, directions as in LazyGraph (2s
+    is slope s of get_grid_slopes, 2s + 1 its opposite). Node
+    num*block + k of point num is, for D directions:
+    - k < D: arrived along direction k (the states of find_turn_path),
+      with moves straight on and back (no turning cost);
+    - D <= k < 2D and 2D <= k < 3D: the suffix and prefix chains of the
+      turn gadget of SlopeGraph, over the directions ranked by angle in
+      each quadrant ('right_or_obtuse' turns: a suffix, a whole quadrant,
+      a prefix);
+    - k = 3D: hub, reached by any turn at cost 'acute', from which every
+      direction can be left (the start, where turning is free).
+    Node 0 is the goal, after every state arrived at 'target'. Steps
+    meeting a known wall are in blocked_steps, as num*D + direction.
+    """
+    def __init__(self, row, col, start, target, acute, right_or_obtuse):
+        self.row, self.col = row, col
+        self.slopes = np.array(get_grid_slopes(row, col), dtype=np.int64).reshape(-1, 2)
+        directions = np.stack([self.slopes, -self.slopes], axis=1).reshape(-1, 2)
+        num_directions = len(directions)
+        self.num_directions = num_directions
+        self.directions_x, self.directions_y = directions[:, 0].tolist(), directions[:, 1].tolist()
+        # Lengths rounded as get_Cartesian_length
+        self.lengths = np.repeat([round(math.sqrt(a*a + b*b), 5) for a, b in self.slopes.tolist()], 2).tolist()
+        self.steps = (col * directions[:, 1] + directions[:, 0]).tolist()
+        self.acute, self.right_or_obtuse = acute, right_or_obtuse
+
+        # Directions ranked by (quadrant, position), and the chain of every rank
+        quadrants, positions = get_pseudo_angles(directions)
+        ranked = np.lexsort((positions, quadrants))
+        quadrant_starts = np.searchsorted(quadrants[ranked], np.arange(5))
+        self.ranked = ranked.tolist()
+        self.rank_of = np.argsort(ranked).tolist()
+        self.chain_firsts = np.repeat(quadrant_starts[:-1], np.diff(quadrant_starts)).tolist()
+        self.chain_lasts = (np.repeat(quadrant_starts[1:], np.diff(quadrant_starts)) - 1).tolist()
+        self.quadrant_lasts = [int(end) - 1 for start, end in zip(quadrant_starts[:-1], quadrant_starts[1:]) if end > start]
+        # 'right_or_obtuse' turns from every direction u (the closed
+        # half-plane [u - 90, u + 90], see SlopeGraph.from_nodes_info):
+        # offsets k of a suffix node, of the prefix node ending its own
+        # quadrant and of a prefix node; entry_arrivals maps them back
+        self.block = 3 * num_directions + 1
+        self.hub = 3 * num_directions
+        self.right_entries = [[] for _ in range(num_directions)]
+        self.entry_arrivals = [[] for _ in range(2 * num_directions)]
+        for direction in range(num_directions):
+            quadrant, position = int(quadrants[direction]), positions[direction]
+            entries = []
+            previous = (quadrant + 3) % 4
+            begin, end = quadrant_starts[previous], quadrant_starts[previous + 1]
+            rank = begin + np.searchsorted(positions[ranked[begin:end]], position, side="left")
+            if rank < end: entries.append(num_directions + int(rank))
+            entries.append(2 * num_directions + int(quadrant_starts[quadrant + 1]) - 1)
+            following = (quadrant + 1) % 4
+            begin, end = quadrant_starts[following], quadrant_starts[following + 1]
+            rank = begin + np.searchsorted(positions[ranked[begin:end]], position, side="right") - 1
+            if rank >= begin: entries.append(2 * num_directions + int(rank))
+            self.right_entries[direction] = entries
+            for entry in entries:
+                self.entry_arrivals[entry - num_directions].append(direction)
+
+        self.target_num = col * (target[1] - 1) + target[0]
+        self.start_num = self.last_num = col * (start[1] - 1) + start[0]
+        self.blocked_steps = set()
+        self.g = {}
+        self.rhs = {0: 0}
+        self.queue = []
+        self.keys = {}
+        self.km = 0
+        self.expanded = 0
+        self.push(0)
+
+    def get_point(self, num):
+        """
+        Return point [i, j] of number 'num'
+        """
+        return [(num - 1) % self.col + 1, (num - 1) // self.col + 1]
+
+    def get_distance(self, num1, num2):
+        """
+        Lower bound of the cost between points 'num1' and 'num2': lengths
+        are rounded to 5 digits, hence the 1e-5 (see get_turn_heuristic)
+        """
+        dx = (num1 - 1) % self.col - (num2 - 1) % self.col
+        dy = (num1 - 1) // self.col - (num2 - 1) // self.col
+        return math.sqrt(dx * dx + dy * dy) * (1 - 1e-5)
+
+    def get_next(self, num, direction, sign=1):
+        """
+        Return the number of the point one step from point 'num' along
+        'direction' ('sign' = 1) or against it (-1), None if the step leaves
+        the grid or meets a known wall
+        """
+        next_col = (num - 1) % self.col + 1 + sign * self.directions_x[direction]
+        next_row = (num - 1) // self.col + 1 + sign * self.directions_y[direction]
+        if not (1 <= next_col <= self.col and 1 <= next_row <= self.row): return None
+        next_num = num + sign * self.steps[direction]
+        tail = num if sign == 1 else next_num
+        if tail * self.num_directions + direction in self.blocked_steps: return None
+        return next_num
+
+    def get_successors(self, node):
+        """
+        Return list of (node, cost) of the edges out of 'node'
+        """
+        num_directions, block = self.num_directions, self.block
+        num, kind = divmod(node, block)
+        base = num * block
+        if kind < num_directions:
+            if num == self.target_num: return [(0, 0)]
+            successors = []
+            length = self.lengths[kind]
+            for direction in (kind, kind ^ 1):
+                next_num = self.get_next(num, direction)
+                if next_num is not None: successors.append((next_num * block + direction, length))
+            successors += [(base + entry, self.right_or_obtuse) for entry in self.right_entries[kind]]
+            successors.append((base + self.hub, self.acute))
+            return successors
+        if kind == self.hub:
+            return [(base + 2 * num_directions + rank, 0) for rank in self.quadrant_lasts]
+        # Chains: on to the next node, and leaving along the node's direction
+        rank = (kind - num_directions) % num_directions
+        successors = []
+        if kind < 2 * num_directions:
+            if rank < self.chain_lasts[rank]: successors.append((node + 1, 0))
+        elif rank > self.chain_firsts[rank]:
+            successors.append((node - 1, 0))
+        direction = self.ranked[rank]
+        next_num = self.get_next(num, direction)
+        if next_num is not None: successors.append((next_num * block + direction, self.lengths[direction]))
+        return successors
+
+    def get_predecessors(self, node):
+        """
+        Return list of (node, cost) of the edges into 'node'
+        """
+        num_directions, block = self.num_directions, self.block
+        if node == 0: return [(self.target_num * block + direction, 0) for direction in range(num_directions)]
+        num, kind = divmod(node, block)
+        base = num * block
+        if kind < num_directions:
+            previous_num = self.get_next(num, kind, -1)
+            if previous_num is None: return []
+            previous_base = previous_num * block
+            length = self.lengths[kind]
+            rank = self.rank_of[kind]
+            predecessors = [(previous_base + num_directions + rank, length), (previous_base + 2 * num_directions + rank, length)]
+            if previous_num != self.target_num:
+                predecessors += [(previous_base + kind, length), (previous_base + (kind ^ 1), length)]
+            return predecessors
+        if num == self.target_num: arrivals = []
+        elif kind == self.hub: return [(base + direction, self.acute) for direction in range(num_directions)]
+        else: arrivals = [(base + direction, self.right_or_obtuse) for direction in self.entry_arrivals[kind - num_directions]]
+        if kind == self.hub: return arrivals
+        rank = (kind - num_directions) % num_directions
+        if kind < 2 * num_directions:
+            if rank > self.chain_firsts[rank]: arrivals.append((node - 1, 0))
+        else:
+            if rank < self.chain_lasts[rank]: arrivals.append((node + 1, 0))
+            else: arrivals.append((base + self.hub, 0))
+        return arrivals
+
+    def get_key(self, node):
+        """
+        Return the D* Lite key of 'node'
+        """
+        value = min(self.g.get(node, math.inf), self.rhs.get(node, math.inf))
+        return (value + self.get_distance(self.start_num, node // self.block or self.target_num) + self.km, value)
+
+    def push(self, node):
+        """
+        Put 'node' in the queue if it is inconsistent, else take it out
+        """
+        if self.g.get(node, math.inf) != self.rhs.get(node, math.inf):
+            key = self.get_key(node)
+            self.keys[node] = key
+            heapq.heappush(self.queue, (key, node))
+        else:
+            self.keys.pop(node, None)
+
+    def update_node(self, node):
+        """
+        Compute the rhs of 'node' again from its successors, and requeue it
+        """
+        if node != 0:
+            self.rhs[node] = min((cost + self.g.get(successor, math.inf) for successor, cost in self.get_successors(node)), default=math.inf)
+        self.push(node)
+
+    def compute_costs(self, node):
+        """
+        Expand nodes until the cost of 'node' (where the mouse is) is right
+        """
+        g, rhs, keys, queue = self.g, self.rhs, self.keys, self.queue
+        while queue:
+            key, top = queue[0]
+            if keys.get(top) != key:
+                heapq.heappop(queue)
+                continue
+            # Ties too: gadget edges cost 0, so nodes next to 'node' share its key
+            if key > self.get_key(node) and rhs.get(node, math.inf) == g.get(node, math.inf): break
+            heapq.heappop(queue)
+            new_key = self.get_key(top)
+            if key < new_key:
+                keys[top] = new_key
+                heapq.heappush(queue, (new_key, top))
+                continue
+            self.expanded += 1
+            value = rhs.get(top, math.inf)
+            if g.get(top, math.inf) > value:
+                # Cheaper: the predecessors can only get cheaper through it
+                g[top] = value
+                del keys[top]
+                for predecessor, cost in self.get_predecessors(top):
+                    if cost + value < rhs.get(predecessor, math.inf):
+                        rhs[predecessor] = cost + value
+                        self.push(predecessor)
+            else:
+                # Dearer: only the predecessors whose rhs came from it change
+                old_value = g.pop(top)
+                for predecessor, cost in self.get_predecessors(top):
+                    if rhs.get(predecessor, math.inf) >= cost + old_value - 1e-9: self.update_node(predecessor)
+                self.update_node(top)
+
+    def move(self, node):
+        """
+        The mouse is now at 'node'
+        """
+        self.start_num = node // self.block
+
+    def reveal(self, walls):
+        """
+        Add 'walls' to the known ones: the nodes whose edges take a step
+        meeting them are updated. Return the number of steps blocked.
+        """
+        num_directions, block = self.num_directions, self.block
+        new_steps = []
+        for wall in walls:
+            slope_ids, cols, rows = get_wall_steps(self.slopes, self.row, self.col, wall)
+            nums = self.col * (rows - 1) + cols
+            for num, slope_id in zip(nums.tolist(), slope_ids.tolist()):
+                for tail, direction in ((num, 2 * slope_id), (num + self.steps[2 * slope_id], 2 * slope_id + 1)):
+                    step = tail * num_directions + direction
+                    if step not in self.blocked_steps:
+                        self.blocked_steps.add(step)
+                        new_steps.append((tail, direction))
+        if not new_steps: return 0
+        self.km += self.get_distance(self.last_num, self.start_num)
+        self.last_num = self.start_num
+        for num, direction in new_steps:
+            base = num * block
+            rank = self.rank_of[direction]
+            for node in (base + direction, base + (direction ^ 1), base + num_directions + rank, base + 2 * num_directions + rank):
+                self.update_node(node)
+        return len(new_steps)
+
+    def get_cost(self, node):
+        """
+        Return the cost from 'node' to the target on the known walls
+        """
+        return self.g.get(node, math.inf)
+
+    def get_next_state(self, node):
+        """
+        Return the state (arrival node) the cheapest path from 'node' moves
+        to next, through the gadget of its point
+        """
+        while True:
+            successors = self.get_successors(node)
+            node = min(successors, key=lambda item: item[1] + self.g.get(item[0], math.inf))[0]
+            if node % self.block < self.num_directions: return node
+
+# Walls of 'edges' near a point
+def get_walls_near(edges, point, radius):
+    """
+    Return boolean array, True at the walls of 'edges' (shape (n, 2, 2))
+    within Euclidean distance 'radius' of 'point'
+    """
+    ends1, ends2 = edges[:, 0].astype(np.float64), edges[:, 1].astype(np.float64)
+    vectors = ends2 - ends1
+    lengths = np.maximum((vectors * vectors).sum(axis=1), 1e-12)
+    fractions = np.clip(((np.asarray(point) - ends1) * vectors).sum(axis=1) / lengths, 0, 1)
+    closest = ends1 + fractions[:, None] * vectors
+    return np.sqrt(((closest - point) ** 2).sum(axis=1)) <= radius + 1e-9
+
+# Drive through a maze discovering its walls, model 2
+def explore(grid, radius=2, stats=None):
+    """
+    Simulate a mouse driving from start to target of MazeGrid 'grid' that
+    only knows the outer boundary at first: the walls within distance
+    'radius' of every point it reaches are revealed, and so is a wall on
+    the move it is about to make. After every discovery the plan is
+    repaired by OnlinePlanner (D* Lite), not searched again. Return
+    PathInfo of the path driven (nodes are points [i, j], costs of model
+    2). Raise NoPathError if the target cannot be reached. If 'stats' is a
+    dictionary, the numbers of moves, walls revealed and replans, states
+    expanded by the first plan and by the replans, and their times are
+    stored in it.
+    """
+    from fun_with_dijkstar import Constant
+    invalid = grid.validate()
+    if invalid is not None: raise ValueError(invalid)
+    planner = OnlinePlanner(grid.row, grid.col, grid.start, grid.target, Constant.acute, Constant.right_or_obtuse)
+    edges = np.asarray(grid.edges, dtype=np.int64).reshape(-1, 2, 2)
+    hidden = np.ones(len(edges), dtype=bool)
+    counters = {"moves": 0, "walls_revealed": 0, "replans": 0, "replan_expanded": 0, "replan_s": 0.0}
+
+    def reveal(mask):
+        found = np.flatnonzero(hidden & mask)
+        hidden[found] = False
+        counters["walls_revealed"] += len(found)
+        return planner.reveal(edges[found].tolist())
+
+    num = planner.start_num
+    node = num * planner.block + planner.hub
+    reveal(get_walls_near(edges, grid.start, radius))
+    plan_start = time.time()
+    planner.compute_costs(node)
+    counters["initial_s"] = time.time() - plan_start
+    counters["initial_expanded"] = planner.expanded
+
+    points, costs, direction = [grid.start], [], None
+    while num != planner.target_num:
+        if planner.get_cost(node) == math.inf:
+            if stats is not None: stats.update(counters)
+            raise NoPathError(f"Could not find a path from {grid.start} to {grid.target}")
+        next_node = planner.get_next_state(node)
+        next_num, next_direction = divmod(next_node, planner.block)
+        point, next_point = planner.get_point(num), planner.get_point(next_num)
+        blocking = WallArray(edges.reshape(-1, 4)[hidden]).check_intersection(point, next_point) if hidden.any() else None
+        if blocking is not None and blocking.any():
+            mask = np.zeros(len(edges), dtype=bool)
+            mask[np.flatnonzero(hidden)[blocking]] = True
+            changed = reveal(mask)
+        else:
+            # Move, paying the turn of model 2 (none for the first move)
+            cost = planner.lengths[next_direction]
+            if direction is not None and next_direction not in (direction, direction ^ 1):
+                dot = (planner.directions_x[direction] * planner.directions_x[next_direction]
+                       + planner.directions_y[direction] * planner.directions_y[next_direction])
+                cost += planner.acute if dot < 0 else planner.right_or_obtuse
+            points.append(next_point)
+            costs.append(cost)
+            counters["moves"] += 1
+            num, node, direction = next_num, next_node, next_direction
+            planner.move(node)
+            changed = reveal(get_walls_near(edges, next_point, radius))
+        if changed:
+            expanded = planner.expanded
+            plan_start = time.time()
+            planner.compute_costs(node)
+            counters["replan_s"] += time.time() - plan_start
+            counters["replan_expanded"] += planner.expanded - expanded
+            counters["replans"] += 1
+    if stats is not None: stats.update(counters)
+    return PathInfo(points, costs, costs, sum(costs))
+
+# Benchmark exploration over the samples
+def benchmark(sizes=(4, 10, 20), samples_per_size=10, radius=2):
+    """
+    Explore the first 'samples_per_size' samples of every size in 'sizes'
+    (see explore) with sensing radius 'radius', and record the replanning
+    time and the states re-expanded, next to the first plan and to the
+    cost of the path with every wall known (find_lazy_path). Return a list
+    of dictionaries, one per sample.
+    """
+    from fun_with_dijkstar import Constant
+    from lazy import LazyGraph, find_lazy_path
+    from maze import load_maze_grid
+    results = []
+    for size in sizes:
+        for index in range(1, samples_per_size + 1):
+            if not (Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json").exists(): break
+            grid = load_maze_grid(size, index)
+            result = {"size": size, "sample": index}
+            if grid.validate() is not None:
+                result["error"] = grid.validate()
+                print(result)
+                results.append(result)
+                continue
+            stats = {}
+            explore_start = time.time()
+            try:
+                result["cost"] = explore(grid, radius, stats).total_cost
+            except NoPathError:
+                result["cost"] = None
+            result["explore_s"] = time.time() - explore_start
+            result.update(stats)
+            try:
+                result["known_cost"] = find_lazy_path(
+                    LazyGraph(grid), grid.start, grid.target, Constant.acute, Constant.right_or_obtuse,
+                ).total_cost
+            except NoPathError:
+                result["known_cost"] = None
+            print(result)
+            results.append(result)
+    return results
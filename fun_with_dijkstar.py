@@ -4,12 +4,19 @@ import sys
 sys.path.append("/Library/Frameworks/Python.framework/Versions/3.10/lib/python3.10/site-packages")
 from pathlib import Path
 from dijkstar import Graph, find_path
+from dijkstar import NoPathError as DijkstarNoPathError
 import json
 import time
 import math
-from functools import cmp_to_key
 import numpy as np
-from matplotlib import pyplot as plt
+from reach import fill_nodes_info, fill_nodes_info_by_points, get_all_slopes, get_reach_backend
+from slopes import get_grid_slopes, get_point_slope_ids
+from cache import get_cached
+from maze import load_maze_grid
+from search import NoPathError, SlopeGraph, TurnGraph, find_graph_path, find_turn_path
+from lazy import LazyGraph, find_lazy_path
+from instrument import profiler
+from render import show_solution
 
 # Slopes generator
 # Reduce a slope
@@ -22,7 +29,8 @@ def reduce_tuple(iter):
     return (int(a/d), int(b/d))
 
 # Get available slopes from a specified position
-# Note: This method uses a set, which means order will change each run
+# Note: Slopes are clipped from the cached slopes of the grid (see slopes.py),
+# so they always come in the same order (increasing angle)
 def get_slopes(current_col, current_row, row, col):
     """
     Return list of slopes for point ('i', 'j') in a
@@ -30,13 +38,8 @@ def get_slopes(current_col, current_row, row, col):
     irreducible list [a, b], in the right-upward direction (i.e b > 0,
     or b = 0 and a > 0)
     """
-    slope_set = set()
-    if current_col < col:
-        slope_set.add((1, 0))
-    for row_index in range(current_row + 1, row + 1):
-        for col_index in range(1, col + 1):
-            slope_set.add(reduce_tuple((col_index - current_col, row_index - current_row)))
-    return list(slope_set)
+    grid_slopes = get_grid_slopes(row, col)
+    return [list(grid_slopes[slope_id]) for slope_id in get_point_slope_ids(current_col, current_row, row, col).tolist()]
 
 # Generate slopes for square grids, put save = "yes" for local save of slopes.
 # Return None if save = "yes"
@@ -141,6 +144,7 @@ def check_intersection(point1, point2, edge):
     """
     Check intersection of segment ['point1', 'point2'] with 'edge'
     """
+    if profiler.enabled: profiler.count("check_intersection")
     a1, b1, a2, b2 = edge[0][0], edge[0][1], edge[1][0], edge[1][1]
     x1, y1, x2, y2 = point1[0], point1[1], point2[0], point2[1]
     """
@@ -191,11 +195,12 @@ def check_intersection(point1, point2, edge):
         cond_v = (all([d > 0, d2 >= 0, d2 - d <= 0]) or all([d < 0, d2 <= 0, d2 - d >= 0]))
         return all([cond_u, cond_v])
 
-# Get reach from a point
-def get_furthest_reach(point, slope, row, col, edge_list):
+# Get an (exclusive) upper bound for the reach from a point, from the grid
+# boundary only
+def get_max_reach(point, slope, row, col):
     """
-    Get furthest expansion from 'point' in the direction given by 'slope',
-    in a 'row'*'col' grid with 'edge_list' as obstacles.
+    Return the smallest number of 'slope' steps from 'point' that leaves the
+    'row'*'col' grid.
     """
     current_col, current_row = point[0], point[1]
     col_slope, row_slope = slope[0], slope[1]
@@ -206,10 +211,26 @@ def get_furthest_reach(point, slope, row, col, edge_list):
     # Get maximum row reach
     if row_slope == 0: max_row_reach = row
     else: max_row_reach = int((row - current_row) / row_slope) + 1
+    return min(max_row_reach, max_col_reach)
+
+# Get reach from a point
+def get_furthest_reach(point, slope, row, col, edge_list):
+    """
+    Get furthest expansion from 'point' in the direction given by 'slope',
+    in a 'row'*'col' grid with 'edge_list' as obstacles. 'edge_list' can
+    also be a reach backend from reach.get_reach_backend: WallArray (all
+    walls tested at once), WallIndex (only walls near the ray are tested)
+    or VisibilitySweep (one angular sweep around 'point').
+    """
+    current_col, current_row = point[0], point[1]
+    col_slope, row_slope = slope[0], slope[1]
+    max_reach = get_max_reach(point, slope, row, col)
+    if hasattr(edge_list, "get_reaches"):
+        return edge_list.get_reach(point, slope, max_reach)
 
     min_reach = 0
-    max_reach = min(max_row_reach, max_col_reach)
     while max_reach - min_reach > 1:
+        if profiler.enabled: profiler.count("reach_probes")
         temp = min_reach
         new_reach = int((max_reach + min_reach) / 2)
         min_reach = new_reach
@@ -221,6 +242,18 @@ def get_furthest_reach(point, slope, row, col, edge_list):
                 break
     return min_reach
 
+# Get reach from a point, for several slopes at once
+def get_furthest_reaches(point, slopes, row, col, edge_list):
+    """
+    Same as get_furthest_reach, for every slope in 'slopes'. With a reach
+    backend as 'edge_list' (e.g. a WallArray, testing all probes of all
+    slopes in a single vectorized call), all slopes are handled at once.
+    """
+    if hasattr(edge_list, "get_reaches"):
+        max_reaches = [get_max_reach(point, slope, row, col) for slope in slopes]
+        return edge_list.get_reaches(point, slopes, max_reaches).tolist()
+    return [get_furthest_reach(point, slope, row, col, edge_list) for slope in slopes]
+
 # Sort the edge_list, to speed up categorization
 def sort_edge_list(edge_list):
     """
@@ -277,25 +310,14 @@ def is_empty_dict(dict):
     """
     return all(len(dict[key]) == 0 for key in dict.keys())
 
-# Comparing nodes, to generate nodes dictionary
-def compare(node1, node2):
+# Nodes_info of a maze, for both models
+def get_nodes_info(grid, reach_mode = "sweep"):
     """
-    Compare nodes of the following structure
-    node = "{col}_{row}_{slope_col}_{slope_row}_direction"
-    return -1 if node1 < node2
+    Return nodes_info of MazeGrid 'grid': for every point not on walls,
+    the slopes of the maximal wall-free runs that begin ("begin", with
+    their "reach"), go through ("middle") or end ("end") at the point.
     """
-    list1 = [int(char) for char in node1.split("_")]
-    list2 = [int(char) for char in node2.split("_")]
-    if list1 < list2: return -1
-    elif list1 == list2: return 0
-    else: return 1
-
-def solve_with_first_model(size, index, visualize = "no"):
-    start_time = time.time()
-    # List of all points (to be filtered and used later)
-    # Note: j before i
-    points_list = [[i, j] for j in range(1, size + 1) for i in range(1, size + 1)]
-
+    row, col = grid.row, grid.col
     nodes_info = {
         f"{i}_{j}": {
             "begin": [], 
@@ -303,75 +325,106 @@ def solve_with_first_model(size, index, visualize = "no"):
             "end": [],
             "reach": [],
         } 
-        for j in range(1, size + 1) for i in range(1, size + 1)
+        for i, j in grid.get_free_points()
     }
+    # One line sweep per slope: every maximal wall-free run gives a "begin"
+    # (with its reach), "middle" and "end" entries.
+    # Other modes compute the reach point by point, with the given backend
+    # ("array", "index" or "visibility", see get_reach_backend).
+    # All modes give the same nodes_info, which is cached (see cache.py)
+    def build_nodes_info():
+        if reach_mode == "sweep":
+            return fill_nodes_info(nodes_info, get_all_slopes(row, col), row, col, grid.walls)
+        walls = get_reach_backend(grid.edges, reach_mode)
+        return fill_nodes_info_by_points(nodes_info, grid.get_free_points(), get_all_slopes(row, col), row, col, walls)
+    return get_cached(grid.maze, "nodes_info", build_nodes_info)
+
+# Lower bound of the remaining cost of the nodes of model 1, for A*
+def get_first_model_heuristic(graph, target):
+    """
+    Return array: item v is a consistent lower bound of the cost from node v
+    of SlopeGraph 'graph' to 'target' (as get_turn_heuristic in search.py):
+    the distance to 'target', plus one turn if 'target' is off the line of
+    the node
+    """
+    # Per point first, then per node
+    point_nums = np.arange(graph.row * graph.col + 1)
+    cols, rows = (point_nums - 1) % graph.col + 1, (point_nums - 1) // graph.col + 1
+    # Lengths are rounded to 5 digits, see get_Cartesian_length
+    distance = np.sqrt((target[0] - cols) ** 2 + (target[1] - rows) ** 2) * (1 - 1e-5)
+    heuristic = distance[graph.get_points(np.arange(len(graph)))]
+    # Nodes of the turn gadget are only left by turning: no extra turn
+    states = np.arange(graph.num_states)
+    nums = graph.get_points(states)
+    slope_cols, slope_rows = graph.get_slopes(states).T
+    off_line = slope_cols * (target[1] - rows[nums]) != slope_rows * (target[0] - cols[nums])
+    heuristic[states[off_line]] += min(Constant.acute, Constant.right_or_obtuse)
+    return heuristic
+
+# Both models with the lazy engine (see lazy.py)
+def solve_lazily(grid, model, visualize = "no", reach_mode = "sweep", search = "dijkstra", stats = None, start_time = None):
+    """
+    Solve MazeGrid 'grid' with model 'model' by find_lazy_path, print and
+    (optionally) visualize the path as the solvers do, with the numbers of
+    reaches computed and avoided ('stats', see find_lazy_path). Reaches are
+    computed point by point with 'reach_mode' ("sweep" works on whole
+    runs, so it falls back to "visibility").
+    """
+    if start_time is None: start_time = time.time()
+    if stats is None: stats = {}
+    graph = LazyGraph(grid, "visibility" if reach_mode == "sweep" else reach_mode)
+    start, target = grid.start, grid.target
+    if not graph.get_point_reaches(coords_to_num(*start, grid.col)).any():
+        print(f"Invalid: Start is disconnected")
+        return None
+    if not graph.get_point_reaches(coords_to_num(*target, grid.col)).any():
+        print(f"Invalid: Target is disconnected")
+        return None
+    try:
+        with profiler.phase("search"):
+            path_info = find_lazy_path(graph, start, target, Constant.acute, Constant.right_or_obtuse, model, stats, search)
+    except NoPathError:
+        print("No path found")
+        return None
+    points_path = [num_to_coords(num, grid.col) for num in path_info[0]]
+    print(f"Optimal path: {points_path}")
+    print(f"Optimal value: {path_info[3]}")
+    runtime = time.time() - start_time
+    print(f"runtime (s): {runtime}")
+    print(f"Reaches computed: {stats['reach_computed']}, avoided: {stats['reach_avoided']} of {stats['reach_total']}")
+
+    # Visualize
+    if visualize == "yes":
+        show_solution(grid, points_path)
+
+def solve_with_first_model(size, index, visualize = "no", reach_mode = "sweep", search = "dijkstra", stats = None, engine = "graph"):
+    start_time = time.time()
+    # Maze, loaded and preprocessed once (see maze.py)
+    with profiler.phase("load"):
+        grid = load_maze_grid(size, index)
+    # List of all points not on walls (to be used later)
+    # Note: j before i
+    points_list = grid.get_free_points()
 
-    # Two options for nodes_slopes, one through local save, another through
-    # in-program generation. Testing seems to prefer the save and read option.
-    slopes_path = Path(__file__).parent/"Slopes"/f"Size{size}"
-    with open(slopes_path, "r") as f:
-        node_slopes = json.load(f)
-
-    # node_slopes = generate_slopes(size=size)
-
-    grid_path = Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json"
-    with open(grid_path, "r") as f:
-        grid_info = json.load(f)
-
-    # Get edges, then sort (for faster execution)
-    edges = grid_info["edges"]
-    edges = sort_edge_list(edge_list=edges)
-
-    # Filter redundant points from points_list
-    for edge in edges:
-        points_to_remove = get_points_between(edge[0], edge[1])
-        for point in points_to_remove:
-            # remove from points_list
-            try:
-                points_list.remove(point)
-            except:
-                pass
-
-            # remove from nodes_info
-            key = f"{point[0]}_{point[1]}"
-            try:
-                del nodes_info[key]
-            except:
-                pass
+    # Edges, sorted (for faster execution)
+    edges = grid.edges
     
     # First validity check
-    start = grid_info["start"]
-    target = grid_info["target"]
-    if start not in points_list: 
-        print(f"Invalid: Start is on the wall")
-        return None
-    if target not in points_list: 
-        print(f"Invalid: Target is on the wall")
+    start = grid.start
+    target = grid.target
+    invalid = grid.validate()
+    if invalid is not None: 
+        print(invalid)
         return None
 
-    # Nodes_info
-    for current_col, current_row in points_list:
-        point = [current_col, current_row]
-        for slope in node_slopes[f"{current_col}_{current_row}"]:
-            max_reach = get_furthest_reach(point, slope, size, size, edges)
-            if max_reach > 0:
-                nodes_info[f"{current_col}_{current_row}"]["begin"].append(slope)
-                nodes_info[f"{current_col}_{current_row}"]["reach"].append(max_reach)
-                for num in range(1, max_reach):
-                    new_col = current_col + num * slope[0]
-                    new_row = current_row + num * slope[1]
-                    try:
-                        node_slopes[f"{new_col}_{new_row}"].remove(slope)
-                    except: 
-                        pass
-                    nodes_info[f"{new_col}_{new_row}"]["middle"].append(slope)
-                new_col = current_col + max_reach * slope[0]
-                new_row = current_row + max_reach * slope[1]
-                try:
-                    node_slopes[f"{new_col}_{new_row}"].remove(slope)
-                except:
-                    pass
-                nodes_info[f"{new_col}_{new_row}"]["end"].append(slope)
+    # Lazy engine: no nodes_info, the graph is expanded while searching
+    if engine == "lazy":
+        return solve_lazily(grid, 1, visualize, reach_mode, search, stats, start_time)
+    elif engine != "graph":
+        raise ValueError(f"Unknown engine: {engine}")
+
+    with profiler.phase("reach"):
+        nodes_info = get_nodes_info(grid, reach_mode)
 
     # Second validity check (start and target both in nodes_info)
     if is_empty_dict(nodes_info[f"{start[0]}_{start[1]}"]):
@@ -383,238 +436,46 @@ def solve_with_first_model(size, index, visualize = "no"):
         return None
 
     else:
-        # Create graph
-        graph = Graph()
-
         # Further filter unreachable nodes from list
-        for current_col, current_row in points_list:
-            key = f"{current_col}_{current_row}"
-            if is_empty_dict(nodes_info[key]):
-                del nodes_info[key]
-
-        # Create nums_to_nodes and nodes_to_nums dictionaries, for graphing
-        abstract_nodes_list = []
-        for key, slopes in nodes_info.items():
-            for slope in slopes["begin"]:
-                abstract_nodes_list.append(key + f"_{slope[0]}_{slope[1]}_1")
-                abstract_nodes_list.append(key + f"_{slope[0]}_{slope[1]}_-1")
-            for slope in slopes["middle"]:
-                abstract_nodes_list.append(key + f"_{slope[0]}_{slope[1]}_1")
-                abstract_nodes_list.append(key + f"_{slope[0]}_{slope[1]}_-1")
-            for slope in slopes["end"]:
-                abstract_nodes_list.append(key + f"_{slope[0]}_{slope[1]}_1")
-                abstract_nodes_list.append(key + f"_{slope[0]}_{slope[1]}_-1")
-
-        abstract_nodes_list = sorted(abstract_nodes_list, key=cmp_to_key(compare))
-        nodes_to_nums = dict()
-        nums_to_nodes = dict()
-        for i in range(len(abstract_nodes_list)):
-            nodes_to_nums[abstract_nodes_list[i]] = i
-            nums_to_nodes[i] = abstract_nodes_list[i]
-
-        # Create edges
-        # Crate adjacent edges first, note that I pop the start and target
-        # points later from nodes_info
-        for key in nodes_info.keys():
-            point = split_dict_key(key)
-            length = len(nodes_info[key]["begin"])
-            for i in range(length):
-                slope = nodes_info[key]["begin"][i]
-                reach = nodes_info[key]["reach"][i]
-                slope_key = f"_{slope[0]}_{slope[1]}_"
-                unit_length = get_Cartesian_length(slope)
-                for j in range(reach):
-                    first_point_key = f"{point[0] + j * slope[0]}_{point[1] + j * slope[1]}" + slope_key
-                    first_node_pos_key = nodes_to_nums[first_point_key + "1"]
-                    first_node_neg_key = nodes_to_nums[first_point_key + "-1"]
-
-                    second_point_key = f"{point[0] + (j + 1) * slope[0]}_{point[1] + (j + 1) * slope[1]}" + slope_key
-                    second_node_pos_key = nodes_to_nums[second_point_key + "1"]
-                    second_node_neg_key = nodes_to_nums[second_point_key + "-1"]
-
-                    # Add edges
-                    graph.add_edge(first_node_pos_key, second_node_pos_key, unit_length)
-                    graph.add_edge(second_node_neg_key, first_node_neg_key, unit_length)
-
-        # Add edges between the same nodes with different angles
-        # Get start and target
-        start_key = f"{start[0]}_{start[1]}"
-        target_key = f"{target[0]}_{target[1]}"
-        start_slopes = nodes_info.pop(start_key)
-        target_slopes = nodes_info.pop(target_key)
-
-        start_slope_list = start_slopes["begin"] + start_slopes["middle"] + start_slopes["end"]
-        target_slope_list = target_slopes["begin"] + target_slopes["middle"] + target_slopes["end"]
-
-        # Add start and target to edge_dict
-        first_start = start_slope_list.pop(0)
-        first_start_key = start_key + f"_{first_start[0]}_{first_start[1]}_"
-        first_start_pos_key = nodes_to_nums[first_start_key + "1"]
-        first_start_neg_key = nodes_to_nums[first_start_key + "-1"]
-
-        first_target = target_slope_list.pop(0)
-        first_target_key = target_key + f"_{first_target[0]}_{first_target[1]}_"
-        first_target_pos_key = nodes_to_nums[first_target_key + "1"]
-        first_target_neg_key = nodes_to_nums[first_target_key + "-1"]
-
-        # start and target: all edges are 0
-        for second_start in start_slope_list:
-            second_start_key = start_key + f"_{second_start[0]}_{second_start[1]}_"
-            second_start_pos_key = nodes_to_nums[second_start_key + "1"]
-            second_start_neg_key = nodes_to_nums[second_start_key + "-1"]
-            # Add edges
-            graph.add_edge(first_start_pos_key, second_start_neg_key, 0)
-            graph.add_edge(first_start_pos_key, second_start_neg_key, 0)
-            graph.add_edge(second_start_neg_key, first_start_pos_key, 0)
-            graph.add_edge(first_start_neg_key, second_start_pos_key, 0)
-            graph.add_edge(second_start_pos_key, first_start_neg_key, 0)
-            graph.add_edge(first_start_pos_key, second_start_pos_key, 0)
-            graph.add_edge(second_start_pos_key, first_start_pos_key, 0)
-            graph.add_edge(first_start_neg_key, second_start_neg_key, 0)
-            graph.add_edge(second_start_neg_key, first_start_neg_key, 0)
-
-        for second_target in target_slope_list:
-            second_target_key = target_key + f"_{second_target[0]}_{second_target[1]}_"
-            second_target_pos_key = nodes_to_nums[second_target_key + "1"]
-            second_target_neg_key = nodes_to_nums[second_target_key + "-1"]
-            # Add edges
-            graph.add_edge(first_target_pos_key, second_target_neg_key, 0)
-            graph.add_edge(second_target_neg_key, first_target_pos_key, 0)
-            graph.add_edge(first_target_neg_key, second_target_pos_key, 0)
-            graph.add_edge(second_target_pos_key, first_target_neg_key, 0)
-            graph.add_edge(first_target_pos_key, second_target_pos_key, 0)
-            graph.add_edge(second_target_pos_key, first_target_pos_key, 0)
-            graph.add_edge(first_target_neg_key, second_target_neg_key, 0)
-            graph.add_edge(second_target_neg_key, first_target_neg_key, 0)
-
-        for key, slopes in nodes_info.items():
-            begin_slopes = slopes["begin"]
-            middle_slopes = slopes["middle"]
-            end_slopes = slopes["end"]
-            begin_slope_length = len(begin_slopes)
-            middle_slopes_length = len(middle_slopes)
-            end_slopes_length = len(end_slopes)
-
-            # First loop
-            for i in range(begin_slope_length - 1):
-                first_slope = slopes["begin"][i]
-                first_slope_key = key + f"_{first_slope[0]}_{first_slope[1]}_"
-                first_node_pos_key = nodes_to_nums[first_slope_key + "1"]
-                first_node_neg_key = nodes_to_nums[first_slope_key + "-1"]
-                for j in range(i + 1, begin_slope_length):
-                    #Initiate materials
-                    second_slope = slopes["begin"][j]
-                    angle_cost = get_angle_cost(first_slope, second_slope)[0]
-                    second_slope_key = key + f"_{second_slope[0]}_{second_slope[1]}_"
-                    second_node_pos_key = nodes_to_nums[second_slope_key + "1"]
-                    second_node_neg_key = nodes_to_nums[second_slope_key + "-1"]
-
-                    # Add edges
-                    graph.add_edge(second_node_neg_key, first_node_pos_key, angle_cost)
-                    graph.add_edge(first_node_neg_key, second_node_pos_key, angle_cost)
-
-                for second_slope in middle_slopes:
-                    costs = get_angle_cost(first_slope, second_slope)
-                    angle_cost = costs[0]
-                    other_angle_cost = costs[1]
-                    second_slope_key = key + f"_{second_slope[0]}_{second_slope[1]}_"
-                    second_node_pos_key = nodes_to_nums[second_slope_key + "1"]
-                    second_node_neg_key = nodes_to_nums[second_slope_key + "-1"]
-
-                    # Add edges
-                    graph.add_edge(second_node_neg_key, first_node_pos_key, angle_cost)
-                    graph.add_edge(first_node_neg_key, second_node_pos_key, angle_cost)
-
-                    graph.add_edge(second_node_pos_key, first_node_pos_key, other_angle_cost)
-                    graph.add_edge(first_node_neg_key, second_node_neg_key, other_angle_cost)
-
-                for second_slope in end_slopes:
-                    other_angle_cost = get_angle_cost(first_slope, second_slope)[1]
-                    second_slope_key = key + f"_{second_slope[0]}_{second_slope[1]}_"
-                    second_node_pos_key = nodes_to_nums[second_slope_key + "1"]
-                    second_node_neg_key = nodes_to_nums[second_slope_key + "-1"]
-
-                    # Add edges
-                    graph.add_edge(second_node_pos_key, first_node_pos_key, other_angle_cost)
-                    graph.add_edge(first_node_neg_key, second_node_neg_key, other_angle_cost)
-
-            # Second loop
-            for i in range(middle_slopes_length - 1):
-                first_slope = slopes["middle"][i]
-                first_slope_key = key + f"_{first_slope[0]}_{first_slope[1]}_"
-                first_node_pos_key = nodes_to_nums[first_slope_key + "1"]
-                first_node_neg_key = nodes_to_nums[first_slope_key + "-1"]
-                for j in range(i + 1, middle_slopes_length):
-                    second_slope = slopes["middle"][j]
-                    costs = get_angle_cost(first_slope, second_slope)
-                    angle_cost = costs[0]
-                    other_angle_cost = costs[1]
-                    second_slope_key = key + f"_{second_slope[0]}_{second_slope[1]}_"
-                    second_node_pos_key = nodes_to_nums[second_slope_key + "1"]
-                    second_node_neg_key = nodes_to_nums[second_slope_key + "-1"]
-
-                    # Add edges
-                    graph.add_edge(first_node_pos_key, second_node_neg_key, angle_cost)
-                    graph.add_edge(second_node_neg_key, first_node_pos_key, angle_cost)
-                    graph.add_edge(first_node_neg_key, second_node_pos_key, angle_cost)
-                    graph.add_edge(second_node_pos_key, first_node_neg_key, angle_cost)
-
-                    graph.add_edge(first_node_pos_key, second_node_pos_key, other_angle_cost)
-                    graph.add_edge(second_node_pos_key, first_node_pos_key, other_angle_cost)
-                    graph.add_edge(first_node_neg_key, second_node_neg_key, other_angle_cost)
-                    graph.add_edge(second_node_neg_key, first_node_neg_key, other_angle_cost)
-
-                for second_slope in end_slopes:
-                    costs = get_angle_cost(first_slope, second_slope)
-                    angle_cost = costs[0]
-                    other_angle_cost = costs[1]            
-                    second_slope_key = key + f"_{second_slope[0]}_{second_slope[1]}_"
-                    second_node_pos_key = nodes_to_nums[second_slope_key + "1"]
-                    second_node_neg_key = nodes_to_nums[second_slope_key + "-1"]
-
-                    # Add edges
-                    graph.add_edge(first_node_pos_key, second_node_neg_key, angle_cost)
-                    graph.add_edge(second_node_pos_key, first_node_neg_key, angle_cost)
-
-                    graph.add_edge(first_node_neg_key, second_node_neg_key, other_angle_cost)
-                    graph.add_edge(second_node_pos_key, first_node_pos_key, other_angle_cost)
-
-            # Third loop
-            for i in range(end_slopes_length - 1):
-                first_slope = slopes["end"][i]
-                first_slope_key = key + f"_{first_slope[0]}_{first_slope[1]}_"
-                first_node_pos_key = nodes_to_nums[first_slope_key + "1"]
-                first_node_neg_key = nodes_to_nums[first_slope_key + "-1"]
-                for j in range(i + 1, end_slopes_length):
-                    second_slope = slopes["end"][j]
-                    angle_cost = get_angle_cost(first_slope, second_slope)[0]
-                    second_slope_key = key + f"_{second_slope[0]}_{second_slope[1]}_"
-                    second_node_pos_key = nodes_to_nums[second_slope_key + "1"]
-                    second_node_neg_key = nodes_to_nums[second_slope_key + "-1"]            
-
-                    # Add edges
-                    graph.add_edge(first_node_pos_key, second_node_neg_key, angle_cost)
-                    graph.add_edge(second_node_pos_key, first_node_neg_key, angle_cost)
-        
-        # Solve graph, print path, and visualize (optional)
+        with profiler.phase("filter"):
+            for current_col, current_row in points_list:
+                key = f"{current_col}_{current_row}"
+                if is_empty_dict(nodes_info[key]):
+                    del nodes_info[key]
+
+        # Create graph: nodes are numbered from (point, slope, direction),
+        # edges are kept in CSR arrays (see SlopeGraph in search.py)
+        with profiler.phase("graph"):
+            graph = SlopeGraph.from_nodes_info(
+                nodes_info, get_all_slopes(size, size), size, size,
+                Constant.acute, Constant.right_or_obtuse,
+            )
+
+        # Start and target: virtual edges to and from their nodes
+        start_nodes = graph.get_endpoints(start)
+        target_nodes = graph.get_endpoints(target)
+
+        # Solve graph (Dijkstra, or A* if 'search' = "astar"), print path,
+        # and visualize (optional)
+        if search == "astar":
+            heuristic = get_first_model_heuristic(graph, target)
+        elif search == "dijkstra":
+            heuristic = None
+        else:
+            raise ValueError(f"Unknown search: {search}")
         try:
-            path_info = find_path(graph, first_start_pos_key, first_target_pos_key)
+            with profiler.phase("search"):
+                path_info = find_graph_path(graph, start_nodes, target_nodes, heuristic, stats)
             num_path = path_info[0]
             optimal_value = path_info[3]
-        except:
+        except NoPathError:
             print("No path found")
             return None
+        # Points of the path, without the repeated ones (turns)
         path_list = []
-        num = num_path.pop(0)
-        node = nums_to_nodes[num]
-        node_chars = node.split("_")
-        node_coord = [int(node_chars[0]), int(node_chars[1])]
-        path_list.append(node_coord)
-        for num in num_path:
-            node = nums_to_nodes[num]
-            node_chars = node.split("_")
-            node_coord = [int(node_chars[0]), int(node_chars[1])]
-            if node_coord != path_list[-1]:
+        for num in graph.get_points(num_path).tolist():
+            node_coord = num_to_coords(num, size)
+            if not path_list or node_coord != path_list[-1]:
                 path_list.append(node_coord)
 
         print(f"Optimal path: {path_list}")
@@ -624,27 +485,54 @@ def solve_with_first_model(size, index, visualize = "no"):
 
         # Visualize
         if visualize == "yes":
-            row, column = size, size
-            fig, ax = plt.subplots(1, 1)
-            x_coords = [point[0] for point in path_list]
-            y_coords = [point[1] for point in path_list]
-            x = np.linspace(1, row, row)
-            y = np.linspace(1, column, column)
-            x_grid, y_grid = np.meshgrid(x, y)
-
-            ax.plot(x_grid, y_grid, marker='o', color='k', linestyle='none', markersize=0.2)
-            ax.plot(start[0], start[1], marker='o', color='b', linestyle='none', markersize=1)
-            ax.plot(target[0], target[1], marker='o', color='r', linestyle='none', markersize=1)
-            for edge in edges:
-                ax.plot(
-                    [edge[0][0], edge[1][0]],
-                    [edge[0][1], edge[1][1]],
-                    color='k',
-                    linewidth=0.2
-                )
-            ax.plot(x_coords, y_coords, color="g", linewidth=0.2)
-            ax.axis("scaled")
-            plt.show()
+            show_solution(grid, path_list)
+
+# Shortest path of model 2, from nodes_info
+def find_second_model_path(nodes_info, start, target, size, engine = "native", search = "dijkstra", stats = None):
+    """
+    Return path info (nodes, edges, costs, total_cost) of the cheapest path
+    from 'start' to 'target' in model 2, nodes numbered by coords_to_num.
+    'engine' = "native" searches (point, incoming direction) states exactly
+    (see search.py), with Dijkstra or A* ('search' = "astar"), and fills
+    'stats' if given; 'engine' = "dijkstar" uses dijkstar.find_path with
+    cost_function, which keeps a single label per point.
+    """
+    start_num = coords_to_num(*start, size)
+    target_num = coords_to_num(*target, size)
+    if engine == "native":
+        with profiler.phase("graph"):
+            graph = TurnGraph.from_nodes_info(nodes_info, get_all_slopes(size, size), size, size)
+        with profiler.phase("search"):
+            return find_turn_path(graph, start_num, target_num, Constant.acute, Constant.right_or_obtuse, stats, search)
+    elif engine != "dijkstar":
+        raise ValueError(f"Unknown engine: {engine}")
+    elif search != "dijkstra":
+        raise ValueError(f"Search {search} needs the native engine")
+
+    # Create graph
+    build = profiler.begin("graph")
+    graph = Graph()
+    # Crate adjacent edges
+    for key in nodes_info.keys():
+        point = split_dict_key(key)
+        length = len(nodes_info[key]["begin"])
+        for i in range(length):
+            slope = nodes_info[key]["begin"][i]
+            reach = nodes_info[key]["reach"][i]
+            unit_length = get_Cartesian_length(slope)
+            for j in range(reach):
+                first_point = coords_to_num(point[0] + j * slope[0], point[1] + j * slope[1], size)
+                second_point = coords_to_num(point[0] + (j + 1) * slope[0], point[1] + (j + 1) * slope[1], size)
+
+                # Add edges
+                graph.add_edge(first_point, second_point, [unit_length, slope])
+                graph.add_edge(second_point, first_point, [unit_length, [-slope[0], -slope[1]]])
+    if profiler.enabled:
+        profiler.count("graph_nodes", graph.node_count)
+        profiler.count("graph_edges", graph.edge_count)
+    profiler.end(build)
+    with profiler.phase("search"):
+        return find_path(graph, start_num, target_num, cost_func=cost_function)
 
 """
 Tổng kết: Quá trình thực hiện cho model 2
@@ -669,88 +557,38 @@ Có thể tích hợp luôn phần vẽ kết quả cuối cùng, hoặc lưu ra
 vẽ sau.
 """
 
-def solve_with_second_model(size, index, visualize = "no"):
+def solve_with_second_model(size, index, visualize = "no", reach_mode = "sweep", engine = "native", search = "dijkstra", stats = None):
     start_time = time.time()
-    # List of all points (to be filtered and used later)
+    # Maze, loaded and preprocessed once (see maze.py)
+    with profiler.phase("load"):
+        grid = load_maze_grid(size, index)
+    # List of all points not on walls (to be used later)
     # Note: j before i
-    points_list = [[i, j] for j in range(1, size + 1) for i in range(1, size + 1)]
-
-    nodes_info = {
-        f"{i}_{j}": {
-            "begin": [], 
-            "middle": [], 
-            "end": [],
-            "reach": [],
-        } 
-        for j in range(1, size + 1) for i in range(1, size + 1)
-    }
+    points_list = grid.get_free_points()
 
-    # Two options for nodes_slopes, one through local save, another through
-    # in-program generation. Testing seems to prefer the save and read option.
-    slopes_path = Path(__file__).parent/"Slopes"/f"Size{size}"
-    with open(slopes_path, "r") as f:
-        node_slopes = json.load(f)
-
-    # node_slopes = generate_slopes(size=size)
-
-    grid_path = Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json"
-    with open(grid_path, "r") as f:
-        grid_info = json.load(f)
-
-    # Get edges, then sort (for faster execution)
-    edges = grid_info["edges"]
-    edges = sort_edge_list(edge_list=edges)
-
-    # Filter redundant points from points_list
-    for edge in edges:
-        points_to_remove = get_points_between(edge[0], edge[1])
-        for point in points_to_remove:
-            # remove from points_list
-            try:
-                points_list.remove(point)
-            except:
-                pass
-
-            # remove from nodes_info
-            key = f"{point[0]}_{point[1]}"
-            try:
-                del nodes_info[key]
-            except:
-                pass
+    # Edges, sorted (for faster execution)
+    edges = grid.edges
     
     # First validity check
-    start = grid_info["start"]
-    target = grid_info["target"]
-    if start not in points_list: 
-        print(f"Invalid: Start is on the wall")
-        return None
-    if target not in points_list: 
-        print(f"Invalid: Target is on the wall")
+    start = grid.start
+    target = grid.target
+    invalid = grid.validate()
+    if invalid is not None: 
+        print(invalid)
         return None
 
-    # Nodes_info
-    for current_col, current_row in points_list:
-        point = [current_col, current_row]
-        for slope in node_slopes[f"{current_col}_{current_row}"]:
-            max_reach = get_furthest_reach(point, slope, size, size, edges)
-            if max_reach > 0:
-                nodes_info[f"{current_col}_{current_row}"]["begin"].append(slope)
-                nodes_info[f"{current_col}_{current_row}"]["reach"].append(max_reach)
-                for num in range(1, max_reach):
-                    new_col = current_col + num * slope[0]
-                    new_row = current_row + num * slope[1]
-                    try:
-                        node_slopes[f"{new_col}_{new_row}"].remove(slope)
-                    except: 
-                        pass
-                    nodes_info[f"{new_col}_{new_row}"]["middle"].append(slope)
-                new_col = current_col + max_reach * slope[0]
-                new_row = current_row + max_reach * slope[1]
-                try:
-                    node_slopes[f"{new_col}_{new_row}"].remove(slope)
-                except:
-                    pass
-                nodes_info[f"{new_col}_{new_row}"]["end"].append(slope)
+    # Lazy engine: no nodes_info, the graph is expanded while searching
+    if engine == "lazy":
+        return solve_lazily(grid, 2, visualize, reach_mode, search, stats, start_time)
+    elif engine not in ("native", "dijkstar"):
+        raise ValueError(f"Unknown engine: {engine}")
+    elif engine == "dijkstar" and search != "dijkstra":
+        raise ValueError(f"Search {search} needs the native engine")
+    elif search not in ("dijkstra", "astar"):
+        raise ValueError(f"Unknown search: {search}")
+
+    with profiler.phase("reach"):
+        nodes_info = get_nodes_info(grid, reach_mode)
 
     # Second validity check (start and target both in nodes_info)
     if is_empty_dict(nodes_info[f"{start[0]}_{start[1]}"]):
@@ -762,39 +600,19 @@ def solve_with_second_model(size, index, visualize = "no"):
         return None
     
     else:
-        # Create graph
-        graph = Graph()
-
         # Further filter unreachable nodes from list
-        for current_col, current_row in points_list:
-            key = f"{current_col}_{current_row}"
-            if is_empty_dict(nodes_info[key]):
-                del nodes_info[key]
-        
-        # Crate adjacent edges
-        for key in nodes_info.keys():
-            point = split_dict_key(key)
-            length = len(nodes_info[key]["begin"])
-            for i in range(length):
-                slope = nodes_info[key]["begin"][i]
-                reach = nodes_info[key]["reach"][i]
-                unit_length = get_Cartesian_length(slope)
-                for j in range(reach):
-                    first_point = coords_to_num(point[0] + j * slope[0], point[1] + j * slope[1], size)
-                    second_point = coords_to_num(point[0] + (j + 1) * slope[0], point[1] + (j + 1) * slope[1], size)
-
-                    # Add edges
-                    graph.add_edge(first_point, second_point, [unit_length, slope])
-                    graph.add_edge(second_point, first_point, [unit_length, [-slope[0], -slope[1]]])
+        with profiler.phase("filter"):
+            for current_col, current_row in points_list:
+                key = f"{current_col}_{current_row}"
+                if is_empty_dict(nodes_info[key]):
+                    del nodes_info[key]
 
         # Solve graph
-        start_num = coords_to_num(*start, size)
-        target_num = coords_to_num(*target, size)
         try:
-            path_info = find_path(graph, start_num, target_num, cost_func=cost_function)
+            path_info = find_second_model_path(nodes_info, start, target, size, engine, search, stats)
             nums_path = path_info[0]
             optimal_value = path_info[3]
-        except:
+        except (NoPathError, DijkstarNoPathError):
             print("No path found")
             return None
         points_path = []
@@ -807,24 +625,4 @@ def solve_with_second_model(size, index, visualize = "no"):
 
         # Visualize
         if visualize == "yes":
-            row, column = size, size
-            fig, ax = plt.subplots(1, 1)
-            x_coords = [point[0] for point in points_path]
-            y_coords = [point[1] for point in points_path]
-            x = np.linspace(1, row, row)
-            y = np.linspace(1, column, column)
-            x_grid, y_grid = np.meshgrid(x, y)
-
-            ax.plot(x_grid, y_grid, marker='o', color='k', linestyle='none', markersize=0.2)
-            ax.plot(start[0], start[1], marker='o', color='b', linestyle='none', markersize=1)
-            ax.plot(target[0], target[1], marker='o', color='r', linestyle='none', markersize=1)
-            for edge in edges:
-                ax.plot(
-                    [edge[0][0], edge[1][0]],
-                    [edge[0][1], edge[1][1]],
-                    color='k',
-                    linewidth=0.2
-                )
-            ax.plot(x_coords, y_coords, color="g", linewidth=0.2)
-            ax.axis('scaled')
-            plt.show()
\ No newline at end of file
+            show_solution(grid, points_path)
\ No newline at end of file
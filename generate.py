@@ -0,0 +1,179 @@
+from pathlib import Path
+import json
+import math
+import time
+import numpy as np
+from maze import MazeGrid
+from reach import get_wall_steps
+
+# Unit and diagonal steps, for the connectivity check
+UNIT_STEPS = ((1, 0), (1, 1), (0, 1), (-1, 1))
+
+# Default longest wall of large mazes
+MAX_WALL_LENGTH = 25
+
+# Wall-free unit and diagonal steps
+def get_free_steps(grid):
+    """
+    Return boolean array of shape (len(UNIT_STEPS), 'row' + 2, 'col' + 2):
+    [s, j, i] is True if the step along UNIT_STEPS[s] from point [i, j]
+    joins two free points of MazeGrid 'grid' and meets no wall. Row and
+    column 0 and the last ones are padding.
+    """
+    row, col = grid.row, grid.col
+    free = np.zeros((row + 2, col + 2), dtype=bool)
+    free[1:row + 1, 1:col + 1] = ~grid.blocked[1:, 1:]
+    steps = np.zeros((len(UNIT_STEPS), row + 2, col + 2), dtype=bool)
+    for s, (a, b) in enumerate(UNIT_STEPS):
+        # Ends of the steps from every point, padding included
+        ends = np.zeros_like(free)
+        ends[1:row + 1, 1:col + 1] = free[1 + b:row + 1 + b, 1 + a:col + 1 + a]
+        steps[s] = free & ends
+    for wall in grid.edges:
+        slope_ids, cols, rows = get_wall_steps(UNIT_STEPS, row, col, wall)
+        steps[slope_ids, rows, cols] = False
+    return steps
+
+# Points joined to a point by unit and diagonal steps
+def get_reached_points(grid, point, free_steps=None):
+    """
+    Return boolean array of shape ('row' + 2, 'col' + 2): [j, i] is True if
+    point [i, j] is joined to 'point' by wall-free unit and diagonal steps
+    ('free_steps', see get_free_steps, computed if None), hence by a path
+    of either model. Breadth-first, one frontier at a time.
+    """
+    if free_steps is None: free_steps = get_free_steps(grid)
+    reached = np.zeros(free_steps.shape[1:], dtype=bool)
+    reached[point[1], point[0]] = True
+    cols, rows = np.array([point[0]]), np.array([point[1]])
+    while len(cols):
+        next_cols, next_rows = [], []
+        for s, (a, b) in enumerate(UNIT_STEPS):
+            forward = free_steps[s, rows, cols]
+            next_cols.append(cols[forward] + a)
+            next_rows.append(rows[forward] + b)
+            backward = free_steps[s, rows - b, cols - a]
+            next_cols.append(cols[backward] - a)
+            next_rows.append(rows[backward] - b)
+        cols, rows = np.concatenate(next_cols), np.concatenate(next_rows)
+        new = ~reached[rows, cols]
+        cols, rows = cols[new], rows[new]
+        reached[rows, cols] = True
+        # Keep each new point once
+        keys = np.unique(rows * free_steps.shape[2] + cols)
+        rows, cols = np.divmod(keys, free_steps.shape[2])
+    return reached
+
+# Length of a random wall
+def get_wall_length(rng, lengths, min_length, max_length, mean_length):
+    """
+    Return a length from 'min_length' to 'max_length': uniform if 'lengths'
+    = "uniform", else exponential of mean 'mean_length' ("exponential",
+    mostly short walls), cut at 'max_length'
+    """
+    if lengths == "uniform": return rng.uniform(min_length, max_length)
+    if lengths == "exponential": return min(min_length + rng.exponential(max(mean_length - min_length, 0)), max_length)
+    raise ValueError(f"Unknown lengths: {lengths}")
+
+# One random maze
+def generate_maze(size, walls=None, lengths="uniform", min_length=1, max_length=None, mean_length=None, diagonal=0.9, connected="yes", min_distance=None, seed=None, attempts=100):
+    """
+    Return maze dictionary of the samples' schema (row, column, edges,
+    start, target), 'size'*'size', with 'walls' walls (if None, 'size' // 2
+    as in the samples, and from size 200 on 'size'**2 // 400, so that the
+    density of walls stays the same). Each wall starts at a random point;
+    with probability 'diagonal' it goes in a random direction that is not
+    axis-aligned (the samples have almost only such walls), else along an
+    axis. Its Euclidean length follows 'lengths' (see get_wall_length;
+    'max_length' defaults to 'size' // 4 up to MAX_WALL_LENGTH, so that
+    large mazes are not cut into closed pockets, and 'mean_length' to
+    'max_length' / 4), and its far end is rounded to a point and clipped
+    to the grid. Start and target are free points at least 'min_distance'
+    apart ('size' // 2 if None); if 'connected' = "yes", the target is one
+    joined to the start by unit and diagonal steps (see
+    get_reached_points). Up to 'attempts' starts are tried before raising
+    ValueError. Same 'seed', same maze.
+    """
+    if size < 2: raise ValueError(f"Size must be at least 2: {size}")
+    rng = np.random.default_rng(seed)
+    if walls is None: walls = max(size // 2, size**2 // 400)
+    if max_length is None: max_length = max(min(size // 4, MAX_WALL_LENGTH), min_length)
+    if mean_length is None: mean_length = max_length / 4
+    if min_distance is None: min_distance = size // 2
+
+    edges = []
+    for _ in range(walls):
+        x1, y1 = (int(value) for value in rng.integers(1, size + 1, 2))
+        axis = rng.random() >= diagonal
+        # Too short, or not of the direction drawn once rounded and
+        # clipped: draw the far end again
+        while True:
+            length = get_wall_length(rng, lengths, min_length, max_length, mean_length)
+            if axis:
+                dx, dy = ((1, 0), (0, 1), (-1, 0), (0, -1))[rng.integers(4)]
+            else:
+                angle = rng.uniform(0, 2 * math.pi)
+                dx, dy = math.cos(angle), math.sin(angle)
+            x2 = min(max(round(x1 + length * dx), 1), size)
+            y2 = min(max(round(y1 + length * dy), 1), size)
+            if (x1, y1) != (x2, y2) and (x1 == x2 or y1 == y2) == axis: break
+        edges.append([[x1, y1], [x2, y2]])
+
+    maze = {"row": size, "column": size, "edges": edges, "start": None, "target": None}
+    grid = MazeGrid(maze)
+    free_points = np.array([grid.get_point(index) for index in grid.free_indices.tolist()]).reshape(-1, 2)
+    free_steps = get_free_steps(grid) if connected == "yes" else None
+    for _ in range(attempts):
+        if not len(free_points): break
+        start = free_points[rng.integers(len(free_points))].tolist()
+        if connected == "yes":
+            reached = get_reached_points(grid, start, free_steps)
+            # Points of the padding are never reached
+            rows, cols = np.nonzero(reached)
+            targets = np.stack([cols, rows], axis=1)
+        else:
+            targets = free_points
+        # Far enough from the start (so never the start itself)
+        targets = targets[np.hypot(*(targets - start).T) >= max(min_distance, 1)]
+        if not len(targets): continue
+        target = targets[rng.integers(len(targets))].tolist()
+        maze["start"], maze["target"] = [int(value) for value in start], [int(value) for value in target]
+        return maze
+    raise ValueError(f"No start and target at least {min_distance} apart in {attempts} attempts")
+
+# Mazes for scaling benchmarks
+def write_mazes(sizes=(100, 200, 300, 500, 700, 1000), samples_per_size=10, seed=0, folder=None, **options):
+    """
+    Write generate_maze('size', seed=('seed', 'size', k), **'options') to
+    'folder'/SizeN/samplek.json (Generated/ if None), k = 1 to
+    'samples_per_size', as the samples are written. Each maze has its
+    own seed, so any one can be made again alone. Return the list of paths.
+    """
+    if folder is None: folder = Path(__file__).parent/"Generated"
+    paths = []
+    for size in sizes:
+        for index in range(1, samples_per_size + 1):
+            maze = generate_maze(size, seed=(seed, size, index), **options)
+            path = Path(folder)/f"Size{size}"/f"sample{index}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(maze, f, indent=1)
+            paths.append(path)
+    return paths
+
+# Scaling curve of the solvers
+def benchmark(sizes=(100, 150, 200), samples_per_size=1, seed=0, model=2, engine="graph", reach_mode="sweep", **options):
+    """
+    Generate mazes (write_mazes) and print the phase times of bench.run_file
+    on each, then the mean total time per size
+    """
+    from bench import run_file
+    for size in sizes:
+        paths = write_mazes((size,), samples_per_size, seed, **options)
+        totals = []
+        for path in paths:
+            start_time = time.perf_counter()
+            result = run_file(path, model, engine, reach_mode=reach_mode, trace_memory="no")
+            totals.append(time.perf_counter() - start_time)
+            print(path.name, {key: value for key, value in result.items() if key != "points"})
+        print(f"Size {size}: {sum(totals) / len(totals):.3f} s per maze")
@@ -0,0 +1,139 @@
+from collections import Counter
+from pathlib import Path
+import contextlib
+import json
+import os
+import threading
+import time
+
+class Profiler:
+    """
+    Opt-in counters and timed phases of the solvers, exported as a Chrome
+    trace (chrome://tracing, Perfetto). Off by default: 'count' is then a
+    flag test, 'phase' returns a shared null context and 'begin' None, so
+    hot code only pays for 'if profiler.enabled'.
+    Counters used by the solvers:
+    - check_intersection: segment/wall pairs tested (scalar or batched);
+    - reach_probes: segments probed while searching reaches;
+    - graph_nodes, graph_edges: size of the graphs built;
+    - heap_pushes, heap_pops: of the path searches;
+    - gurobi_vars, gurobi_constrs: size of the Gurobi models.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.counters = Counter()
+        self.events = []
+        self.origin = time.perf_counter()
+        self.null_phase = contextlib.nullcontext()
+
+    def enable(self):
+        """
+        Reset, then record until disable
+        """
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stop recording (what was recorded is kept)
+        """
+        self.enabled = False
+
+    def reset(self):
+        """
+        Forget the counters and phases recorded
+        """
+        self.counters.clear()
+        self.events.clear()
+        self.origin = time.perf_counter()
+
+    def count(self, name, amount=1):
+        """
+        Add 'amount' to counter 'name'
+        """
+        if self.enabled: self.counters[name] += amount
+
+    def begin(self, name):
+        """
+        Start phase 'name': return the token to give to end (None if off)
+        """
+        if not self.enabled: return None
+        return (name, time.perf_counter())
+
+    def end(self, token, **args):
+        """
+        End the phase of 'token' (from begin), with 'args' shown in the trace
+        """
+        if token is None: return
+        name, start = token
+        self.events.append({
+            "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+            "ts": (start - self.origin) * 1e6, "dur": (time.perf_counter() - start) * 1e6, "args": args,
+        })
+
+    def phase(self, name, **args):
+        """
+        Return context manager timing phase 'name' (see begin and end)
+        """
+        if not self.enabled: return self.null_phase
+        return self.timed_phase(name, args)
+
+    @contextlib.contextmanager
+    def timed_phase(self, name, args):
+        token = self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(token, **args)
+
+    def get_phase_times(self):
+        """
+        Return dictionary of the total time (s) of every phase name
+        """
+        times = Counter()
+        for event in self.events:
+            times[event["name"]] += event["dur"] / 1e6
+        return dict(times)
+
+    def get_trace(self):
+        """
+        Return the Chrome trace-event dictionary of the phases, with the
+        counters as one counter event at the end
+        """
+        events = list(self.events)
+        events.append({
+            "name": "counters", "ph": "C", "pid": os.getpid(), "tid": threading.get_ident(),
+            "ts": (time.perf_counter() - self.origin) * 1e6, "args": dict(self.counters),
+        })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_trace(self, path):
+        """
+        Write get_trace to JSON file 'path'
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.get_trace(), f)
+
+# Profiler of the solvers, off unless enabled
+profiler = Profiler()
+
+# Profile one solve
+def trace_solve(solver, size, index, path=None, **kwargs):
+    """
+    Call 'solver'('size', 'index', **'kwargs') (e.g. solve_with_second_model
+    or mohinh.solve_maze) with the profiler on, inside phase "solve", and
+    save its Chrome trace to 'path' (Traces/SizeN/sampleK_<solver>.json if
+    None). Return (result of the solver, counters, phase times).
+    """
+    if path is None: path = Path(__file__).parent/"Traces"/f"Size{size}"/f"sample{index}_{solver.__name__}.json"
+    enabled = profiler.enabled
+    profiler.enable()
+    try:
+        with profiler.phase("solve", solver=solver.__name__, size=size, index=index):
+            result = solver(size, index, **kwargs)
+    finally:
+        profiler.save_trace(path)
+        profiler.enabled = enabled
+    return result, dict(profiler.counters), profiler.get_phase_times()
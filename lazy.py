@@ -0,0 +1,317 @@
+import heapq
+import math
+import time
+from pathlib import Path
+import numpy as np
+from reach import get_reach_backend
+from search import NoPathError, PathInfo
+from slopes import get_grid_slopes
+from instrument import profiler
+
+class LazyGraph:
+    """
+    Moves of models 1 and 2 between adjacent lattice points of MazeGrid
+    'grid', generated while searching instead of from nodes_info. Points
+    are numbered as coords_to_num; directions as in TurnGraph: 2s is slope
+    s of get_grid_slopes, 2s + 1 its opposite. Reaches are computed on
+    first use and memoized: for every direction of a point at once (with
+    'reach_mode', see get_reach_backend) when the search turns there, for
+    a single ray (with grid.walls) when it only goes on straight, which
+    also gives the reach of the rest of the run.
+    """
+    def __init__(self, grid, reach_mode="visibility"):
+        self.grid = grid
+        self.row, self.col = grid.row, grid.col
+        slopes = np.array(get_grid_slopes(self.row, self.col), dtype=np.int64).reshape(-1, 2)
+        self.directions = np.stack([slopes, -slopes], axis=1).reshape(-1, 2)
+        # Lengths rounded as get_Cartesian_length
+        self.lengths = np.repeat([round(math.sqrt(a*a + b*b), 5) for a, b in slopes.tolist()], 2).astype(np.float64)
+        # Change of point number along every direction
+        self.steps = self.col * self.directions[:, 1] + self.directions[:, 0]
+        self.reach_mode = reach_mode
+        self.walls = get_reach_backend(grid.edges, reach_mode)
+        self.point_reaches = {}
+        self.ray_reaches = {}
+        self.computed = 0
+        self.memoized = 0
+
+    def __len__(self):
+        """
+        Number of directions
+        """
+        return len(self.directions)
+
+    def get_point(self, num):
+        """
+        Return point [i, j] of number 'num'
+        """
+        return [(num - 1) % self.col + 1, (num - 1) // self.col + 1]
+
+    def get_max_reaches(self, point, directions):
+        """
+        Return the smallest number of steps along each of 'directions' from
+        'point' that leaves the grid
+        """
+        def get_axis_reaches(current, steps, size):
+            safe_steps = np.where(steps == 0, 1, np.abs(steps))
+            return np.where(
+                steps == 0, size,
+                np.where(steps > 0, size - current, current - 1) // safe_steps + 1,
+            )
+        return np.minimum(
+            get_axis_reaches(point[0], directions[:, 0], self.col),
+            get_axis_reaches(point[1], directions[:, 1], self.row),
+        )
+
+    def get_point_reaches(self, num):
+        """
+        Return array of the reaches from point 'num' along every direction
+        """
+        reaches = self.point_reaches.get(num)
+        if reaches is not None:
+            self.memoized += 1
+            return reaches
+        point = self.get_point(num)
+        max_reaches = self.get_max_reaches(point, self.directions)
+        reaches = np.zeros(len(self.directions), dtype=np.int64)
+        inside = np.flatnonzero(max_reaches > 1)
+        if len(inside):
+            reaches[inside] = self.walls.get_reaches(point, self.directions[inside], max_reaches[inside])
+        self.computed += len(inside)
+        self.point_reaches[num] = reaches
+        return reaches
+
+    def get_reach(self, num, direction):
+        """
+        Return the reach from point 'num' along 'direction'
+        """
+        reaches = self.point_reaches.get(num)
+        if reaches is not None:
+            self.memoized += 1
+            return int(reaches[direction])
+        reach = self.ray_reaches.get((num, direction))
+        if reach is not None:
+            self.memoized += 1
+            return reach
+        point = self.get_point(num)
+        max_reach = int(self.get_max_reaches(point, self.directions[direction:direction + 1])[0])
+        reach = self.grid.walls.get_reach(point, self.directions[direction], max_reach) if max_reach > 1 else 0
+        self.computed += 1
+        # The rest of the run
+        step = int(self.steps[direction])
+        for count in range(reach + 1):
+            self.ray_reaches[(num + count * step, direction)] = reach - count
+        return reach
+
+    def update_walls(self, grid, changed_lines):
+        """
+        Use the walls of MazeGrid 'grid', and forget the reaches along the
+        lines that changed: 'changed_lines' is (slope ids, point numbers),
+        one item per point of these lines (see DynamicMaze.edit)
+        """
+        self.grid = grid
+        self.walls = get_reach_backend(grid.edges, self.reach_mode)
+        for slope_id, num in zip(*(values.tolist() for values in changed_lines)):
+            self.point_reaches.pop(num, None)
+            self.ray_reaches.pop((num, 2 * slope_id), None)
+            self.ray_reaches.pop((num, 2 * slope_id + 1), None)
+
+    def count_reaches(self):
+        """
+        Return the number of reaches (free point, direction whose first step
+        stays in the grid) that building nodes_info answers
+        """
+        free = np.zeros((self.row + 2, self.col + 2), dtype=np.int64)
+        free[1:-1, 1:-1] = ~self.grid.blocked[1:, 1:]
+        # Free points in any rectangle, from the sums of the lower left ones
+        sums = free.cumsum(axis=0).cumsum(axis=1)
+        total = 0
+        for a, b in self.directions.tolist():
+            # Points [i, j] with 1 <= i + a <= col and 1 <= j + b <= row
+            low_col, high_col = max(1, 1 - a), min(self.col, self.col - a)
+            low_row, high_row = max(1, 1 - b), min(self.row, self.row - b)
+            if low_col > high_col or low_row > high_row: continue
+            total += int(
+                sums[high_row, high_col] - sums[low_row - 1, high_col]
+                - sums[high_row, low_col - 1] + sums[low_row - 1, low_col - 1]
+            )
+        return total
+
+# Shortest path of model 1 or 2, expanding the graph while searching
+def find_lazy_path(graph, start, target, acute, right_or_obtuse, model=2, stats=None, search="dijkstra"):
+    """
+    Return PathInfo (nodes numbered as coords_to_num) of the cheapest path
+    from point 'start' to point 'target' in LazyGraph 'graph', for model
+    'model', with Dijkstra or A* ('search' = "astar"), over states (point,
+    incoming direction). The moves of a state are generated when it is
+    expanded, with the costs of find_turn_path (model 2: going back is
+    free) or of SlopeGraph (model 1: no going back; turning at 'start' is
+    free and 'target' is reached by any move if they have two lines or
+    more, else only along their line). If 'stats' is a dictionary, the
+    numbers of expanded and pushed states and of reaches computed,
+    memoized and avoided (see LazyGraph.count_reaches) are stored in it.
+    """
+    if model not in (1, 2): raise ValueError(f"Unknown model: {model}")
+    if search not in ("dijkstra", "astar"): raise ValueError(f"Unknown search: {search}")
+    num_directions = len(graph)
+    directions_x = np.ascontiguousarray(graph.directions[:, 0])
+    directions_y = np.ascontiguousarray(graph.directions[:, 1])
+    steps = graph.steps.tolist()
+    lengths = graph.lengths.tolist()
+    col = graph.col
+    start_num = col * (start[1] - 1) + start[0]
+    target_num = col * (target[1] - 1) + target[0]
+    min_turn = min(acute, right_or_obtuse)
+
+    # Lower bound of the remaining cost (see get_turn_heuristic): lengths
+    # are rounded to 5 digits, hence the 1e-5
+    def estimate(num, direction):
+        if search == "dijkstra": return 0
+        current_col, current_row = (num - 1) % col + 1, (num - 1) // col + 1
+        to_x, to_y = target[0] - current_col, target[1] - current_row
+        a, b = directions_x[direction], directions_y[direction]
+        off_line = a * to_y != b * to_x
+        if model == 1: off_line = off_line and a * (start[1] - current_row) != b * (start[0] - current_col)
+        return math.sqrt(to_x * to_x + to_y * to_y) * (1 - 1e-5) + (min_turn if off_line else 0)
+
+    # Model 1: lines at 'start' and 'target'
+    def get_lines(num):
+        reaches = graph.get_point_reaches(num)
+        return np.flatnonzero((reaches[0::2] > 0) | (reaches[1::2] > 0))
+    start_lines, target_lines = get_lines(start_num), get_lines(target_num)
+    if model == 1 and len(target_lines) == 1:
+        target_directions = {2 * int(target_lines[0])}
+    else:
+        target_directions = None
+
+    dist = {}
+    previous = {}
+    heap = []
+    expanded = pushed = 0
+    # Once a point is expanded at distance d0 (model 2), see find_turn_path
+    best_expanded = {}
+    window = acute - right_or_obtuse
+
+    def push(num, direction, cost, state):
+        nonlocal pushed
+        next_state = num * num_directions + direction
+        if cost < dist.get(next_state, math.inf):
+            dist[next_state] = cost
+            previous[next_state] = state
+            heapq.heappush(heap, (cost + estimate(num, direction), next_state, cost))
+            pushed += 1
+
+    if start_num == target_num: return PathInfo([start_num], [], [], 0)
+    start_reaches = graph.get_point_reaches(start_num)
+    first_directions = np.flatnonzero(start_reaches > 0)
+    if model == 1 and len(start_lines) == 1:
+        first_directions = first_directions[first_directions == 2 * start_lines[0]]
+    for direction in first_directions.tolist():
+        push(start_num + steps[direction], direction, lengths[direction], -1)
+
+    last_state = -1
+    while heap:
+        _, state, current = heapq.heappop(heap)
+        if current > dist[state]: continue
+        expanded += 1
+        num, direction = divmod(state, num_directions)
+        if num == target_num and (target_directions is None or direction in target_directions):
+            last_state = state
+            break
+
+        # Going on in the same line, and back (model 2): no turning cost
+        if graph.get_reach(num, direction) > 0:
+            push(num + steps[direction], direction, current + lengths[direction], state)
+        if model == 2:
+            # The move that led here can be taken back
+            push(num - steps[direction], direction ^ 1, current + lengths[direction], state)
+
+        # Turning
+        if model == 1:
+            if num == target_num: continue
+            if num == start_num:
+                # Free, if 'start' has two lines or more
+                if len(start_lines) < 2: continue
+                reaches = graph.get_point_reaches(num)
+                for next_direction in np.flatnonzero(reaches > 0).tolist():
+                    push(num + steps[next_direction], next_direction, current + lengths[next_direction], state)
+                continue
+            acute_allowed = True
+        else:
+            best = best_expanded.get(num)
+            if best is None or current < best: best_expanded[num] = current
+            elif current >= best + window: continue
+            acute_allowed = best is None or current < best
+        reaches = graph.get_point_reaches(num)
+        cross = directions_x[direction] * directions_y - directions_y[direction] * directions_x
+        dot = directions_x[direction] * directions_x + directions_y[direction] * directions_y
+        turn = (reaches > 0) & (cross != 0)
+        if not acute_allowed: turn &= dot >= 0
+        next_directions = np.flatnonzero(turn)
+        costs = current + graph.lengths[next_directions] + np.where(dot[next_directions] < 0, acute, right_or_obtuse)
+        for next_direction, cost in zip(next_directions.tolist(), costs.tolist()):
+            push(num + steps[next_direction], next_direction, cost, state)
+
+    if profiler.enabled:
+        profiler.count("heap_pushes", pushed)
+        profiler.count("heap_pops", pushed - len(heap))
+    if stats is not None:
+        stats["expanded"] = expanded
+        stats["pushed"] = pushed
+        stats["reach_computed"] = graph.computed
+        stats["reach_memoized"] = graph.memoized
+        stats["reach_total"] = graph.count_reaches()
+        stats["reach_avoided"] = stats["reach_total"] - graph.computed
+    if last_state < 0: raise NoPathError(f"Could not find a path from {start} to {target}")
+
+    # States of the path, from the last one
+    states = []
+    while last_state >= 0:
+        states.append(last_state)
+        last_state = previous[last_state]
+    states.reverse()
+    nodes = [start_num] + [state // num_directions for state in states]
+    costs = [dist[states[0]]] + [dist[state] - dist[previous_state] for previous_state, state in zip(states, states[1:])]
+    return PathInfo(nodes, costs, costs, dist[states[-1]])
+
+# Benchmark the lazy engine against building the whole graph
+def benchmark(sizes=(20, 40, 60, 80, 100), samples_per_size=1, models=(1, 2), search="astar"):
+    """
+    For the first 'samples_per_size' samples of every size in 'sizes', solve
+    every model of 'models' with 'search', lazily and from the whole graph
+    (with the artifact cache off, so nodes_info is built), and record the
+    runtimes, the optimal values and the reaches computed and avoided by
+    the lazy engine. Return a list of dictionaries, one per sample and
+    model.
+    """
+    import contextlib
+    import io
+    from cache import default_cache
+    from fun_with_dijkstar import solve_with_first_model, solve_with_second_model
+    solvers = {1: (solve_with_first_model, "graph"), 2: (solve_with_second_model, "native")}
+    results = []
+    for size in sizes:
+        for index in range(1, samples_per_size + 1):
+            if not (Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json").exists(): break
+            for model in models:
+                result = {"size": size, "sample": index, "model": model}
+                solver, full_engine = solvers[model]
+                for name, engine in (("lazy", "lazy"), ("full", full_engine)):
+                    stats = {}
+                    output = io.StringIO()
+                    solve_start = time.time()
+                    enabled, default_cache.enabled = default_cache.enabled, False
+                    try:
+                        with contextlib.redirect_stdout(output):
+                            solver(size, index, search=search, stats=stats, engine=engine)
+                    finally:
+                        default_cache.enabled = enabled
+                    result[f"{name}_s"] = time.time() - solve_start
+                    values = [line for line in output.getvalue().splitlines() if line.startswith("Optimal value")]
+                    result[f"{name}_cost"] = float(values[0].split()[-1]) if values else None
+                    if name == "lazy":
+                        for key in ("expanded", "reach_computed", "reach_total", "reach_avoided"):
+                            result[key] = stats.get(key)
+                print(result)
+                results.append(result)
+    return results
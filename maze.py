@@ -0,0 +1,125 @@
+from functools import lru_cache
+from pathlib import Path
+import json
+import numpy as np
+from walls import WallArray
+
+# Mask of the points on walls
+def get_blocked_mask(edges, row, col):
+    """
+    Return boolean array of shape ('row' + 1, 'col' + 1): [j, i] is True if
+    point [i, j] lies on a wall of 'edges'. Row 0 and column 0 are padding,
+    so that points are used as indices directly.
+    """
+    blocked = np.zeros((row + 1, col + 1), dtype=bool)
+    if not edges: return blocked
+    ends = np.asarray(edges, dtype=np.int64).reshape(-1, 4)
+    dx, dy = ends[:, 2] - ends[:, 0], ends[:, 3] - ends[:, 1]
+    # Integral points of a wall are its first end + k*(dx, dy)/d, k = 0..d
+    steps = np.gcd(dx, dy)
+    safe_steps = np.maximum(steps, 1)
+    counts = steps + 1
+    wall_ids = np.repeat(np.arange(len(ends)), counts)
+    k = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = ends[wall_ids, 0] + k * (dx // safe_steps)[wall_ids]
+    rows = ends[wall_ids, 1] + k * (dy // safe_steps)[wall_ids]
+    inside = (cols >= 1) & (cols <= col) & (rows >= 1) & (rows <= row)
+    blocked[rows[inside], cols[inside]] = True
+    return blocked
+
+class MazeGrid:
+    """
+    A maze, preprocessed once for every solver: boolean mask of the points
+    on walls ('blocked'[j, i] for point [i, j]), flat numbers of the free
+    points (row by row, from 0, as in unreachable.point_to_index), start
+    and target, and the walls sorted from longest to shortest (taxicab
+    length, as sort_edge_list) as a list and as a WallArray.
+    """
+    def __init__(self, maze):
+        self.maze = maze
+        self.row, self.col = maze["row"], maze["column"]
+        self.start, self.target = maze["start"], maze["target"]
+        self.edges = sorted(
+            maze["edges"],
+            key=lambda x: abs(x[0][0] - x[1][0]) + abs(x[0][1] - x[1][1]),
+            reverse=True,
+        )
+        self.walls = WallArray(self.edges)
+        self.blocked = get_blocked_mask(self.edges, self.row, self.col)
+        self.blocked.setflags(write=False)
+        self.free_indices = np.flatnonzero(~self.blocked[1:, 1:])
+        self.free_indices.setflags(write=False)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load maze from sample file 'path'
+        """
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        """
+        Number of free points
+        """
+        return len(self.free_indices)
+
+    def in_grid(self, point):
+        """
+        Check if 'point' is a point of the grid
+        """
+        return 1 <= point[0] <= self.col and 1 <= point[1] <= self.row
+
+    def is_blocked(self, point):
+        """
+        Check if 'point' (in the grid) lies on a wall
+        """
+        return bool(self.blocked[point[1], point[0]])
+
+    def get_index(self, point):
+        """
+        Return flat number of 'point'
+        """
+        return (point[1] - 1) * self.col + point[0] - 1
+
+    def get_point(self, index):
+        """
+        Return point [i, j] of flat number 'index'
+        """
+        return [index % self.col + 1, index // self.col + 1]
+
+    def get_free_points(self, order="row"):
+        """
+        Return list of free points [i, j], j before i if 'order' = "row",
+        i before j if 'order' = "column"
+        """
+        rows, cols = np.nonzero(~self.blocked[1:, 1:])
+        if order == "column":
+            cols, rows = np.nonzero(~self.blocked[1:, 1:].T)
+        elif order != "row":
+            raise ValueError(f"Unknown order: {order}")
+        return np.stack([cols + 1, rows + 1], axis=1).tolist()
+
+    def get_redundant_points(self):
+        """
+        Return list of the points [i, j] on walls, j before i
+        """
+        rows, cols = np.nonzero(self.blocked)
+        return np.stack([cols, rows], axis=1).tolist()
+
+    def validate(self):
+        """
+        Return the reason why start or target is invalid, None if both are valid
+        """
+        for name, point in (("Start", self.start), ("Target", self.target)):
+            if not self.in_grid(point): return f"Invalid: {name} is outside the grid"
+            if self.is_blocked(point): return f"Invalid: {name} is on the wall"
+        return None
+
+# Load every sample once
+@lru_cache(maxsize=32)
+def load_maze_grid(size, index):
+    """
+    Return MazeGrid of sample 'index' of size 'size'
+    """
+    return MazeGrid.from_file(Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json")
@@ -3,8 +3,17 @@ import json
 import gurobipy as gp
 from gurobipy import GRB
 import numpy as np
+from scipy import sparse
 import math
 import time
+from concurrent.futures import ProcessPoolExecutor
+from reach import get_all_slopes, get_reach_backend
+from slopes import get_grid_slopes, get_point_slope_ids
+from unreachable import UnreachableNodes, load_unreachable_nodes
+from cache import get_cached
+from maze import load_maze_grid
+from search import TurnGraph, get_pseudo_angles
+from instrument import profiler
 
 class Constant:
     """
@@ -22,6 +31,7 @@ def check_intersection(point1, point2, edge):
     """
     Check intersection of segment ['point1', 'point2'] with 'edge'
     """
+    if profiler.enabled: profiler.count("check_intersection")
     a1, b1, a2, b2 = edge[0][0], edge[0][1], edge[1][0], edge[1][1]
     x1, y1, x2, y2 = point1[0], point1[1], point2[0], point2[1]
     """
@@ -72,11 +82,12 @@ def check_intersection(point1, point2, edge):
         cond_v = (all([d > 0, d2 >= 0, d2 - d <= 0]) or all([d < 0, d2 <= 0, d2 - d >= 0]))
         return all([cond_u, cond_v])
 
-# Get reach from a point
-def get_furthest_reach(point, slope, row, col, edge_list):
+# Get an (exclusive) upper bound for the reach from a point, from the grid
+# boundary only
+def get_max_reach(point, slope, row, col):
     """
-    Get furthest expansion from 'point' in the direction given by 'slope',
-    in a 'row'*'col' grid with 'edge_list' as obstacles.
+    Return the smallest number of 'slope' steps from 'point' that leaves the
+    'row'*'col' grid.
     """
     current_col, current_row = point[0], point[1]
     col_slope, row_slope = slope[0], slope[1]
@@ -87,10 +98,26 @@ def get_furthest_reach(point, slope, row, col, edge_list):
     # Get maximum row reach
     if row_slope == 0: max_row_reach = row
     else: max_row_reach = int((row - current_row) / row_slope) + 1
+    return min(max_row_reach, max_col_reach)
+
+# Get reach from a point
+def get_furthest_reach(point, slope, row, col, edge_list):
+    """
+    Get furthest expansion from 'point' in the direction given by 'slope',
+    in a 'row'*'col' grid with 'edge_list' as obstacles. 'edge_list' can
+    also be a reach backend from reach.get_reach_backend: WallArray (all
+    walls tested at once), WallIndex (only walls near the ray are tested)
+    or VisibilitySweep (one angular sweep around 'point').
+    """
+    current_col, current_row = point[0], point[1]
+    col_slope, row_slope = slope[0], slope[1]
+    max_reach = get_max_reach(point, slope, row, col)
+    if hasattr(edge_list, "get_reaches"):
+        return edge_list.get_reach(point, slope, max_reach)
 
     min_reach = 0
-    max_reach = min(max_row_reach, max_col_reach)
     while max_reach - min_reach > 1:
+        if profiler.enabled: profiler.count("reach_probes")
         temp = min_reach
         new_reach = int((max_reach + min_reach) / 2)
         min_reach = new_reach
@@ -102,6 +129,18 @@ def get_furthest_reach(point, slope, row, col, edge_list):
                 break
     return min_reach
 
+# Get reach from a point, for several slopes at once
+def get_furthest_reaches(point, slopes, row, col, edge_list):
+    """
+    Same as get_furthest_reach, for every slope in 'slopes'. With a reach
+    backend as 'edge_list' (e.g. a WallArray, testing all probes of all
+    slopes in a single vectorized call), all slopes are handled at once.
+    """
+    if hasattr(edge_list, "get_reaches"):
+        max_reaches = [get_max_reach(point, slope, row, col) for slope in slopes]
+        return edge_list.get_reaches(point, slopes, max_reaches).tolist()
+    return [get_furthest_reach(point, slope, row, col, edge_list) for slope in slopes]
+
 # Get points on a segment, for first-stage filtering of redundant vertices,
 # among other purposes
 def get_points_between(point1, point2):
@@ -125,18 +164,7 @@ def get_maximum_number_of_vertices(size, index):
     """
     Get maximum number of vertices for a feasible path of given maze.
     """
-    grid_path = Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json"
-    with open(grid_path, "r") as f:
-        edges = json.load(f)["edges"]
-    redundant_points = set()
-    # Filter redundant points from points_list
-    for edge in edges:
-        points_to_remove = get_points_between(edge[0], edge[1])
-        for point in points_to_remove:
-            # add to redundant_points
-            redundant_points.add(tuple(point))
-    redundant_points = list(redundant_points)
-    return size**2 - len(redundant_points)
+    return len(load_maze_grid(size, index))
 
 # Sort edge_list, for faster execution
 def sort_edge_list(edge_list):
@@ -161,7 +189,8 @@ def reduce_tuple(iter):
     return (int(a/d), int(b/d))
 
 # Get available slopes from a specified position
-# Note: This method uses a set, which means order will change each run
+# Note: Slopes are clipped from the cached slopes of the grid (see slopes.py),
+# so they always come in the same order (increasing angle)
 def get_slopes(current_col, current_row, row, col):
     """
     Return list of slopes for point ('i', 'j') in a
@@ -169,13 +198,8 @@ def get_slopes(current_col, current_row, row, col):
     irreducible list [a, b], in the right-upward direction (i.e b > 0,
     or b = 0 and a > 0)
     """
-    slope_set = set()
-    if current_col < col:
-        slope_set.add((1, 0))
-    for row_index in range(current_row + 1, row + 1):
-        for col_index in range(1, col + 1):
-            slope_set.add(reduce_tuple((col_index - current_col, row_index - current_row)))
-    return list(slope_set)
+    grid_slopes = get_grid_slopes(row, col)
+    return [list(grid_slopes[slope_id]) for slope_id in get_point_slope_ids(current_col, current_row, row, col).tolist()]
 
 # Generate slopes for square grids, put save = "yes" for local save of slopes.
 # Return None if save = "yes"
@@ -198,112 +222,214 @@ def generate_slopes(size, save="no"):
     return slope_dict
 
 # Generate unreachable_nodes
-def get_unreachable_nodes(size, index):
+def get_unreachable_nodes(size, index, reach_backend = "array", workers = 1):
+    """
+    In-program generation of unreachable_nodes. 'reach_backend' is one of
+    "array", "index" or "visibility" (see reach.get_reach_backend).
+    Points are split across 'workers' processes if 'workers' > 1.
+    """
+    grid = load_maze_grid(size, index)
+    # Same result for every backend, so cached (see cache.py)
+    return get_cached(
+        grid.maze, "unreachable_nodes",
+        lambda: generate_unreachable_nodes(size, grid, reach_backend, workers),
+    )
+
+# Generate unreachable_nodes of a maze
+def generate_unreachable_nodes(size, grid, reach_backend = "array", workers = 1):
     """
-    In-program generation of unreachable_nodes
+    Return unreachable_nodes of maze 'grid' (a MazeGrid), without the
+    cache. With 'workers' > 1, consecutive chunks of points are handled by
+    a process pool, and partial results are merged in order of the
+    chunks, which gives exactly the serial result.
     """
-    # List of all points (to be filtered and used later)
+    # List of all points not on walls (to be used later)
     # Note: j before i
-    points_list = [[i, j] for j in range(1, size + 1) for i in range(1, size + 1)]
-
-    unreachable_nodes = {
-        f"{i}_{j}": []
-        for j in range(1, size + 1) for i in range(1, size + 1)
-    }
-
-    # Two options for nodes_slopes, one through local save, another through
-    # in-program generation. Testing seems to prefer the save and read option.
-    slopes_path = Path(__file__).parent/"Slopes"/f"Size{size}"
-    with open(slopes_path, "r") as f:
-        node_slopes = json.load(f)
-
-    # node_slopes = generate_slopes(size=size)
-
-    grid_path = Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json"
-    with open(grid_path, "r") as f:
-        grid_info = json.load(f)
-
-    # Get edges, then sort (for faster execution)
-    edges = grid_info["edges"]
-    edges = sort_edge_list(edge_list=edges)
-    redundant_points = set()
-    # Filter redundant points from points_list
-    for edge in edges:
-        points_to_remove = get_points_between(edge[0], edge[1])
-        for point in points_to_remove:
-            # remove from points_list
-            try:
-                points_list.remove(point)
-            except:
-                pass
-
-            # remove from unreachable_nodes
-            key = f"{point[0]}_{point[1]}"
-            try:
-                del unreachable_nodes[key]
-            except:
-                pass
-            # add to redundant_points
-            redundant_points.add(tuple(point))
-    redundant_points = list(redundant_points)
+    points_list = grid.get_free_points()
+
+    unreachable_nodes = {f"{i}_{j}": [] for i, j in points_list}
 
     # Generate unreachable_nodes
-    for current_col, current_row in points_list:
+    if workers <= 1:
+        partials = [get_partial_unreachable_nodes(size, grid, points_list, reach_backend)]
+    else:
+        # Several chunks per worker, to balance the load
+        chunk_size = max(1, math.ceil(len(points_list) / (4 * workers)))
+        chunks = [points_list[begin:begin + chunk_size] for begin in range(0, len(points_list), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(get_partial_unreachable_nodes, size, grid, chunk, reach_backend)
+                for chunk in chunks
+            ]
+            partials = [future.result() for future in futures]
+    for partial in partials:
+        for key, points in partial.items():
+            unreachable_nodes[key] += points
+    return unreachable_nodes
+
+# Entries added to unreachable_nodes by a chunk of points
+def get_partial_unreachable_nodes(size, grid, points, reach_backend = "array"):
+    """
+    Return dictionary of the lists that the points of 'points', handled in
+    order, add to unreachable_nodes. A slope is handled from a point only if
+    no run from an earlier point goes through it, i.e. if the previous
+    point along the slope is outside the grid, on a wall, or separated from
+    it by a wall; this only depends on the point itself, so any chunk of
+    points can be handled alone.
+    """
+    walls = grid.walls if reach_backend == "array" else get_reach_backend(grid.edges, reach_backend)
+    partial = dict()
+    for current_col, current_row in points:
         point = [current_col, current_row]
-        for slope in node_slopes[f"{current_col}_{current_row}"]:
-            # The following is to get the furthest possible reach in a
-            # given direction
+        slopes = get_slopes(current_col, current_row, size, size)
+        # Skip slopes whose run from the previous point goes on through 'point'
+        previous_points = [[current_col - slope[0], current_row - slope[1]] for slope in slopes]
+        candidates = [
+            k for k, (col, row) in enumerate(previous_points)
+            if 1 <= col <= size and row >= 1 and not grid.blocked[row, col]
+        ]
+        handled = [True] * len(slopes)
+        if candidates:
+            blocked = grid.walls.intersects_batch([previous_points[k] for k in candidates], [point] * len(candidates))
+            for k, check in zip(candidates, blocked.tolist()):
+                handled[k] = check
+        slopes = [slope for slope, check in zip(slopes, handled) if check]
+        # The following is to get the furthest possible reach in every
+        # direction, all at once
+        reaches = get_furthest_reaches(point, slopes, size, size, walls)
+        for slope, min_reach in zip(slopes, reaches):
             col_slope, row_slope = slope[0], slope[1]
-            # Get maximum column reach
-            if col_slope == 0: max_col_reach = size
-            elif col_slope > 0: max_col_reach = int((size - current_col) / col_slope) + 1
-            else: max_col_reach = int((current_col - 1) / (-col_slope)) + 1
-            # Get maximum row reach
-            if row_slope == 0: max_row_reach = size
-            else: max_row_reach = int((size - current_row) / row_slope) + 1
-
-            min_reach = 0
-            max_reach = min(max_row_reach, max_col_reach)
-            max_valid_reach = max_reach - 1
-            while max_reach - min_reach > 1:
-                temp = min_reach
-                new_reach = int((max_reach + min_reach) / 2)
-                min_reach = new_reach
-                test_point = [current_col + new_reach * col_slope, current_row + new_reach * row_slope]
-                for edge in edges:
-                    if check_intersection(point, test_point, edge):
-                        max_reach = new_reach
-                        min_reach = temp
-                        break
+            max_valid_reach = get_max_reach(point, slope, size, size) - 1
 
             first_group = []
             second_group = []
 
             for i in range(min_reach + 1):
                 point_to_add = [current_col + i * col_slope, current_row + i * row_slope]
-                if tuple(point_to_add) not in redundant_points:
+                if not grid.blocked[point_to_add[1], point_to_add[0]]:
                     first_group.append(point_to_add)
 
             for i in range(min_reach + 1, max_valid_reach + 1):
                 point_to_add = [current_col + i * col_slope, current_row + i * row_slope]
-                if tuple(point_to_add) not in redundant_points:
+                if not grid.blocked[point_to_add[1], point_to_add[0]]:
                     second_group.append(point_to_add)
 
             for checkpoint in second_group:
                 key = f"{checkpoint[0]}_{checkpoint[1]}"
-                unreachable_nodes[key] += first_group
+                partial.setdefault(key, []).extend(first_group)
                 
             first_point = first_group.pop(0)
             key = f"{first_point[0]}_{first_point[1]}"
-            unreachable_nodes[key] += second_group
+            partial.setdefault(key, []).extend(second_group)
             for checkpoint in first_group:
                 key = f"{checkpoint[0]}_{checkpoint[1]}"
-                unreachable_nodes[key] += second_group
-                try:
-                    node_slopes[key].remove(slope)
-                except:
-                    pass
-    return unreachable_nodes
+                partial.setdefault(key, []).extend(second_group)
+    return partial
+
+# Generate unreachable_nodes, then save them as binary files (see unreachable.py)
+def save_unreachable_nodes(size, index, reach_backend = "array", workers = 1):
+    """
+    Generate unreachable_nodes of sample 'index' of size 'size' and save
+    them in the binary format read by the MILP solvers
+    """
+    unreachable_nodes = get_unreachable_nodes(size, index, reach_backend, workers)
+    UnreachableNodes.from_dict(unreachable_nodes, size).save(index)
+
+# Giải mô hình, ghi lại thời gian lập và giải mô hình (xem instrument.py)
+def optimize_model(model, build):
+    """
+    End phase 'build' (from profiler.begin) of Gurobi 'model', then
+    optimize it in phase "gurobi_optimize"
+    """
+    if profiler.enabled:
+        # Cập nhật mô hình để đếm số biến và số ràng buộc
+        model.update()
+        profiler.count("gurobi_vars", model.NumVars)
+        profiler.count("gurobi_constrs", model.NumConstrs + model.NumQConstrs + model.NumGenConstrs)
+    profiler.end(build)
+    with profiler.phase("gurobi_optimize"):
+        model.optimize()
+
+# Vị trí của một đỉnh trong danh sách các đỉnh không nằm trên tường
+def get_free_position(grid, point):
+    """
+    Return position of free 'point' in grid.free_indices, that is, of its
+    variables in add_point_variables
+    """
+    return int(np.searchsorted(grid.free_indices, grid.get_index(point)))
+
+# Ma trận thưa của các đỉnh không tới được
+def get_unreachable_matrix(grid, unreachable_nodes):
+    """
+    Return CSR matrix U over the free points of 'grid' (in order of
+    grid.free_indices): U[p, q] = 1 if q is unreachable from p.
+    'unreachable_nodes' is the dictionary of get_unreachable_nodes or
+    UnreachableNodes, whose CSR arrays are used directly.
+    """
+    if not isinstance(unreachable_nodes, UnreachableNodes):
+        unreachable_nodes = UnreachableNodes.from_dict(unreachable_nodes, grid.row)
+    num_points = grid.row * grid.col
+    indices = np.asarray(unreachable_nodes.indices, dtype=np.int64)
+    offsets = np.asarray(unreachable_nodes.offsets, dtype=np.int64)
+    matrix = sparse.csr_matrix((np.ones(len(indices)), indices, offsets), shape=(num_points, num_points))
+    # Các đỉnh trên tường không có biến
+    matrix = matrix[grid.free_indices][:, grid.free_indices]
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+# Biến và ràng buộc tuyến tính của các đỉnh, dựng bằng ma trận thưa
+def add_point_variables(model, grid, unreachable_nodes, N, one_per_step = "no"):
+    """
+    Add to 'model', with the matrix API (one addMVar, addMConstr of scipy
+    sparse blocks), the binary x[k - 1, p] = 1 if vertex k is free point p
+    of 'grid' (in order of grid.free_indices: points on walls get no
+    variable), the coordinates a[k], b[k] and the binary count[k] of
+    vertices k = 1..N, with the linear constraints of the models:
+    coordinates and count[k] = sum of x[k - 1, :], each point at most
+    once, no step from a point to one of its unreachable nodes (see
+    get_unreachable_matrix) and, if 'one_per_step' = "yes", exactly one
+    point per vertex. Return (x, a, b, count): x as MVar of shape
+    (N, number of free points), a, b and count as arrays of Var indexed
+    from 1, as the models use them.
+    """
+    num_free = len(grid.free_indices)
+    cols = grid.free_indices % grid.col + 1
+    rows = grid.free_indices // grid.col + 1
+    num_x = N * num_free
+
+    # Một MVar cho tất cả: x (đỉnh thứ nhất, rồi thứ hai, ...), a, b, count
+    ub = np.concatenate([np.ones(num_x), np.full(2 * N, grid.row), np.ones(N)])
+    vtype = np.concatenate([np.full(num_x, GRB.BINARY), np.full(2 * N, GRB.CONTINUOUS), np.full(N, GRB.BINARY)])
+    variables = model.addMVar(num_x + 3 * N, lb=0, ub=ub, vtype=vtype)
+    x = variables[:num_x]
+
+    # Tính tọa độ a, b và biến count của đỉnh thứ k: [tổng theo x, -I] = 0
+    identity = sparse.identity(N, format="csr")
+    for position, values in enumerate((cols, rows, np.ones(num_free))):
+        blocks = [sparse.kron(identity, values[None, :])] + [sparse.csr_matrix((N, N))] * 3
+        blocks[1 + position] = -identity
+        model.addMConstr(sparse.hstack(blocks, format="csr"), variables, GRB.EQUAL, np.zeros(N))
+
+    # Mỗi đỉnh (i, j) xuất hiện nhiều nhất một lần
+    model.addMConstr(sparse.kron(np.ones((1, N)), sparse.identity(num_free), format="csr"), x, GRB.LESS_EQUAL, np.ones(num_free))
+
+    # Mỗi bước thứ k, chọn đúng một đỉnh
+    if one_per_step == "yes":
+        model.addMConstr(sparse.kron(identity, np.ones((1, num_free)), format="csr"), x, GRB.EQUAL, np.ones(N))
+
+    # Điều kiện không chạm tường: nếu x[k - 1, p] = 1 thì tổng các x[k, q]
+    # bằng 0, với q là một đỉnh không tới được từ p
+    if N > 1:
+        unreachable = get_unreachable_matrix(grid, unreachable_nodes)
+        matrix = sparse.kron(sparse.eye(N - 1, N), sparse.identity(num_free)) + sparse.kron(sparse.eye(N - 1, N, k=1), unreachable)
+        model.addMConstr(matrix.tocsr(), x, GRB.LESS_EQUAL, np.ones((N - 1) * num_free))
+
+    a, b, count = (np.empty(N + 1, dtype=object) for _ in range(3))
+    a[1:] = variables[num_x:num_x + N].tolist()
+    b[1:] = variables[num_x + N:num_x + 2 * N].tolist()
+    count[1:] = variables[num_x + 2 * N:].tolist()
+    return x.reshape(N, num_free), a, b, count
 
 # Hàm giải với số bước cố định chọn trước
 def solve_maze_with_given_step(size, index, step, status = "optimal"):
@@ -313,47 +439,30 @@ def solve_maze_with_given_step(size, index, step, status = "optimal"):
     """
     # Thiết lập mô hình
     model = gp.Model()
+    build = profiler.begin("gurobi_build")
 
     # Look for any feasible solution if 'status' = "feasible"
     if status == "feasible": model.params.SolutionLimit = 1
 
-    # Generation of nodes through pre-written data, only available for
-    # existing samples of size 40*40 and below. In the long run, an
-    # in-program generation is prefered.
-    nodes_path = Path(__file__).parent/"Unreachable_nodes"/f"Size{size}"/f"sample{index}.json"
-    with open(nodes_path, "r") as f:
-        unreachable_nodes = json.load(f)
+    # Generation of nodes through pre-written data (memory-mapped binary
+    # files if converted, see unreachable.py, else JSON), or in-program
+    # generation (cached) if there is none. Larger samples can be saved
+    # once with save_unreachable_nodes.
+    unreachable_nodes = load_unreachable_nodes(size, index)
+    if unreachable_nodes is None: unreachable_nodes = get_unreachable_nodes(size, index)
 
     # In-program generation
     # unreachable_nodes = get_unreachable_nodes(size, index)
 
-    grid_path = Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json"
-    with open(grid_path, "r") as f:
-        maze = json.load(f)
-    start = maze["start"]
-    target = maze["target"]
-
-    # Get edges
-    edges = maze["edges"]
-
-    redundant_points = set()
-    points_list = [[i, j] for i in range(1, size + 1) for j in range(1, size + 1)]
-    # Filter redundant points from points_list
-    for edge in edges:
-        points_to_remove = get_points_between(edge[0], edge[1])
-        for point in points_to_remove:
-            # remove from points_list
-            try:
-                points_list.remove(point)
-            except:
-                pass
-
-            # add to redundant_points
-            redundant_points.add(tuple(point))
-    redundant_points = list(redundant_points)
-    
+    # Maze, loaded and preprocessed once (see maze.py)
+    grid = load_maze_grid(size, index)
+    invalid = grid.validate()
+    if invalid is not None: raise ValueError(invalid)
+    start = grid.start
+    target = grid.target
+
     # Check validity of number of steps
-    max_step = size**2 - len(redundant_points)
+    max_step = len(grid)
     if step > max_step: 
         raise ValueError(f"Số bước vượt quá số bước tối đa: {max_step}")
 
@@ -361,31 +470,10 @@ def solve_maze_with_given_step(size, index, step, status = "optimal"):
     M = 2*n**2 + 10
     N = step
 
-    x = np.empty((n+1, n+1, N+1), dtype=object)
-    for i in range(1,n+1):
-        for j in range(1,n+1):
-            for k in range(1, N+1):
-                x[i,j,k] = model.addVar(vtype=GRB.BINARY)
-
-    # Tất cả các đỉnh trong redundant_points đều bằng 0
-    for k in range(1, N + 1):
-        for i, j in redundant_points:
-            model.addConstr(x[i, j, k] == 0)
-
-    # Tính tọa độ a, b của đỉnh thứ k
-    a = np.empty((N+1), dtype=object)
-    b = np.empty((N+1), dtype=object)
-    for k in range(1, N+1):
-        a[k] = model.addVar(lb=0, ub=n, vtype= GRB.CONTINUOUS)
-        model.addConstr(gp.quicksum([x[i, j, k]*i for i in range(1,n+1) for j in range(1,n+1)]) == a[k])
-        b[k] = model.addVar(lb=0, ub=n, vtype= GRB.CONTINUOUS)
-        model.addConstr(gp.quicksum([x[i, j, k]*j for i in range(1,n+1) for j in range(1,n+1)]) == b[k])
-
-    # Biến kiểm tra xem đỉnh thứ k có được chọn hay không
-    count = np.empty(N + 1, dtype=object)
-    for k in range(1, N + 1):
-        count[k] = model.addVar(vtype=GRB.BINARY)
-        model.addConstr(count[k] == gp.quicksum([x[i, j, k] for i, j in points_list]))
+    # Biến x[k - 1, p] = 1 nếu đỉnh thứ k là đỉnh p (chỉ các đỉnh không nằm
+    # trên tường), toạ độ a, b, biến count và các ràng buộc tuyến tính của
+    # chúng (kể cả điều kiện không chạm tường), dựng bằng ma trận thưa
+    x, a, b, count = add_point_variables(model, grid, unreachable_nodes, N, one_per_step = "yes")
 
     # Tính quãng đường
     # Không nhân được ba lần
@@ -434,14 +522,6 @@ def solve_maze_with_given_step(size, index, step, status = "optimal"):
     # model.setObjective(0, sense=GRB.MINIMIZE)
 
     # Các ràng buộc
-    # Mỗi bước thứ k, chọn đúng một đỉnh
-    for k in range(1, N + 1):
-        model.addConstr(gp.quicksum([x[i, j, k] for i, j in points_list]) == 1)
-
-    # Mỗi đỉnh (i, j) xuất hiện nhiều nhất 1 lần
-    for i, j in points_list:
-        model.addConstr(gp.quicksum([x[i, j, k] for k in range(1, N + 1)]) <= 1)
-
     """
     Vấn đề tiếp theo là tính góc trong trường hợp có ba đỉnh thẳng hàng, ở
     đây góc sẽ bằng 0, hoặc 180 độ.
@@ -468,16 +548,8 @@ def solve_maze_with_given_step(size, index, step, status = "optimal"):
         model.addConstr(check_collinear >= 1 - M*(1 - b))
 
     # Toạ độ đỉnh đầu, cuối
-    model.addConstr(x[start[0],start[1],1] == 1)
-    model.addConstr(x[target[0],target[1],N] == 1)
-
-    # Điều kiện không chạm tường, được xử lý trước bằng một bước riêng biệt
-    for i, j in points_list:
-        unreachable_points = unreachable_nodes[f"{i}_{j}"]
-        for k in range(1, N):
-            # Mô tả điều kiện: Nếu x[i, j, k] = 1 thì tổng các x[i', j', k + 1] bằng 0,
-            # với (i', j') là một đỉnh trong 'unreachable_points' của (i, j)
-            model.addConstr(x[i, j, k] + gp.quicksum([x[point[0], point[1], k + 1] for point in unreachable_points]) <= 1)
+    model.addConstr(x[0, get_free_position(grid, start)].item() == 1)
+    model.addConstr(x[N - 1, get_free_position(grid, target)].item() == 1)
 
     # Các điều kiện sau là các điều kiện luôn đúng, nhưng chúng có ảnh hưởng
     # đến quá trình giải (theo cách tốt hoặc xấu). Vì thế, hãy thử thêm hoặc
@@ -490,7 +562,7 @@ def solve_maze_with_given_step(size, index, step, status = "optimal"):
     # model.addConstr(obj <= )
 
     # Tìm nghiệm tối ưu
-    model.optimize()
+    optimize_model(model, build)
 
     # In ra thông tin về quãng đường, dùng cho bước hai
     if model.status == GRB.OPTIMAL or model.status == GRB.SOLUTION_LIMIT:
@@ -513,39 +585,21 @@ def solve_for_solution_with_bounded_steps(size, index, step_bound, status = "opt
     model.params.NonConvex = 2
 
     # Lấy thông tin
-    nodes_path = Path(__file__).parent/"Unreachable_nodes"/f"Size{size}"/f"sample{index}.json"
-    grid_path = Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json"
-    with open(nodes_path, "r") as f:
-        unreachable_nodes = json.load(f)
+    unreachable_nodes = load_unreachable_nodes(size, index)
+    if unreachable_nodes is None: unreachable_nodes = get_unreachable_nodes(size, index)
 
     # In-program generation
     # unreachable_nodes = get_unreachable_nodes(size, index)
 
-    with open(grid_path, "r") as f:
-        maze = json.load(f)
-    start = maze["start"]
-    target = maze["target"]
-
-    # Lấy tập cạnh là tường
-    edges = maze["edges"]
-
-    redundant_points = set()
-    points_list = [[i, j] for i in range(1, size + 1) for j in range(1, size + 1)]
-    # Loại những đỉnh thừa
-    for edge in edges:
-        points_to_remove = get_points_between(edge[0], edge[1])
-        for point in points_to_remove:
-            try:
-                points_list.remove(point)
-            except:
-                pass
-
-            # Thêm đỉnh thừa vào một danh sách
-            redundant_points.add(tuple(point))
-    redundant_points = list(redundant_points)
+    # Mê cung, chỉ đọc và tiền xử lý một lần (xem maze.py)
+    grid = load_maze_grid(size, index)
+    invalid = grid.validate()
+    if invalid is not None: raise ValueError(invalid)
+    start = grid.start
+    target = grid.target
 
     # Check validity of number of steps
-    max_step = size**2 - len(redundant_points)
+    max_step = len(grid)
     if step_bound > max_step: 
         raise ValueError(f"Số bước vượt quá số bước tối đa: {max_step}")
 
@@ -559,31 +613,11 @@ def solve_for_solution_with_bounded_steps(size, index, step_bound, status = "opt
 
     # Lập mô hình
     model = gp.Model()
-    x = np.empty((n+1, n+1, N+1), dtype=object)
-    for i in range(1,n+1):
-        for j in range(1,n+1):
-            for k in range(1, N+1):
-                x[i,j,k] = model.addVar(vtype=GRB.BINARY)
-
-    # Tất cả các đỉnh trong redundant_points đều bằng 0
-    for k in range(1, N + 1):
-        for i, j in redundant_points:
-            model.addConstr(x[i, j, k] == 0)
-
-    # Tính tọa độ a, b của đỉnh thứ k
-    a = np.empty((N+1), dtype=object)
-    b = np.empty((N+1), dtype=object)
-    for k in range(1, N+1):
-        a[k] = model.addVar(lb=0, ub=n, vtype= GRB.CONTINUOUS)
-        model.addConstr(gp.quicksum([x[i, j, k]*i for i in range(1,n+1) for j in range(1,n+1)]) == a[k])
-        b[k] = model.addVar(lb=0, ub=n, vtype= GRB.CONTINUOUS)
-        model.addConstr(gp.quicksum([x[i, j, k]*j for i in range(1,n+1) for j in range(1,n+1)]) == b[k])
-
-    # Biến kiểm tra xem đỉnh thứ k có được chọn hay không
-    count = np.empty(N + 1, dtype=object)
-    for k in range(1, N + 1):
-        count[k] = model.addVar(vtype=GRB.BINARY)
-        model.addConstr(count[k] == gp.quicksum([x[i, j, k] for i, j in points_list]))
+    build = profiler.begin("gurobi_build")
+    # Biến x[k - 1, p] = 1 nếu đỉnh thứ k là đỉnh p (chỉ các đỉnh không nằm
+    # trên tường), toạ độ a, b, biến count và các ràng buộc tuyến tính của
+    # chúng (kể cả điều kiện không chạm tường), dựng bằng ma trận thưa
+    x, a, b, count = add_point_variables(model, grid, unreachable_nodes, N)
 
     # Tính quãng đường
     # Không nhân được ba lần
@@ -638,10 +672,6 @@ def solve_for_solution_with_bounded_steps(size, index, step_bound, status = "opt
     for k in range(1, N + 1):
         model.addConstr(count[k] <= 1)
 
-    # Mỗi đỉnh (i, j) xuất hiện nhiều nhất một lần
-    for i, j in points_list:
-        model.addConstr(gp.quicksum([x[i, j, k] for k in range(1, N + 1)]) <= 1)
-
     # Nếu đỉnh thứ k được chọn thì tất cả các đỉnh trước đó cũng được chọn
     for k in range(1, N):
         model.addConstr(count[k] >= count[k + 1])
@@ -657,19 +687,12 @@ def solve_for_solution_with_bounded_steps(size, index, step_bound, status = "opt
 
     # Toạ độ đỉnh đầu, cuối
     # Lưu ý về đỉnh cuối!
-    model.addConstr(x[start[0],start[1],1] == 1)  
-    model.addConstr(gp.quicksum([x[target[0], target[1], k] for k in range(1, N + 1)]) == 1)
+    x_target = x[:, get_free_position(grid, target)].tolist()
+    model.addConstr(x[0, get_free_position(grid, start)].item() == 1)  
+    model.addConstr(gp.quicksum(x_target) == 1)
 
     # Vị trí của đỉnh cuối phải thực sự là vị trí cuối
-    model.addConstr(gp.quicksum([x[target[0], target[1], k]*k for k in range(1, N + 1)]) == gp.quicksum([count[k] for k in range(1, N + 1)]))
-
-    # Điều kiện không chạm tường, được xử lý trước bằng một bước riêng biệt
-    for i, j in points_list:
-        unreachable_points = unreachable_nodes[f"{i}_{j}"]
-        for k in range(1, N):
-            # Mô tả điều kiện: Nếu x[i, j, k] = 1 thì tổng các x[i', j', k + 1] bằng 0,
-            # với (i', j') là một đỉnh trong 'unreachable_points' của (i, j)
-            model.addConstr(x[i, j, k] + gp.quicksum([x[point[0], point[1], k + 1] for point in unreachable_points]) <= 1)
+    model.addConstr(gp.quicksum([x_target[k - 1]*k for k in range(1, N + 1)]) == gp.quicksum([count[k] for k in range(1, N + 1)]))
 
     # Các điều kiện sau là các điều kiện luôn đúng, nhưng chúng có ảnh hưởng
     # đến quá trình giải (theo cách tốt hoặc xấu). Vì thế, hãy thử thêm hoặc
@@ -681,17 +704,197 @@ def solve_for_solution_with_bounded_steps(size, index, step_bound, status = "opt
     # Chặn trên đã biết cho hàm mục tiêu (nếu có)
     # model.addConstr(obj <= )
 
-    model.optimize()
+    optimize_model(model, build)
 
     # In ra thông tin về quãng đường, dùng cho bước hai
     if model.status == GRB.OPTIMAL or model.status == GRB.SOLUTION_LIMIT:
         return True, model.ObjVal
     else: return False, 0   
 
+# Mô hình tuyến tính theo cung, trên các bước đi không chạm tường
+def get_arc_model(graph, start, target, acute, right_or_obtuse):
+    """
+    Return (A, rhs, costs, num_moves, edge_tails, edge_heads) of the arc
+    formulation of model 2 over TurnGraph 'graph', from node 'start' to
+    node 'target': minimize costs @ v subject to A @ v = rhs, where v[e]
+    (binary, e < num_moves) = 1 if move e of 'graph' is used, and the other
+    variables are the flows (0 to 1) of the edges edge_tails[k] ->
+    edge_heads[k] of a network over the moves, the turn gadgets of every
+    point and a source and sink (numbered after the gadget nodes). A move
+    is followed by the move straight on (no cost), or turns: to the chains
+    of the right or obtuse directions ('right_or_obtuse': a suffix, a whole
+    quadrant and a prefix of the directions ranked by angle, as
+    SlopeGraph), or to the hub of the point ('acute'), from which every
+    direction can be left: going back is an acute turn, so that, as in the
+    vertex formulation, an optimal path needs no U-turn and no point
+    twice. The flow into and out of move e is v[e]; moves out of 'start'
+    leave the source, moves into 'target' end in the sink. Lengths and
+    turning costs are constants, so the model is linear.
+    """
+    num_moves = len(graph)
+    indptr, heads, direction_ids = graph.indptr, graph.heads, graph.direction_ids
+    quadrants, positions = get_pseudo_angles(graph.directions)
+    edge_tails, edge_heads, edge_costs = [], [], []
+
+    # Bộ nối góc quay của mỗi đỉnh, trên các hướng đi ra khỏi đỉnh đó
+    next_node = num_moves
+    entries, hubs = {}, {}
+    for point in np.flatnonzero(np.diff(indptr)).tolist():
+        moves = np.arange(indptr[point], indptr[point + 1])
+        move_quadrants, move_positions = quadrants[direction_ids[moves]], positions[direction_ids[moves]]
+        ranked = np.lexsort((move_positions, move_quadrants))
+        ranked_positions = move_positions[ranked]
+        quadrant_starts = np.searchsorted(move_quadrants[ranked], np.arange(5)).tolist()
+        num_ranks = len(moves)
+        suffix, prefix, hub = next_node, next_node + num_ranks, next_node + 2 * num_ranks
+        next_node += 2 * num_ranks + 1
+        hubs[point] = hub
+        for quadrant in range(4):
+            begin, end = quadrant_starts[quadrant], quadrant_starts[quadrant + 1]
+            if begin == end: continue
+            # Chuỗi: đi tiếp trong góc phần tư, hoặc đi ra theo hướng của nút
+            for rank in range(begin, end):
+                move = int(moves[ranked[rank]])
+                edge_tails += [suffix + rank, prefix + rank]
+                edge_heads += [move, move]
+                edge_costs += [0, 0]
+                if rank + 1 < end:
+                    edge_tails.append(suffix + rank)
+                    edge_heads.append(suffix + rank + 1)
+                    edge_costs.append(0)
+                if rank > begin:
+                    edge_tails.append(prefix + rank)
+                    edge_heads.append(prefix + rank - 1)
+                    edge_costs.append(0)
+            edge_tails.append(hub)
+            edge_heads.append(prefix + end - 1)
+            edge_costs.append(0)
+
+        # Các hướng đến đỉnh (ngược với các hướng đi ra): nửa mặt phẳng
+        # đóng [u - 90, u + 90] của hướng u
+        for direction in (direction_ids[moves] ^ 1).tolist():
+            quadrant, position = int(quadrants[direction]), positions[direction]
+            nodes = []
+            begin, end = quadrant_starts[(quadrant + 3) % 4], quadrant_starts[(quadrant + 3) % 4 + 1]
+            rank = begin + int(np.searchsorted(ranked_positions[begin:end], position, side="left"))
+            if rank < end: nodes.append(suffix + rank)
+            begin, end = quadrant_starts[quadrant], quadrant_starts[quadrant + 1]
+            if end > begin: nodes.append(prefix + end - 1)
+            begin, end = quadrant_starts[(quadrant + 1) % 4], quadrant_starts[(quadrant + 1) % 4 + 1]
+            rank = begin + int(np.searchsorted(ranked_positions[begin:end], position, side="right")) - 1
+            if rank >= begin: nodes.append(prefix + rank)
+            entries[point, direction] = nodes
+    source, sink = next_node, next_node + 1
+
+    # Sau mỗi bước đi: đi thẳng, hoặc quay (quay lại là góc nhọn)
+    for move in range(num_moves):
+        point, direction = int(heads[move]), int(direction_ids[move])
+        if point == target:
+            edge_tails.append(move)
+            edge_heads.append(sink)
+            edge_costs.append(0)
+            continue
+        next_move = int(graph.straight[move])
+        if next_move >= 0:
+            edge_tails.append(move)
+            edge_heads.append(next_move)
+            edge_costs.append(0)
+        nodes = entries[point, direction]
+        edge_tails += [move] * (len(nodes) + 1)
+        edge_heads += nodes + [hubs[point]]
+        edge_costs += [right_or_obtuse] * len(nodes) + [acute]
+    for move in range(indptr[start], indptr[start + 1]):
+        edge_tails.append(source)
+        edge_heads.append(move)
+        edge_costs.append(0)
+
+    # Dòng vào và ra của bước e là v[e]; bảo toàn dòng ở các nút khác.
+    # Hàng của nút n: vào n (bước) hoặc num_moves + n, ra num_moves + n.
+    edge_tails, edge_heads = np.array(edge_tails, dtype=np.int64), np.array(edge_heads, dtype=np.int64)
+    num_edges, num_rows = len(edge_tails), num_moves + next_node + 2
+    in_rows = np.where(edge_heads < num_moves, edge_heads, num_moves + edge_heads)
+    out_signs = np.where((edge_tails >= num_moves) & (edge_tails < source), -1, 1)
+    moves = np.arange(num_moves)
+    rows = np.concatenate([in_rows, num_moves + edge_tails, moves, num_moves + moves])
+    columns = np.concatenate([num_moves + np.arange(num_edges)] * 2 + [moves] * 2)
+    values = np.concatenate([np.ones(num_edges), out_signs, -np.ones(2 * num_moves)])
+    matrix = sparse.csr_matrix((values, (rows, columns)), shape=(num_rows, num_moves + num_edges))
+    rhs = np.zeros(num_rows)
+    rhs[num_moves + source] = rhs[num_moves + sink] = 1
+    costs = np.concatenate([graph.lengths, np.array(edge_costs, dtype=np.float64)])
+    return matrix, rhs, costs, num_moves, edge_tails, edge_heads
+
+# Hàm giải bằng mô hình tuyến tính theo cung
+def solve_maze_with_arcs(size, index, status = "optimal", reach_mode = "sweep"):
+    """
+    Solve given maze with the arc formulation (see get_arc_model): a
+    linear MILP over the wall-free moves of the graph models, with no
+    NonConvex mode, optimal if 'status' = "optimal", else an arbitrary
+    feasible solution. Return (objective value, vertices of the path), or
+    None if there is no path.
+    """
+    from fun_with_dijkstar import get_nodes_info, is_empty_dict
+    start_time = time.time()
+
+    # Mê cung, chỉ đọc và tiền xử lý một lần (xem maze.py)
+    grid = load_maze_grid(size, index)
+    invalid = grid.validate()
+    if invalid is not None: raise ValueError(invalid)
+    start_num, target_num = grid.get_index(grid.start) + 1, grid.get_index(grid.target) + 1
+    if start_num == target_num: return 0, [grid.start]
+
+    # Các bước đi không chạm tường, như trong các mô hình đồ thị
+    with profiler.phase("reach"):
+        nodes_info = get_nodes_info(grid, reach_mode)
+    nodes_info = {key: info for key, info in nodes_info.items() if not is_empty_dict(info)}
+    graph = TurnGraph.from_nodes_info(nodes_info, get_all_slopes(grid.row, grid.col), grid.row, grid.col)
+
+    # Lập mô hình
+    model = gp.Model()
+    build = profiler.begin("gurobi_build")
+    if status == "feasible": model.params.SolutionLimit = 1
+    matrix, rhs, costs, num_moves, edge_tails, edge_heads = get_arc_model(
+        graph, start_num, target_num, Constant.acute, Constant.obtuse_or_right,
+    )
+    vtype = np.concatenate([np.full(num_moves, GRB.BINARY), np.full(len(costs) - num_moves, GRB.CONTINUOUS)])
+    variables = model.addMVar(len(costs), lb=0, ub=1, vtype=vtype, obj=costs)
+    model.addMConstr(matrix, variables, GRB.EQUAL, rhs)
+    model.ModelSense = GRB.MINIMIZE
+    optimize_model(model, build)
+
+    if model.status != GRB.OPTIMAL and model.status != GRB.SOLUTION_LIMIT:
+        print("No path found")
+        return None
+
+    # Đi theo dòng từ nguồn tới đích, ghi lại các bước đi
+    values = variables.X
+    next_nodes = {}
+    for edge in np.flatnonzero(values[num_moves:] > 0.5).tolist():
+        next_nodes.setdefault(int(edge_tails[edge]), []).append(int(edge_heads[edge]))
+    # Nguồn và đích là hai nút cuối cùng (xem get_arc_model)
+    sink = matrix.shape[0] - num_moves - 1
+    node, moves = sink - 1, []
+    while node != sink:
+        node = next_nodes[node].pop()
+        if node < num_moves: moves.append(node)
+
+    # Các đỉnh: điểm đầu, và điểm cuối của mỗi đoạn thẳng
+    vertices = [grid.start]
+    for move, next_move in zip(moves, moves[1:] + [-1]):
+        if next_move < 0 or graph.direction_ids[next_move] != graph.direction_ids[move]:
+            vertices.append(grid.get_point(int(graph.heads[move]) - 1))
+    print(f"Optimal objective value: {model.objVal}")
+    for k, (i, j) in enumerate(vertices, 1):
+        print(f"{k}_th vertex: ({i}, {j})")
+    runtime = time.time() - start_time
+    print(f"Runtime (s): {runtime}")
+    return model.objVal, vertices
+
 # Hàm giải "tổng quát"
-def solve_maze(size, index, bound_for_feasibility = None, status_for_feasibility = "optimal", method: int = 2):
+def solve_maze(size, index, bound_for_feasibility = None, status_for_feasibility = "optimal", method: int = 2, formulation = "vertices"):
     """
-    Solve given maze.
+    Solve given maze. Return the optimal objective value (None if not
+    found).
     NOTE:
     - If bound_for_feasibility = None, model will be constructed with
     default upper bound for maximum number of vertices, which may result
@@ -704,7 +907,13 @@ def solve_maze(size, index, bound_for_feasibility = None, status_for_feasibility
     there will be a much better bound for maximum number of vertices
     obtained from the feasible objective value found above, thereby 
     decreasing the size of the final model, raising solvability.
+    - If formulation = "arcs", the linear arc formulation is solved
+    instead (see solve_maze_with_arcs), with no bound needed.
     """
+    if formulation == "arcs":
+        info = solve_maze_with_arcs(size, index, status_for_feasibility)
+        return None if info is None else info[0]
+    elif formulation != "vertices": raise ValueError(f"Unknown formulation: {formulation}")
     start_time = time.time()
     # Thiết lập mô hình
     model = gp.Model()
@@ -713,41 +922,23 @@ def solve_maze(size, index, bound_for_feasibility = None, status_for_feasibility
     model.params.NonConvex = 2
 
     # Lấy thông tin
-    nodes_path = Path(__file__).parent/"Unreachable_nodes"/f"Size{size}"/f"sample{index}.json"
-    grid_path = Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json"
-    with open(nodes_path, "r") as f:
-        unreachable_nodes = json.load(f)
+    unreachable_nodes = load_unreachable_nodes(size, index)
+    if unreachable_nodes is None: unreachable_nodes = get_unreachable_nodes(size, index)
 
     # In-program generation
     # unreachable_nodes = get_unreachable_nodes(size, index)
 
-    with open(grid_path, "r") as f:
-        maze = json.load(f)
-    start = maze["start"]
-    target = maze["target"]
-
-    # Lấy tập cạnh là tường
-    edges = maze["edges"]
-
-    redundant_points = set()
-    points_list = [[i, j] for i in range(1, size + 1) for j in range(1, size + 1)]
-    # Loại những đỉnh thừa
-    for edge in edges:
-        points_to_remove = get_points_between(edge[0], edge[1])
-        for point in points_to_remove:
-            try:
-                points_list.remove(point)
-            except:
-                pass
-
-            # Thêm đỉnh thừa vào một danh sách
-            redundant_points.add(tuple(point))
-    redundant_points = list(redundant_points)
+    # Mê cung, chỉ đọc và tiền xử lý một lần (xem maze.py)
+    grid = load_maze_grid(size, index)
+    invalid = grid.validate()
+    if invalid is not None: raise ValueError(invalid)
+    start = grid.start
+    target = grid.target
 
     # Đầu tiên, tìm một nghiệm tối ưu cho số bước cụ thể, là một nghiệm chấp nhận được
     # cho bài toán với số bước chưa biết. Từ giá trị hàm mục tiêu ở đây, ta
     # thu được một chặn trên cho số bước tối đa.
-    max_step = size**2 - len(redundant_points)
+    max_step = len(grid)
     if bound_for_feasibility > max_step:
         raise ValueError(f"Số bước vượt quá số bước tối đa: {max_step}")
 
@@ -794,31 +985,11 @@ def solve_maze(size, index, bound_for_feasibility = None, status_for_feasibility
 
     # Lập mô hình
     model = gp.Model()
-    x = np.empty((n+1, n+1, N+1), dtype=object)
-    for i in range(1,n+1):
-        for j in range(1,n+1):
-            for k in range(1, N+1):
-                x[i,j,k] = model.addVar(vtype=GRB.BINARY)
-
-    # Tất cả các đỉnh trong redundant_points đều bằng 0
-    for k in range(1, N + 1):
-        for i, j in redundant_points:
-            model.addConstr(x[i, j, k] == 0)
-
-    # Tính tọa độ a, b của đỉnh thứ k
-    a = np.empty((N+1), dtype=object)
-    b = np.empty((N+1), dtype=object)
-    for k in range(1, N+1):
-        a[k] = model.addVar(lb=0, ub=n, vtype= GRB.CONTINUOUS)
-        model.addConstr(gp.quicksum([x[i, j, k]*i for i in range(1,n+1) for j in range(1,n+1)]) == a[k])
-        b[k] = model.addVar(lb=0, ub=n, vtype= GRB.CONTINUOUS)
-        model.addConstr(gp.quicksum([x[i, j, k]*j for i in range(1,n+1) for j in range(1,n+1)]) == b[k])
-
-    # Biến kiểm tra xem đỉnh thứ k có được chọn hay không
-    count = np.empty(N + 1, dtype=object)
-    for k in range(1, N + 1):
-        count[k] = model.addVar(vtype=GRB.BINARY)
-        model.addConstr(count[k] == gp.quicksum([x[i, j, k] for i, j in points_list]))
+    build = profiler.begin("gurobi_build")
+    # Biến x[k - 1, p] = 1 nếu đỉnh thứ k là đỉnh p (chỉ các đỉnh không nằm
+    # trên tường), toạ độ a, b, biến count và các ràng buộc tuyến tính của
+    # chúng (kể cả điều kiện không chạm tường), dựng bằng ma trận thưa
+    x, a, b, count = add_point_variables(model, grid, unreachable_nodes, N)
 
     # Tính quãng đường
     # Không nhân được ba lần
@@ -873,10 +1044,6 @@ def solve_maze(size, index, bound_for_feasibility = None, status_for_feasibility
     for k in range(1, N + 1):
         model.addConstr(count[k] <= 1)
 
-    # Mỗi đỉnh (i, j) xuất hiện nhiều nhất một lần
-    for i, j in points_list:
-        model.addConstr(gp.quicksum([x[i, j, k] for k in range(1, N + 1)]) <= 1)
-
     # Nếu đỉnh thứ k được chọn thì tất cả các đỉnh trước đó cũng được chọn
     for k in range(1, N):
         model.addConstr(count[k] >= count[k + 1])
@@ -892,19 +1059,12 @@ def solve_maze(size, index, bound_for_feasibility = None, status_for_feasibility
 
     # Toạ độ đỉnh đầu, cuối
     # Lưu ý về đỉnh cuối!
-    model.addConstr(x[start[0],start[1],1] == 1)  
-    model.addConstr(gp.quicksum([x[target[0], target[1], k] for k in range(1, N + 1)]) == 1)
+    x_target = x[:, get_free_position(grid, target)].tolist()
+    model.addConstr(x[0, get_free_position(grid, start)].item() == 1)  
+    model.addConstr(gp.quicksum(x_target) == 1)
 
     # Vị trí của đỉnh cuối phải thực sự là vị trí cuối
-    model.addConstr(gp.quicksum([x[target[0], target[1], k]*k for k in range(1, N + 1)]) == gp.quicksum([count[k] for k in range(1, N + 1)]))
-
-    # Điều kiện không chạm tường, được xử lý trước bằng một bước riêng biệt
-    for i, j in points_list:
-        unreachable_points = unreachable_nodes[f"{i}_{j}"]
-        for k in range(1, N):
-            # Mô tả điều kiện: Nếu x[i, j, k] = 1 thì tổng các x[i', j', k + 1] bằng 0,
-            # với (i', j') là một đỉnh trong 'unreachable_points' của (i, j)
-            model.addConstr(x[i, j, k] + gp.quicksum([x[point[0], point[1], k + 1] for point in unreachable_points]) <= 1)
+    model.addConstr(gp.quicksum([x_target[k - 1]*k for k in range(1, N + 1)]) == gp.quicksum([count[k] for k in range(1, N + 1)]))
 
     # Các điều kiện sau là các điều kiện luôn đúng, nhưng chúng có ảnh hưởng
     # đến quá trình giải (theo cách tốt hoặc xấu). Vì thế, hãy thử thêm hoặc
@@ -916,14 +1076,57 @@ def solve_maze(size, index, bound_for_feasibility = None, status_for_feasibility
     # Chặn trên đã biết cho hàm mục tiêu (nếu có)
     # model.addConstr(obj <= solve_maze_with_given_step(size, index, step)[1]+0.01)
 
-    model.optimize()
+    optimize_model(model, build)
     # In ra thông tin về quãng đường
     if model.status == GRB.OPTIMAL:
         print(f"Optimal objective value: {model.objVal}")
+        x_values = x.X
         for k in range(1, N + 1):
             if count[k].x == 0: break
-            for i, j in points_list:
-                if x[i, j, k].x == 1:
-                    print(f"{k}_th vertex: ({i}, {j})")
+            i, j = grid.get_point(int(grid.free_indices[np.argmax(x_values[k - 1])]))
+            print(f"{k}_th vertex: ({i}, {j})")
     runtime = time.time() - start_time
     print(f"Runtime (s): {runtime}")
+    if model.status == GRB.OPTIMAL: return model.objVal
+
+# So sánh hai cách lập mô hình
+def benchmark_formulations(sizes=(4, 10, 20, 30), samples_per_size=10, bound_for_feasibility=5, time_limit=600):
+    """
+    Solve samples 1 to 'samples_per_size' of every size in 'sizes' with
+    solve_maze, formulation "vertices" (with 'bound_for_feasibility') and
+    "arcs", each under Gurobi's 'time_limit' seconds, and print the
+    objective values and runtimes with the optimal values of
+    Proposed_solutions/Path_info and of model 1 (bench.run_file), which
+    the arc formulation must match ("check"). Errors (e.g. invalid
+    samples, or the size limit of a restricted license) are printed
+    instead. Return the list of the samples where it does not.
+    """
+    from bench import check_golden, get_golden_value, run_file
+    mismatches = []
+    gp.setParam("TimeLimit", time_limit)
+    try:
+        for size in sizes:
+            for index in range(1, samples_per_size + 1):
+                results = {}
+                for formulation in ("vertices", "arcs"):
+                    start_time = time.perf_counter()
+                    try:
+                        value = solve_maze(size, index, bound_for_feasibility, formulation=formulation)
+                    except (ValueError, gp.GurobiError) as error:
+                        value = f"{type(error).__name__}: {error}"
+                    results[formulation] = (value, time.perf_counter() - start_time)
+                try:
+                    golden = get_golden_value(size, index)
+                except FileNotFoundError:
+                    golden = None
+                path = Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json"
+                reference = run_file(path, model=1, trace_memory="no")["cost"]
+                value = results["arcs"][0]
+                check = "error" if isinstance(value, str) else check_golden(value, reference)
+                if check != "match": mismatches.append((size, index))
+                print(f"Size {size}, sample {index}: golden {golden}, model 1 {reference}, " + ", ".join(
+                    f"{formulation} {value} ({runtime:.2f} s)" for formulation, (value, runtime) in results.items()
+                ) + f", check {check}")
+    finally:
+        gp.setParam("TimeLimit", GRB.INFINITY)
+    return mismatches
@@ -0,0 +1,252 @@
+import numpy as np
+from walls import WallArray, WallIndex
+from visibility import VisibilitySweep
+from slopes import get_grid_slopes
+
+# All slopes of a grid, in the right-upward convention of get_slopes
+def get_all_slopes(row, col):
+    """
+    Return every irreducible slope [a, b] (b > 0, or b = 0 and a = 1) that
+    joins two points of a 'row'*'col' grid, in increasing order of angle.
+    """
+    return [list(slope) for slope in get_grid_slopes(row, col)]
+
+# Integer ceiling division, element-wise
+def ceil_div(a, b):
+    """
+    Return ceil('a' / 'b') element-wise, 'b' > 0
+    """
+    return -(-a // b)
+
+# Columns of the steps of one slope that meet each wall, row by row
+def get_step_bounds(slope, walls, rows):
+    """
+    Return (low, high), arrays of shape (number of walls,) + shape of
+    'rows': the step from point [i, rows[k]] to that point + 'slope'
+    meets wall w iff low[w, k] <= i <= high[w, k] (empty if low > high).
+    Not clipped to the grid. The two items of 'slope' can also be arrays
+    that broadcast with 'rows', one slope per row of 'rows'.
+    """
+    a, b = slope[0], slope[1]
+    # A step starting at P meets wall [e1, e2] iff P lies in the parallelogram
+    # e1 + u*(e2 - e1) - v*slope, u, v in [0, 1]. On each row y, the
+    # parallelogram is an interval of columns, whose ends are reached on one
+    # of the sides u = 0, u = 1, v = 0 or v = 1. Rows go along the last axes.
+    rows = np.asarray(rows, dtype=np.int64)
+    wall_shape = (-1,) + (1,) * rows.ndim
+    a1, b1 = walls.a1.reshape(wall_shape), walls.b1.reshape(wall_shape)
+    wx, wy = (walls.a2 - walls.a1).reshape(wall_shape), (walls.b2 - walls.b1).reshape(wall_shape)
+    dy = rows[None] - b1
+    big = np.iinfo(np.int64).max // 4
+    low = np.full(np.broadcast_shapes(dy.shape, np.shape(a), np.shape(b)), big)
+    high = np.full(low.shape, -big)
+
+    def add_candidate(valid, num, den):
+        # x = num/den, den > 0
+        np.minimum(low, np.where(valid, ceil_div(num, den), big), out=low)
+        np.maximum(high, np.where(valid, num // den, -big), out=high)
+
+    if np.any(b != 0):
+        safe_b = np.where(b == 0, 1, b)
+        for u in (0, 1):
+            v_num = u*wy - dy
+            add_candidate((b != 0) & (v_num >= 0) & (v_num <= b), b*(a1 + u*wx) - v_num*a, safe_b)
+    # Sides v = 0 and v = 1, for walls that are not horizontal
+    sign = np.where(wy < 0, -1, 1)
+    den = np.where(wy == 0, 1, wy*sign)
+    for v in (0, 1):
+        u_num = (dy + v*b)*sign
+        valid = (wy != 0) & (u_num >= 0) & (u_num <= den)
+        add_candidate(valid, (wy*(a1 - v*a) + (dy + v*b)*wx)*sign, den)
+    if np.any(b == 0):
+        # Horizontal wall on a horizontal step's row: the parallelogram is
+        # degenerate, take all four corners
+        valid = (b == 0) & (wy == 0) & (dy == 0)
+        for u in (0, 1):
+            for v in (0, 1):
+                add_candidate(valid, np.broadcast_to(a1 + u*wx - v*a, low.shape), 1)
+
+    return low, high
+
+# Blocked steps of one slope
+def get_blocked_steps(slope, row, col, walls):
+    """
+    Return (blocked, col_offset): 'blocked'[j, i] is True if the step from
+    point [col_offset + i, 1 + j] to that point + 'slope' meets a wall.
+    Only steps with both ends in the 'row'*'col' grid are represented.
+    """
+    a, b = slope[0], slope[1]
+    col_offset = max(1, 1 - a)
+    num_cols = min(col, col - a) - col_offset + 1
+    num_rows = row - b
+    blocked = np.zeros((max(num_rows, 0), max(num_cols, 0)), dtype=bool)
+    if num_rows <= 0 or num_cols <= 0 or len(walls) == 0: return blocked, col_offset
+
+    low, high = get_step_bounds(slope, walls, np.arange(1, num_rows + 1))
+
+    # Mark intervals with a difference array over columns
+    low = np.maximum(low, col_offset) - col_offset
+    high = np.minimum(high, col_offset + num_cols - 1) - col_offset
+    wall_ids, rows = np.nonzero(low <= high)
+    diff = np.zeros((num_rows, num_cols + 1), dtype=np.int64)
+    np.add.at(diff, (rows, low[wall_ids, rows]), 1)
+    np.add.at(diff, (rows, high[wall_ids, rows] + 1), -1)
+    blocked = np.cumsum(diff, axis=1)[:, :num_cols] > 0
+    return blocked, col_offset
+
+# Steps of every slope that meet one wall
+def get_wall_steps(slopes, row, col, wall):
+    """
+    Return (slope_ids, cols, rows): the steps along slopes[slope_ids[k]]
+    from point [cols[k], rows[k]], with both ends in the 'row'*'col'
+    grid, that meet 'wall' [[x1, y1], [x2, y2]]. Only the rows the wall
+    spans are looked at, for all slopes at once.
+    """
+    slopes = np.asarray(slopes, dtype=np.int64).reshape(-1, 2)
+    a, b = slopes[:, 0, None], slopes[:, 1, None]
+    (x1, y1), (x2, y2) = wall
+    # Rows of the first points, from max(1, min y - b) to min(row - b, max y)
+    first_rows = np.maximum(1, min(y1, y2) - b)
+    last_rows = np.minimum(row - b, max(y1, y2))
+    rows = first_rows + np.arange(max(y1, y2) - min(y1, y2) + int(b.max(initial=0)) + 1)[None, :]
+    low, high = get_step_bounds((a, b), WallArray([wall]), rows)
+    low = np.maximum(low[0], np.maximum(1, 1 - a))
+    high = np.minimum(high[0], np.minimum(col, col - a))
+    counts = np.where(rows <= last_rows, np.maximum(high - low + 1, 0), 0).reshape(-1)
+    offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    slope_ids = np.repeat(np.repeat(np.arange(len(slopes)), rows.shape[1]), counts)
+    return slope_ids, np.repeat(low.reshape(-1), counts) + offsets, np.repeat(rows.reshape(-1), counts)
+
+# Maximal wall-free runs of one slope
+def get_runs(slope, row, col, walls):
+    """
+    Return (cols, rows, reaches) of every maximal wall-free run along
+    'slope' in a 'row'*'col' grid: each run begins at [cols[k], rows[k]]
+    and takes reaches[k] steps. Same runs as get_furthest_reach started
+    from every point not inside an earlier run.
+    """
+    a, b = slope[0], slope[1]
+    blocked, col_offset = get_blocked_steps(slope, row, col, walls)
+    free = ~blocked
+    num_rows, num_cols = free.shape
+    if free.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # reach[P] = number of free steps from P onwards, computed backwards
+    # along the lines, one block of 'b' rows (or one column if b = 0) at a time
+    # Columns i whose next point along 'slope' has a step, at column i + a
+    first, last = max(0, -a), min(num_cols, num_cols - a)
+    reach = np.zeros(free.shape, dtype=np.int64)
+    if b > 0:
+        for end in range(num_rows, 0, -b):
+            begin = max(0, end - b)
+            follow = np.zeros((end - begin, num_cols), dtype=np.int64)
+            next_end = min(end + b, num_rows)
+            if next_end > begin + b and last > first:
+                follow[:next_end - begin - b, first:last] = reach[begin + b:next_end, first + a:last + a]
+            reach[begin:end] = free[begin:end] * (1 + follow)
+    else:
+        reach[:, -1] = free[:, -1]
+        for i in range(num_cols - 2, -1, -1):
+            reach[:, i] = free[:, i] * (1 + reach[:, i + 1])
+
+    # A run begins at a free step whose previous step is missing or blocked
+    previous_free = np.zeros(free.shape, dtype=bool)
+    if b > 0:
+        if last > first:
+            previous_free[b:, first + a:last + a] = free[:-b, first:last]
+    else:
+        previous_free[:, 1:] = free[:, :-1]
+    rows, cols = np.nonzero(free & ~previous_free)
+    return cols + col_offset, rows + 1, reach[rows, cols]
+
+# Fill nodes_info for both models, with one sweep per slope
+def fill_nodes_info(nodes_info, slopes, row, col, edge_list):
+    """
+    Append begin/middle/end/reach data of every maximal wall-free run, for
+    every slope in 'slopes', to 'nodes_info' (keyed "col_row"). Runs are
+    added in row-major order of their first point, then in order of 'slopes'.
+    """
+    walls = edge_list if isinstance(edge_list, WallArray) else WallArray(edge_list)
+    all_cols, all_rows, all_reaches, all_ids = [], [], [], []
+    for slope_id, slope in enumerate(slopes):
+        cols, rows, reaches = get_runs(slope, row, col, walls)
+        all_cols.append(cols)
+        all_rows.append(rows)
+        all_reaches.append(reaches)
+        all_ids.append(np.full(len(cols), slope_id))
+    if not slopes: return nodes_info
+    cols, rows = np.concatenate(all_cols), np.concatenate(all_rows)
+    reaches, ids = np.concatenate(all_reaches), np.concatenate(all_ids)
+    order = np.lexsort((ids, cols, rows))
+
+    for current_col, current_row, slope_id, max_reach in zip(
+        cols[order].tolist(), rows[order].tolist(), ids[order].tolist(), reaches[order].tolist(),
+    ):
+        slope = slopes[slope_id]
+        nodes_info[f"{current_col}_{current_row}"]["begin"].append(slope)
+        nodes_info[f"{current_col}_{current_row}"]["reach"].append(max_reach)
+        for num in range(1, max_reach):
+            nodes_info[f"{current_col + num * slope[0]}_{current_row + num * slope[1]}"]["middle"].append(slope)
+        nodes_info[f"{current_col + max_reach * slope[0]}_{current_row + max_reach * slope[1]}"]["end"].append(slope)
+    return nodes_info
+
+# Reach backends, all usable as 'edge_list' in get_furthest_reach
+def get_reach_backend(edge_list, backend="array"):
+    """
+    Return the walls of 'edge_list' wrapped for reach queries: "array"
+    (WallArray, batched binary-search probes), "index" (WallIndex, grid
+    buckets) or "visibility" (VisibilitySweep, one angular sweep per point).
+    """
+    if backend == "array": return WallArray(edge_list)
+    elif backend == "index": return WallIndex(edge_list)
+    elif backend == "visibility": return VisibilitySweep(edge_list)
+    else: raise ValueError(f"Unknown reach backend: {backend}")
+
+# Vectorized get_max_reach, for many slopes from the same point
+def get_max_reaches(point, slopes, row, col):
+    """
+    Return the smallest number of slope steps from 'point' that leaves the
+    'row'*'col' grid, for every slope in 'slopes'
+    """
+    slopes = np.asarray(slopes, dtype=np.int64).reshape(-1, 2)
+    col_slope, row_slope = slopes[:, 0], slopes[:, 1]
+    current_col, current_row = point[0], point[1]
+    safe_col_slope = np.where(col_slope == 0, 1, np.abs(col_slope))
+    max_col_reach = np.where(
+        col_slope == 0, col,
+        np.where(col_slope > 0, col - current_col, current_col - 1) // safe_col_slope + 1,
+    )
+    max_row_reach = np.where(row_slope == 0, row, (row - current_row) // np.where(row_slope == 0, 1, row_slope) + 1)
+    return np.minimum(max_row_reach, max_col_reach)
+
+# Fill nodes_info for both models, point by point, with any reach backend
+def fill_nodes_info_by_points(nodes_info, points_list, slopes, row, col, walls):
+    """
+    Same result as fill_nodes_info, but computing the reach of every slope
+    from every point of 'points_list' with 'walls' (see get_reach_backend),
+    skipping slopes already covered by an earlier run.
+    """
+    slopes_array = np.asarray(slopes, dtype=np.int64).reshape(-1, 2)
+    covered = set()
+    for current_col, current_row in points_list:
+        point = [current_col, current_row]
+        # Slopes whose first step stays in the grid, as in get_slopes
+        next_cols = current_col + slopes_array[:, 0]
+        available = (next_cols >= 1) & (next_cols <= col) & (current_row + slopes_array[:, 1] <= row)
+        slope_ids = [slope_id for slope_id in np.flatnonzero(available).tolist() if (current_col, current_row, slope_id) not in covered]
+        if not slope_ids: continue
+        max_reaches = get_max_reaches(point, slopes_array[slope_ids], row, col)
+        reaches = walls.get_reaches(point, slopes_array[slope_ids], max_reaches).tolist()
+        for slope_id, max_reach in zip(slope_ids, reaches):
+            if max_reach == 0: continue
+            slope = slopes[slope_id]
+            nodes_info[f"{current_col}_{current_row}"]["begin"].append(slope)
+            nodes_info[f"{current_col}_{current_row}"]["reach"].append(max_reach)
+            for num in range(1, max_reach + 1):
+                new_col = current_col + num * slope[0]
+                new_row = current_row + num * slope[1]
+                covered.add((new_col, new_row, slope_id))
+                nodes_info[f"{new_col}_{new_row}"]["middle" if num < max_reach else "end"].append(slope)
+    return nodes_info
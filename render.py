@@ -0,0 +1,83 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from maze import MazeGrid, load_maze_grid
+
+# Draw a maze and a path on axes
+def draw_solution(ax, grid, points):
+    """
+    Draw MazeGrid 'grid' on 'ax' as the solvers did: the lattice (one
+    scatter), start (blue), target (red), the walls (one LineCollection)
+    and the path of list of points 'points' (one LineCollection, green;
+    nothing if None)
+    """
+    cols, rows = np.meshgrid(np.arange(1, grid.col + 1), np.arange(1, grid.row + 1))
+    ax.scatter(cols.ravel(), rows.ravel(), s=1.44, c="k", marker="o", linewidths=0)
+    ax.scatter([grid.start[0], grid.target[0]], [grid.start[1], grid.target[1]], s=4, c=["b", "r"], marker="o", linewidths=0)
+    if grid.edges: ax.add_collection(LineCollection(np.asarray(grid.edges, dtype=float), colors="k", linewidths=0.2))
+    if points is not None and len(points) > 1:
+        ax.add_collection(LineCollection([np.asarray(points, dtype=float)], colors="g", linewidths=0.2))
+    ax.axis("scaled")
+
+# Show a solution in a window
+def show_solution(grid, points):
+    """
+    Draw (draw_solution) and show MazeGrid 'grid' and path 'points' with pyplot
+    """
+    from matplotlib import pyplot as plt
+    fig, ax = plt.subplots(1, 1)
+    draw_solution(ax, grid, points)
+    plt.show()
+
+# Save a solution as PNG, without a display
+def render_solution(grid, points, path, dpi=100):
+    """
+    Draw (draw_solution) MazeGrid 'grid' and path 'points' on a figure of
+    no pyplot window (Agg canvas) and save it to PNG file 'path'
+    """
+    fig = Figure()
+    ax = fig.add_subplot(1, 1, 1)
+    draw_solution(ax, grid, points)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path, dpi=dpi, bbox_inches="tight")
+    return path
+
+# Save the solution of a sample
+def render_sample(size, index, points, folder=None, dpi=100):
+    """
+    Render sample 'index' of size 'size' with path 'points' to
+    'folder'/SizeN/sampleK.png (Proposed_solutions/Visualize if None).
+    Return the path of the PNG.
+    """
+    if folder is None: folder = Path(__file__).parent/"Proposed_solutions"/"Visualize"
+    return render_solution(load_maze_grid(size, index), points, Path(folder)/f"Size{size}"/f"sample{index}.png", dpi)
+
+# Render one job in a worker process
+def render_job(maze_path, points, path, dpi):
+    """
+    Render the maze of file 'maze_path' with path 'points' to 'path'
+    """
+    return render_solution(MazeGrid.from_file(maze_path), points, path, dpi)
+
+# Save many solutions in parallel
+def render_results(results_path, folder=None, workers=None, dpi=100):
+    """
+    Render every sample (Samples/SizeN/sampleK.json) with a path in the
+    JSONL results of batch.solve_batch 'results_path' to
+    'folder'/SizeN/sampleK.png (Proposed_solutions/Visualize if None),
+    'workers' processes at a time (os.cpu_count() if None). Return the
+    list of the PNG paths.
+    """
+    from batch import read_results
+    if folder is None: folder = Path(__file__).parent/"Proposed_solutions"/"Visualize"
+    jobs = [
+        (result["file"], result["path"], Path(folder)/f"Size{result['size']}"/f"sample{result['sample']}.png", dpi)
+        for result in read_results(results_path).values()
+        if "size" in result and result["status"] == "ok"
+    ]
+    if not jobs: return []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(render_job, *zip(*jobs)))
@@ -0,0 +1,99 @@
+from fun_with_dijkstar import Constant, coords_to_num, get_first_model_heuristic, get_nodes_info, is_empty_dict, num_to_coords
+from lazy import LazyGraph, find_lazy_path
+from maze import load_maze_grid
+from reach import get_all_slopes
+from search import NoPathError, PathInfo, SlopeGraph, TurnGraph, find_graph_path, find_turn_path
+
+class MazeRouter:
+    """
+    Graph of model 'model' (1 or 2) of MazeGrid 'grid', built once and
+    shared by every query: start and target are never added to it, but
+    joined to it per query (virtual edges of SlopeGraph.get_endpoints for
+    model 1, start and target nodes for model 2). 'engine' is "graph"
+    (SlopeGraph or TurnGraph, from nodes_info with 'reach_mode') or "lazy"
+    (LazyGraph, whose memoized reaches then serve every query); 'search'
+    is "dijkstra" or "astar".
+    """
+    def __init__(self, grid, model=2, engine="graph", reach_mode="sweep", search="dijkstra"):
+        if model not in (1, 2): raise ValueError(f"Unknown model: {model}")
+        if search not in ("dijkstra", "astar"): raise ValueError(f"Unknown search: {search}")
+        self.grid = grid
+        self.model = model
+        self.engine = engine
+        self.search = search
+        if engine == "lazy":
+            self.graph = LazyGraph(grid, "visibility" if reach_mode == "sweep" else reach_mode)
+            return
+        elif engine != "graph":
+            raise ValueError(f"Unknown engine: {engine}")
+        # Without the points no slope goes through, as the solvers
+        nodes_info = {key: info for key, info in get_nodes_info(grid, reach_mode).items() if not is_empty_dict(info)}
+        slopes = get_all_slopes(grid.row, grid.col)
+        if model == 1:
+            self.graph = SlopeGraph.from_nodes_info(nodes_info, slopes, grid.row, grid.col, Constant.acute, Constant.right_or_obtuse)
+        else:
+            self.graph = TurnGraph.from_nodes_info(nodes_info, slopes, grid.row, grid.col)
+
+    @classmethod
+    def from_sample(cls, size, index, **kwargs):
+        """
+        Return MazeRouter of sample 'index' of size 'size'
+        """
+        return cls(load_maze_grid(size, index), **kwargs)
+
+    def route(self, start, target, stats=None):
+        """
+        Return PathInfo of the cheapest path from point 'start' [i, j] to
+        point 'target', whose nodes are the points [i, j] of the path. Raise
+        ValueError if either is outside the grid or on a wall, NoPathError
+        if there is no path. If 'stats' is a dictionary, the search stores
+        its counters in it.
+        """
+        for name, point in (("Start", start), ("Target", target)):
+            if not self.grid.in_grid(point): raise ValueError(f"{name} {point} is outside the grid")
+            if self.grid.is_blocked(point): raise ValueError(f"{name} {point} is on the wall")
+        col = self.grid.col
+        if self.engine == "lazy":
+            path_info = find_lazy_path(
+                self.graph, start, target, Constant.acute, Constant.right_or_obtuse, self.model, stats, self.search,
+            )
+            nums = path_info[0]
+        elif self.model == 2:
+            path_info = find_turn_path(
+                self.graph, coords_to_num(*start, col), coords_to_num(*target, col),
+                Constant.acute, Constant.right_or_obtuse, stats, self.search,
+            )
+            nums = path_info[0]
+        else:
+            heuristic = get_first_model_heuristic(self.graph, target) if self.search == "astar" else None
+            path_info = find_graph_path(
+                self.graph, self.graph.get_endpoints(start), self.graph.get_endpoints(target), heuristic, stats,
+            )
+            # Turns stay on the same point: their costs go to the next move
+            path_nums = self.graph.get_points(path_info[0]).tolist()
+            nums, costs, pending = path_nums[:1], [], 0
+            for num, cost in zip(path_nums[1:], path_info[2]):
+                pending += cost
+                if num != nums[-1]:
+                    nums.append(num)
+                    costs.append(pending)
+                    pending = 0
+            path_info = PathInfo(nums, costs, costs, path_info[3])
+        points = [num_to_coords(num, col) for num in nums]
+        return PathInfo(points, path_info[1], path_info[2], path_info[3])
+
+    def route_many(self, pairs, stats=None):
+        """
+        Return list of the results of route for every (start, target) of
+        'pairs', None where there is no path. If 'stats' is a list, the
+        counters of every query are appended to it.
+        """
+        results = []
+        for start, target in pairs:
+            query_stats = {}
+            try:
+                results.append(self.route(start, target, query_stats))
+            except NoPathError:
+                results.append(None)
+            if stats is not None: stats.append(query_stats)
+        return results
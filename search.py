@@ -0,0 +1,768 @@
+from collections import namedtuple
+from pathlib import Path
+import heapq
+import math
+import time
+import numpy as np
+from instrument import profiler
+
+# Same fields as the result of dijkstar.find_path
+PathInfo = namedtuple("PathInfo", ("nodes", "edges", "costs", "total_cost"))
+
+class NoPathError(Exception):
+    """
+    Raised when the target cannot be reached
+    """
+
+class TurnGraph:
+    """
+    Moves between adjacent lattice points of model 2, in CSR form. Nodes are
+    numbered as coords_to_num on a 'row'*'col' grid. The moves out of node v are ids
+    indptr[v] to indptr[v + 1] - 1; move e goes to node heads[e], with
+    length lengths[e], along direction directions[direction_ids[e]].
+    Direction 2*s is slope s, direction 2*s + 1 its opposite. straight[e]
+    is the move going on from heads[e] in the same direction (-1 if none),
+    reverse[e] the move back from heads[e].
+    """
+    def __init__(self, row, col, tails, heads, direction_ids, directions, lengths):
+        self.row, self.col = row, col
+        num_nodes = row * col + 1
+        num_directions = len(directions)
+        # Sort moves by tail, then direction: (tail, direction) is unique
+        keys = tails.astype(np.int64) * num_directions + direction_ids
+        order = np.argsort(keys)
+        keys = keys[order]
+        self.indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tails, minlength=num_nodes), out=self.indptr[1:])
+        self.heads = heads[order]
+        self.direction_ids = direction_ids[order]
+        self.lengths = lengths[order]
+        self.directions = directions
+
+        def find_moves(nodes, direction_ids):
+            if len(keys) == 0: return np.zeros(0, dtype=np.int64)
+            wanted = nodes.astype(np.int64) * num_directions + direction_ids
+            # Searching sorted values is much faster
+            wanted_order = np.argsort(wanted)
+            found = np.empty(len(wanted), dtype=np.int64)
+            found[wanted_order] = np.searchsorted(keys, wanted[wanted_order])
+            found = np.minimum(found, len(keys) - 1)
+            return np.where(keys[found] == wanted, found, -1)
+        self.straight = find_moves(self.heads, self.direction_ids)
+        self.reverse = find_moves(self.heads, self.direction_ids ^ 1)
+        if profiler.enabled:
+            profiler.count("graph_nodes", int(np.count_nonzero(np.diff(self.indptr))))
+            profiler.count("graph_edges", len(self.heads))
+
+    def __len__(self):
+        """
+        Number of moves
+        """
+        return len(self.heads)
+
+    @classmethod
+    def from_nodes_info(cls, nodes_info, slopes, row, col):
+        """
+        Build from 'nodes_info' (see reach.fill_nodes_info), whose slopes
+        are taken from 'slopes'. Every step of every run gives a move in
+        both directions.
+        """
+        cols, rows, begin_slopes, reaches = [], [], [], []
+        for key, info in nodes_info.items():
+            count = len(info["begin"])
+            if count == 0: continue
+            current_col, current_row = map(int, key.split("_"))
+            cols += [current_col] * count
+            rows += [current_row] * count
+            begin_slopes += info["begin"]
+            reaches += info["reach"]
+        cols, rows = np.array(cols, dtype=np.int64), np.array(rows, dtype=np.int64)
+        reaches = np.array(reaches, dtype=np.int64)
+        begin_slopes = np.array(begin_slopes, dtype=np.int64).reshape(-1, 2)
+
+        # Slope ids, through a table indexed by [b, a + col]
+        slopes_array = np.array(slopes, dtype=np.int64).reshape(-1, 2)
+        slope_table = np.full((row + 1, 2 * col + 1), -1, dtype=np.int64)
+        slope_table[slopes_array[:, 1], slopes_array[:, 0] + col] = np.arange(len(slopes_array))
+        ids = slope_table[begin_slopes[:, 1], begin_slopes[:, 0] + col]
+
+        # One move per step of every run
+        runs = np.repeat(np.arange(len(reaches)), reaches)
+        steps = np.arange(len(runs)) - np.repeat(np.cumsum(reaches) - reaches, reaches)
+        col_slopes, row_slopes = slopes_array[ids[runs], 0], slopes_array[ids[runs], 1]
+        first_cols, first_rows = cols[runs] + steps * col_slopes, rows[runs] + steps * row_slopes
+        first_nums = col * (first_rows - 1) + first_cols
+        second_nums = first_nums + col * row_slopes + col_slopes
+
+        # Lengths rounded as get_Cartesian_length
+        slope_lengths = np.array([round(math.sqrt(a*a + b*b), 5) for a, b in slopes], dtype=np.float64)
+        directions = np.stack([slopes_array, -slopes_array], axis=1).reshape(-1, 2)
+        return cls(
+            row,
+            col,
+            np.concatenate([first_nums, second_nums]),
+            np.concatenate([second_nums, first_nums]),
+            np.concatenate([2 * ids[runs], 2 * ids[runs] + 1]),
+            directions,
+            np.tile(slope_lengths[ids[runs]], 2),
+        )
+
+    def get_turn_cost(self, direction1, direction2, acute, right_or_obtuse):
+        """
+        Turning cost from direction id 'direction1' to 'direction2', as
+        get_angle_cost_for_model_2
+        """
+        a1, b1 = self.directions[direction1]
+        a2, b2 = self.directions[direction2]
+        if a1 * b2 - b1 * a2 == 0: return 0
+        return acute if a1 * a2 + b1 * b2 < 0 else right_or_obtuse
+
+# Angle order of integer directions, without trigonometry
+def get_pseudo_angles(vectors):
+    """
+    Return (quadrants, positions) of the nonzero integer 'vectors' (shape
+    (n, 2)): the quadrant q, 0 to 3 counterclockwise from (1, 0), each
+    with its first half-axis, and the position in [0, 1) inside it, y/(x + y)
+    once the vector is turned back by q right angles. A vector turned by
+    right angles keeps its position. Equal directions of primitive
+    vectors give equal floats, other ones differ by at least
+    1/(|x| + |y|)^2, so (q, position) sorts them exactly by angle.
+    """
+    x, y = vectors[:, 0], vectors[:, 1]
+    quadrants = np.select([(x > 0) & (y >= 0), (x <= 0) & (y > 0), (x < 0) & (y <= 0)], [0, 1, 2], 3)
+    # Turn back: (x, y) -> (y, -x), (-x, -y) or (-y, x)
+    turned_x = np.choose(quadrants, [x, y, -x, -y])
+    turned_y = np.choose(quadrants, [y, -x, -y, x])
+    return quadrants, turned_y / (turned_x + turned_y)
+
+class SlopeGraph:
+    """
+    Graph of model 1 in CSR form, with integer node ids. The pairs (point,
+    slope) of nodes_info are numbered by point (as coords_to_num), then by
+    slope id (in 'slopes'): the pairs of point p are point_indptr[p] to
+    point_indptr[p + 1] - 1, with slope ids slope_ids[k]. Pair k gives node
+    2k, moving along its slope, and node 2k + 1, moving against it. Nodes
+    from 'num_states' on are the turn gadget (see from_nodes_info), on
+    points gadget_points. Edges out of node v are ids indptr[v] to
+    indptr[v + 1] - 1; edge e goes to node indices[e], with weight
+    weight_values[weight_ids[e]] (a few thousand distinct weights, so
+    small ids rather than a float per edge).
+    """
+    def __init__(self, row, col, slopes, point_indptr, slope_ids, gadget_points, indptr, indices, weight_ids, weight_values):
+        self.row, self.col = row, col
+        self.slopes = np.array(slopes, dtype=np.int64).reshape(-1, 2)
+        # Slope ids, indexed by [b, a + col]
+        self.slope_table = np.full((row + 1, 2 * col + 1), -1, dtype=np.int64)
+        self.slope_table[self.slopes[:, 1], self.slopes[:, 0] + col] = np.arange(len(self.slopes))
+        self.point_indptr = point_indptr
+        self.slope_ids = slope_ids
+        self.num_states = 2 * len(slope_ids)
+        self.gadget_points = gadget_points
+        self.indptr = indptr
+        self.indices = indices
+        self.weight_ids = weight_ids
+        self.weight_values = weight_values
+        if profiler.enabled:
+            profiler.count("graph_nodes", len(indptr) - 1)
+            profiler.count("graph_edges", len(indices))
+
+    def __len__(self):
+        """
+        Number of nodes
+        """
+        return len(self.indptr) - 1
+
+    def get_node(self, point, slope, direction):
+        """
+        Return id of the node of 'point' [i, j] and 'slope', moving along
+        the slope if 'direction' = 1, against it if -1. None if there is no
+        such node.
+        """
+        slope_id = self.slope_table[slope[1], slope[0] + self.col]
+        num = self.col * (point[1] - 1) + point[0]
+        begin, end = self.point_indptr[num], self.point_indptr[num + 1]
+        pair = begin + np.searchsorted(self.slope_ids[begin:end], slope_id)
+        if pair == end or self.slope_ids[pair] != slope_id: return None
+        return int(2 * pair + (direction == -1))
+
+    def get_points(self, nodes):
+        """
+        Return array of the point numbers (as coords_to_num) of 'nodes'
+        """
+        nodes = np.asarray(nodes)
+        states = np.minimum(nodes, self.num_states - 1)
+        gadgets = np.clip(nodes - self.num_states, 0, max(len(self.gadget_points) - 1, 0))
+        return np.where(
+            nodes < self.num_states,
+            np.searchsorted(self.point_indptr, states // 2, side="right") - 1,
+            self.gadget_points[gadgets] if len(self.gadget_points) else -1,
+        )
+
+    def get_slopes(self, nodes):
+        """
+        Return (number of nodes, 2) array of the slopes of the (non-gadget) 'nodes'
+        """
+        return self.slopes[self.slope_ids[np.asarray(nodes) // 2]]
+
+    def get_endpoints(self, point):
+        """
+        Return array of the nodes a path can start or end at on 'point' [i,
+        j]: every node of the point (turning there is free) if it has two
+        slopes or more, else only the node moving along its slope, as the
+        hub of the dijkstar graph. Empty if the point has no node.
+        """
+        num = self.col * (point[1] - 1) + point[0]
+        begin, end = self.point_indptr[num], self.point_indptr[num + 1]
+        if end - begin >= 2: return np.arange(2 * begin, 2 * end)
+        return np.arange(2 * begin, 2 * end, 2)
+
+    @classmethod
+    def from_nodes_info(cls, nodes_info, slopes, row, col, acute, right_or_obtuse):
+        """
+        Build model 1 from 'nodes_info' (see reach.fill_nodes_info), whose
+        slopes are taken from 'slopes', with the costs of the dijkstar graph
+        of node names "col_row_sc_sr_dir" it replaces:
+        - every step of every run, along and against the slope, weighted
+          by its length (rounded as get_Cartesian_length);
+        - at every point, from every node that can be arrived at to every
+          node of another slope that can be left, 'acute' if the angle is
+          acute, else 'right_or_obtuse'.
+        Start and target are not part of the graph (see get_endpoints), so
+        one graph serves every query on the maze.
+        Turns are not k^2 edges per point but go through a gadget: the
+        nodes that can be left are sorted by angle in each quadrant, with
+        a chain of suffix nodes and one of prefix nodes (weight 0 to the
+        next one and to their node). The 'right_or_obtuse' turns from
+        direction u are the closed half-plane [u - 90, u + 90] degrees,
+        i.e. a suffix, a whole quadrant and a prefix; the acute ones are
+        (u + 90, u + 270) without u + 180 (the same line), i.e. two
+        suffixes and two prefixes. So at most 7 edges per node that can be
+        arrived at, and 2 gadget nodes per node that can be left.
+        """
+        slopes_array = np.array(slopes, dtype=np.int64).reshape(-1, 2)
+        num_slopes = len(slopes_array)
+        slope_table = np.full((row + 1, 2 * col + 1), -1, dtype=np.int64)
+        slope_table[slopes_array[:, 1], slopes_array[:, 0] + col] = np.arange(num_slopes)
+
+        # Pairs (point, slope), with their kind: 0 "begin", 1 "middle", 2 "end"
+        point_nums, pair_slopes, kind_counts = [], [], []
+        for key, info in nodes_info.items():
+            current_col, current_row = map(int, key.split("_"))
+            point_nums.append(col * (current_row - 1) + current_col)
+            pair_slopes.append(np.array(info["begin"] + info["middle"] + info["end"], dtype=np.int64).reshape(-1, 2))
+            kind_counts += [len(info["begin"]), len(info["middle"]), len(info["end"])]
+        kind_counts = np.array(kind_counts, dtype=np.int64).reshape(-1, 3)
+        nums = np.repeat(np.array(point_nums, dtype=np.int64), kind_counts.sum(axis=1))
+        kinds = np.repeat(np.tile(np.arange(3, dtype=np.int8), len(point_nums)), kind_counts.reshape(-1))
+        pair_slopes = np.concatenate(pair_slopes) if pair_slopes else np.zeros((0, 2), dtype=np.int64)
+        ids = slope_table[pair_slopes[:, 1], pair_slopes[:, 0] + col]
+        del point_nums, pair_slopes, kind_counts
+        keys = nums * num_slopes + ids
+        order = np.argsort(keys)
+        nums, ids, keys, kinds = nums[order], ids[order], keys[order], kinds[order]
+        del order
+        num_pairs = len(keys)
+        num_states = 2 * num_pairs
+        point_indptr = np.zeros(row * col + 2, dtype=np.int64)
+        np.cumsum(np.bincount(nums, minlength=row * col + 1), out=point_indptr[1:])
+
+        # Node 2k can be left along the slope of pair k from "begin" and
+        # "middle", and arrived at from "middle" and "end"; node 2k + 1 the
+        # other way round. Leaving goes to the next point of the run.
+        along, against = kinds <= 1, kinds >= 1
+        can_leave = np.stack([along, against], axis=1).reshape(-1)
+        can_arrive = np.stack([against, along], axis=1).reshape(-1)
+        del kinds, along, against
+        steps = col * slopes_array[ids, 1] + slopes_array[ids, 0]
+        next_pairs = np.searchsorted(keys, keys + steps * num_slopes).astype(np.int32)
+        previous_pairs = np.searchsorted(keys, keys - steps * num_slopes).astype(np.int32)
+        del steps
+        # Weight ids: slope ids for the runs, then 0, 'right_or_obtuse', 'acute'
+        weight_values = np.array(
+            [round(math.sqrt(a*a + b*b), 5) for a, b in slopes_array.tolist()] + [0, right_or_obtuse, acute],
+            dtype=np.float64,
+        )
+        zero, right_id, acute_id = num_slopes, num_slopes + 1, num_slopes + 2
+
+        def get_points(states):
+            return nums[states // 2]
+        def get_directions(states):
+            return slopes_array[ids[states // 2]] * np.where(states % 2 == 0, 1, -1)[:, None]
+
+        # Turn gadget. Leaves sorted by (point, quadrant, position), as
+        # integer keys: positions are ranked exactly first.
+        leaves = np.flatnonzero(can_leave)
+        arriving = np.flatnonzero(can_arrive)
+        del can_arrive
+        leaf_quadrants, leaf_positions = get_pseudo_angles(get_directions(leaves))
+        arriving_quadrants, arriving_positions = get_pseudo_angles(get_directions(arriving))
+        all_positions = np.unique(np.concatenate([leaf_positions, arriving_positions]))
+        scale = len(all_positions) + 1
+        leaf_keys = (get_points(leaves) * 4 + leaf_quadrants) * scale + np.searchsorted(all_positions, leaf_positions)
+        del leaf_quadrants, leaf_positions
+        order = np.argsort(leaf_keys)
+        leaves, leaf_keys = leaves[order], leaf_keys[order]
+        del order
+        groups = leaf_keys // scale
+        same_group = np.flatnonzero(groups[1:] == groups[:-1])
+        del groups
+        suffixes = num_states + 2 * np.arange(len(leaves))
+        prefixes = suffixes + 1
+        arriving_ranks = np.searchsorted(all_positions, arriving_positions)
+        arriving_groups = get_points(arriving) * 4 + arriving_quadrants
+        del all_positions, arriving_positions, arriving_quadrants
+        num_nodes = num_states + 2 * len(leaves)
+
+        # Edges as (tails, heads, weight ids) batches, generated twice (to
+        # count, then to fill the CSR arrays) rather than kept
+        def get_edge_batches():
+            leaving = np.flatnonzero(can_leave)
+            pairs = leaving // 2
+            run_heads = np.where(leaving % 2 == 0, 2 * next_pairs[pairs], 2 * previous_pairs[pairs].astype(np.int64) + 1)
+            yield leaving, run_heads, ids[pairs]
+            del leaving, pairs, run_heads
+            yield suffixes, leaves, zero
+            yield suffixes[same_group], suffixes[same_group + 1], zero
+            yield prefixes, leaves, zero
+            yield prefixes[same_group + 1], prefixes[same_group], zero
+            # (quarter turns from the arriving direction, part, weight)
+            for quarters, part, weight in (
+                (3, "suffix", right_id),
+                (0, "whole", right_id),
+                (1, "prefix", right_id),
+                (1, "open suffix", acute_id),
+                (2, "open prefix", acute_id),
+                (2, "open suffix", acute_id),
+                (3, "open prefix", acute_id),
+            ):
+                group_keys = (arriving_groups - arriving_groups % 4 + (arriving_groups + quarters) % 4) * scale
+                if part == "whole":
+                    found = np.searchsorted(leaf_keys, group_keys + scale) - 1
+                    nodes = prefixes
+                    valid = found >= np.searchsorted(leaf_keys, group_keys)
+                elif part.endswith("suffix"):
+                    found = np.searchsorted(leaf_keys, group_keys + arriving_ranks, side="right" if part == "open suffix" else "left")
+                    nodes = suffixes
+                    valid = found < np.searchsorted(leaf_keys, group_keys + scale)
+                else:
+                    found = np.searchsorted(leaf_keys, group_keys + arriving_ranks, side="left" if part == "open prefix" else "right") - 1
+                    nodes = prefixes
+                    valid = found >= np.searchsorted(leaf_keys, group_keys)
+                yield arriving[valid], nodes[found[valid]], weight
+
+        # CSR: count the edges of every node, then put each batch in place
+        # (tails of a batch are increasing)
+        degrees = np.zeros(num_nodes, dtype=np.int64)
+        for tails, _, _ in get_edge_batches():
+            degrees[tails] += 1
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        del degrees
+        indices = np.empty(indptr[-1], dtype=np.int32)
+        weight_ids = np.empty(indptr[-1], dtype=np.uint16 if len(weight_values) <= 1 << 16 else np.int32)
+        filled = indptr[:-1].copy()
+        for tails, heads, batch_weights in get_edge_batches():
+            positions = filled[tails]
+            filled[tails] += 1
+            indices[positions] = heads
+            weight_ids[positions] = batch_weights
+        return cls(row, col, slopes_array, point_indptr, ids, np.repeat(get_points(leaves), 2), indptr, indices, weight_ids, weight_values)
+
+# Lower bound of the remaining cost of model 2, for A*
+def get_turn_heuristic(graph, target):
+    """
+    Return ('distance', 'to_x', 'to_y') over the nodes of TurnGraph 'graph':
+    vector ('to_x', 'to_y') from each node to node 'target', and the
+    Euclidean length of it. A state (node, direction) needs at least
+    'distance' more, plus one turn if 'target' is off the line of the
+    direction: a move is never shorter than the distance it covers, and
+    leaving a line costs a turn. Going on along the line or turning keeps
+    this a consistent lower bound, so A* never reopens a state.
+    Lengths of moves are rounded to 5 digits (see get_Cartesian_length),
+    hence the distance is shrunk by 1e-5 to stay below them.
+    """
+    nums = np.arange(graph.row * graph.col + 1)
+    target_x, target_y = (target - 1) % graph.col + 1, (target - 1) // graph.col + 1
+    to_x = target_x - ((nums - 1) % graph.col + 1)
+    to_y = target_y - ((nums - 1) // graph.col + 1)
+    distance = np.sqrt(to_x * to_x + to_y * to_y) * (1 - 1e-5)
+    return distance, to_x, to_y
+
+# Exact shortest path of model 2
+def find_turn_path(graph, start, target, acute, right_or_obtuse, stats=None, search="dijkstra"):
+    """
+    Return PathInfo of the cheapest path from node 'start' to node 'target'
+    in TurnGraph 'graph', where a move costs its length plus the turning
+    cost from the previous move (0 if collinear, 'acute' if the angle is
+    acute, else 'right_or_obtuse'; the first move has no turning cost).
+    Dijkstra over states (node, incoming direction), i.e. over moves, with
+    a heap and lazy deletion; A* if 'search' = "astar" (see
+    get_turn_heuristic). If 'stats' is a dictionary, the numbers of
+    expanded and pushed states are stored in it.
+    """
+    if start == target: return PathInfo([start], [], [], 0)
+    indptr = memoryview(graph.indptr)
+    heads = memoryview(graph.heads)
+    lengths_view = memoryview(graph.lengths)
+    direction_view = memoryview(graph.direction_ids)
+    straight, reverse = memoryview(graph.straight), memoryview(graph.reverse)
+    directions_x = np.ascontiguousarray(graph.directions[:, 0])
+    directions_y = np.ascontiguousarray(graph.directions[:, 1])
+
+    # Plain Dijkstra is A* with a zero heuristic
+    if search == "astar":
+        distance, to_x, to_y = get_turn_heuristic(graph, target)
+        min_turn = min(acute, right_or_obtuse)
+    elif search == "dijkstra":
+        distance = np.zeros(graph.row * graph.col + 1)
+        to_x = to_y = np.zeros(graph.row * graph.col + 1, dtype=np.int64)
+        min_turn = 0
+    else:
+        raise ValueError(f"Unknown search: {search}")
+    distance_list, to_x_list, to_y_list = distance.tolist(), to_x.tolist(), to_y.tolist()
+    def estimate(moves):
+        nodes, move_directions = graph.heads[moves], graph.direction_ids[moves]
+        cross = directions_x[move_directions] * to_y[nodes] - directions_y[move_directions] * to_x[nodes]
+        return distance[nodes] + np.where(cross != 0, min_turn, 0)
+
+    dist = np.full(len(graph), np.inf)
+    dist_view = memoryview(dist)
+    previous = np.full(len(graph), -1, dtype=np.int64)
+    # Once a node is expanded at distance d0, acute turns from any state of
+    # it at distance d >= d0 cost at least as much, and right or obtuse
+    # turns only help while d < d0 + ('acute' - 'right_or_obtuse')
+    best_expanded = {}
+    window = acute - right_or_obtuse
+    heap = []
+    expanded = pushed = 0
+
+    start_moves = np.arange(indptr[start], indptr[start + 1])
+    for move, bound in zip(start_moves.tolist(), estimate(start_moves).tolist()):
+        dist[move] = lengths_view[move]
+        heap.append((lengths_view[move] + bound, move, lengths_view[move]))
+    heapq.heapify(heap)
+    pushed += len(heap)
+
+    last_move = -1
+    while heap:
+        _, move, current = heapq.heappop(heap)
+        if current > dist_view[move]: continue
+        expanded += 1
+        node = heads[move]
+        if node == target:
+            last_move = move
+            break
+        direction = direction_view[move]
+
+        # Going on in the same line, or back: no turning cost, and 'target'
+        # stays on the line or off it
+        off_line = directions_x[direction] * to_y_list[node] != directions_y[direction] * to_x_list[node]
+        line_bound = min_turn if off_line else 0
+        for next_move in (straight[move], reverse[move]):
+            if next_move < 0: continue
+            new = current + lengths_view[next_move]
+            if new < dist_view[next_move]:
+                dist[next_move] = new
+                previous[next_move] = move
+                heapq.heappush(heap, (new + distance_list[heads[next_move]] + line_bound, next_move, new))
+                pushed += 1
+
+        best = best_expanded.get(node)
+        if best is None or current < best: best_expanded[node] = current
+        elif current >= best + window: continue
+
+        # Turning
+        begin, end = indptr[node], indptr[node + 1]
+        out_directions = graph.direction_ids[begin:end]
+        out_x, out_y = directions_x[out_directions], directions_y[out_directions]
+        cross = directions_x[direction] * out_y - directions_y[direction] * out_x
+        dot = directions_x[direction] * out_x + directions_y[direction] * out_y
+        turn = cross != 0
+        if best is not None and current >= best: turn &= dot >= 0
+        new = current + (graph.lengths[begin:end] + np.where(dot < 0, acute, right_or_obtuse))
+        improved = np.flatnonzero(turn & (new < dist[begin:end]))
+        if len(improved) == 0: continue
+        improved_moves = improved + begin
+        dist[improved_moves] = new[improved]
+        previous[improved_moves] = move
+        new_costs = new[improved]
+        for next_move, cost, priority in zip(
+            improved_moves.tolist(), new_costs.tolist(), (new_costs + estimate(improved_moves)).tolist(),
+        ):
+            heapq.heappush(heap, (priority, next_move, cost))
+        pushed += len(improved)
+
+    if stats is not None:
+        stats["expanded"] = expanded
+        stats["pushed"] = pushed
+    if profiler.enabled:
+        profiler.count("heap_pushes", pushed)
+        profiler.count("heap_pops", pushed - len(heap))
+    if last_move < 0: raise NoPathError(f"Could not find a path from {start} to {target}")
+
+    # Moves of the path, from the last one
+    moves = []
+    while last_move >= 0:
+        moves.append(last_move)
+        last_move = int(previous[last_move])
+    moves.reverse()
+    nodes = [start] + [heads[move] for move in moves]
+    costs = [lengths_view[moves[0]]] + [
+        lengths_view[move] + graph.get_turn_cost(direction_view[previous_move], direction_view[move], acute, right_or_obtuse)
+        for previous_move, move in zip(moves, moves[1:])
+    ]
+    return PathInfo(nodes, moves, costs, dist_view[moves[-1]])
+
+# Cost to a fixed target from every state of model 2
+def find_turn_costs(graph, target, acute, right_or_obtuse, stats=None):
+    """
+    Return ('move_costs', 'point_costs') for node 'target' of TurnGraph
+    'graph', with the costs of find_turn_path: move_costs[e] is the cost
+    of the cheapest path to 'target' from node heads[e], having arrived by
+    move e (so turns are paid from its direction), point_costs[v] from node
+    v with no previous move, as at a start. inf where 'target' cannot be
+    reached. One Dijkstra backwards from 'target': once move e is settled,
+    an event at lengths[e] + move_costs[e] relaxes the moves into the tail
+    of e, and these events come in increasing order per node, so the
+    pruning of find_turn_path applies. If 'stats' is a dictionary, the
+    numbers of settled moves and of events that turn (not pruned) are
+    stored in it.
+    """
+    num_nodes = graph.row * graph.col + 1
+    heads = graph.heads
+    lengths_view = memoryview(graph.lengths)
+    direction_view = memoryview(graph.direction_ids)
+    directions_x = np.ascontiguousarray(graph.directions[:, 0])
+    directions_y = np.ascontiguousarray(graph.directions[:, 1])
+    tails = np.repeat(np.arange(num_nodes), np.diff(graph.indptr)).tolist()
+    # Moves into every node, and the move going on straight into the next
+    in_moves = np.argsort(heads, kind="stable")
+    in_indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=num_nodes), out=in_indptr[1:])
+    in_indptr_view = memoryview(in_indptr)
+    previous_straight = np.full(len(graph), -1, dtype=np.int64)
+    has_straight = np.flatnonzero(graph.straight >= 0)
+    previous_straight[graph.straight[has_straight]] = has_straight
+    previous_straight, reverse = previous_straight.tolist(), graph.reverse.tolist()
+
+    move_costs = np.full(len(graph), np.inf)
+    costs_view = memoryview(move_costs)
+    point_costs = np.full(num_nodes, np.inf)
+    point_costs[target] = 0
+    # Heap of (cost, kind, move): kind 0 settles move, kind 1 is its event
+    heap = []
+    for move in in_moves[in_indptr[target]:in_indptr[target + 1]].tolist():
+        move_costs[move] = 0
+        heap.append((0.0, 0, move))
+    heapq.heapify(heap)
+    best_events = {}
+    window = acute - right_or_obtuse
+    settled = turning = 0
+
+    def relax(moves, new):
+        improved = np.flatnonzero(new < move_costs[moves])
+        if len(improved) == 0: return
+        improved_moves, new = moves[improved], new[improved]
+        move_costs[improved_moves] = new
+        for next_move, cost in zip(improved_moves.tolist(), new.tolist()):
+            heapq.heappush(heap, (cost, 0, next_move))
+
+    while heap:
+        current, kind, move = heapq.heappop(heap)
+        if kind == 0:
+            if current > costs_view[move]: continue
+            settled += 1
+            heapq.heappush(heap, (current + lengths_view[move], 1, move))
+            continue
+        node = tails[move]
+        if node == target: continue
+        direction = direction_view[move]
+
+        # Coming straight on or from the opposite move: no turning cost
+        for previous_move in (previous_straight[move], reverse[move]):
+            if previous_move >= 0 and current < costs_view[previous_move]:
+                move_costs[previous_move] = current
+                heapq.heappush(heap, (current, 0, previous_move))
+
+        best = best_events.get(node)
+        if best is None:
+            best_events[node] = current
+            point_costs[node] = current
+        elif current >= best + window: continue
+
+        # Turning into 'move'
+        turning += 1
+        moves = in_moves[in_indptr_view[node]:in_indptr_view[node + 1]]
+        in_directions = graph.direction_ids[moves]
+        in_x, in_y = directions_x[in_directions], directions_y[in_directions]
+        cross = directions_x[direction] * in_y - directions_y[direction] * in_x
+        dot = directions_x[direction] * in_x + directions_y[direction] * in_y
+        turn = cross != 0
+        if best is not None: turn &= dot >= 0
+        moves = moves[turn]
+        relax(moves, current + np.where(dot[turn] < 0, acute, right_or_obtuse))
+
+    if stats is not None:
+        stats["settled"] = settled
+        stats["turning"] = turning
+    return move_costs, point_costs
+
+# Cheapest path from the costs of find_turn_costs, without searching
+def descend_turn_costs(graph, move_costs, point_costs, start, target, acute, right_or_obtuse):
+    """
+    Return PathInfo (as find_turn_path) of the cheapest path from node
+    'start' to node 'target' of TurnGraph 'graph', following at every node
+    the move of least turning cost + length + cost to 'target'. Every move
+    has a positive length, so costs strictly decrease and the path ends.
+    """
+    if start == target: return PathInfo([start], [], [], 0)
+    if not math.isfinite(point_costs[start]): raise NoPathError(f"Could not find a path from {start} to {target}")
+    directions_x, directions_y = graph.directions[:, 0], graph.directions[:, 1]
+    begin, end = graph.indptr[start], graph.indptr[start + 1]
+    moves = [begin + int(np.argmin(graph.lengths[begin:end] + move_costs[begin:end]))]
+    costs = [float(graph.lengths[moves[0]])]
+    node = int(graph.heads[moves[0]])
+    while node != target:
+        direction = graph.direction_ids[moves[-1]]
+        begin, end = graph.indptr[node], graph.indptr[node + 1]
+        out_directions = graph.direction_ids[begin:end]
+        cross = directions_x[direction] * directions_y[out_directions] - directions_y[direction] * directions_x[out_directions]
+        dot = directions_x[direction] * directions_x[out_directions] + directions_y[direction] * directions_y[out_directions]
+        steps = graph.lengths[begin:end] + np.where(cross == 0, 0, np.where(dot < 0, acute, right_or_obtuse))
+        best = int(np.argmin(steps + move_costs[begin:end]))
+        moves.append(begin + best)
+        costs.append(float(steps[best]))
+        node = int(graph.heads[moves[-1]])
+    nodes = [start] + graph.heads[moves].tolist()
+    return PathInfo(nodes, moves, costs, sum(costs))
+
+# Shortest path in a SlopeGraph (or any graph with the same CSR arrays)
+def find_graph_path(graph, start, target, heuristic=None, stats=None):
+    """
+    Return PathInfo of the cheapest path from node 'start' to node 'target'
+    in 'graph', whose edges out of node v are indptr[v] to indptr[v + 1] - 1,
+    going to indices[e] with weight weight_values[weight_ids[e]]. Dijkstra
+    if 'heuristic' is None, else A*, where 'heuristic' is an array of
+    consistent lower bounds of the cost from every node to 'target'.
+    'start' and 'target' can also be arrays of nodes, as if joined by
+    edges of weight 0 to a virtual source and sink: the path then begins
+    at one of 'start' and ends at one of 'target', and 'graph' is left
+    untouched. If 'stats' is a dictionary, the numbers of expanded and
+    pushed nodes are stored in it.
+    """
+    indptr = memoryview(graph.indptr)
+    dist = np.full(len(graph), np.inf)
+    dist_view = memoryview(dist)
+    previous = np.full(len(graph), -1, dtype=np.int64)
+    if heuristic is None: heuristic = np.zeros(len(graph))
+    is_target = np.zeros(len(graph), dtype=bool)
+    is_target[target] = True
+    is_target_view = memoryview(is_target)
+    heap = []
+    for node in np.unique(np.atleast_1d(start)).tolist():
+        dist[node] = 0
+        heap.append((float(heuristic[node]), node, 0.0))
+    heapq.heapify(heap)
+    expanded = 0
+    pushed = len(heap)
+    found = -1
+    while heap:
+        _, node, current = heapq.heappop(heap)
+        if current > dist_view[node]: continue
+        expanded += 1
+        if is_target_view[node]:
+            found = node
+            break
+        begin, end = indptr[node], indptr[node + 1]
+        heads = graph.indices[begin:end]
+        new = current + graph.weight_values[graph.weight_ids[begin:end]]
+        improved = np.flatnonzero(new < dist[heads])
+        if len(improved) == 0: continue
+        improved_nodes, new = heads[improved], new[improved]
+        dist[improved_nodes] = new
+        previous[improved_nodes] = node
+        for next_node, cost, priority in zip(
+            improved_nodes.tolist(), new.tolist(), (new + heuristic[improved_nodes]).tolist(),
+        ):
+            heapq.heappush(heap, (priority, next_node, cost))
+        pushed += len(improved)
+
+    if stats is not None:
+        stats["expanded"] = expanded
+        stats["pushed"] = pushed
+    if profiler.enabled:
+        profiler.count("heap_pushes", pushed)
+        profiler.count("heap_pops", pushed - len(heap))
+    if found < 0: raise NoPathError(f"Could not find a path from {start} to {target}")
+    nodes = [found]
+    while previous[nodes[-1]] >= 0:
+        nodes.append(int(previous[nodes[-1]]))
+    nodes.reverse()
+    costs = [dist_view[next_node] - dist_view[node] for node, next_node in zip(nodes, nodes[1:])]
+    return PathInfo(nodes, costs, costs, dist_view[found])
+
+# Benchmark the native search against dijkstar on model 2
+def benchmark(sizes=(4, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100), samples_per_size=1):
+    """
+    For the first 'samples_per_size' samples of every size in 'sizes', time
+    graph building and search of model 2 with dijkstar and with the native
+    engine, from the same (cached) nodes_info. Return a list of
+    dictionaries, one per sample.
+    """
+    from fun_with_dijkstar import find_second_model_path, get_nodes_info
+    from maze import load_maze_grid
+    results = []
+    for size in sizes:
+        for index in range(1, samples_per_size + 1):
+            if not (Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json").exists(): break
+            grid = load_maze_grid(size, index)
+            if grid.validate() is not None: continue
+            nodes_info = get_nodes_info(grid)
+            result = {"size": size, "sample": index, "moves": 2 * sum(sum(info["reach"]) for info in nodes_info.values())}
+            for engine in ("dijkstar", "native"):
+                engine_start = time.time()
+                try:
+                    cost = find_second_model_path(nodes_info, grid.start, grid.target, size, engine).total_cost
+                except Exception:
+                    cost = None
+                result[f"{engine}_s"] = time.time() - engine_start
+                result[f"{engine}_cost"] = cost
+            print(result)
+            results.append(result)
+    return results
+
+# Compare the expanded states of Dijkstra and A*
+def benchmark_astar(sizes=(60, 70, 80, 90, 100), samples_per_size=1, models=(1, 2)):
+    """
+    For the first 'samples_per_size' samples of every size in 'sizes', solve
+    every model of 'models' (1 and/or 2, native engine) with Dijkstra and
+    with A*, and record the expanded and pushed states, the optimal values
+    and the runtimes. Return a list of dictionaries, one per sample and
+    model.
+    """
+    import contextlib
+    import io
+    from fun_with_dijkstar import solve_with_first_model, solve_with_second_model
+    solvers = {1: solve_with_first_model, 2: solve_with_second_model}
+    results = []
+    for size in sizes:
+        for index in range(1, samples_per_size + 1):
+            if not (Path(__file__).parent/"Samples"/f"Size{size}"/f"sample{index}.json").exists(): break
+            for model in models:
+                result = {"size": size, "sample": index, "model": model}
+                for search in ("dijkstra", "astar"):
+                    stats = {}
+                    output = io.StringIO()
+                    search_start = time.time()
+                    with contextlib.redirect_stdout(output):
+                        solvers[model](size, index, search=search, stats=stats)
+                    result[f"{search}_s"] = time.time() - search_start
+                    result[f"{search}_expanded"] = stats.get("expanded")
+                    result[f"{search}_pushed"] = stats.get("pushed")
+                    values = [line for line in output.getvalue().splitlines() if line.startswith("Optimal value")]
+                    result[f"{search}_cost"] = float(values[0].split()[-1]) if values else None
+                if result["dijkstra_expanded"]:
+                    result["saving"] = 1 - result["astar_expanded"] / result["dijkstra_expanded"]
+                print(result)
+                results.append(result)
+    return results
@@ -0,0 +1,67 @@
+from functools import lru_cache
+import numpy as np
+
+# Reduced fractions p/q with p <= 'max_num' and q <= 'max_den', in increasing
+# order, by an in-order walk of the Stern-Brocot tree
+def get_bounded_fractions(max_num, max_den):
+    """
+    Return list of (p, q), p, q >= 1, gcd(p, q) = 1, p <= 'max_num',
+    q <= 'max_den', sorted by p/q. No gcd is ever computed: every mediant
+    of two Farey neighbours is already reduced.
+    """
+    fractions = []
+    if max_num < 1 or max_den < 1: return fractions
+    # Stack of pending intervals (left, right), left < right as fractions.
+    # (0, 1) and (1, 0) stand for 0 and infinity.
+    stack = [((0, 1), (1, 0))]
+    while stack:
+        left, right = stack.pop()
+        if left is None:
+            # Marker: 'right' is the next fraction in order
+            fractions.append(right)
+            continue
+        mediant = (left[0] + right[0], left[1] + right[1])
+        # Descendants of the mediant only grow, so prune here
+        if mediant[0] > max_num or mediant[1] > max_den: continue
+        stack.append((mediant, right))
+        stack.append((None, mediant))
+        stack.append((left, mediant))
+    return fractions
+
+# All slopes of a grid, computed once per grid size
+@lru_cache(maxsize=32)
+def get_grid_slopes(row, col):
+    """
+    Return tuple of every irreducible slope (a, b) (b > 0, or b = 0 and
+    a = 1) joining two points of a 'row'*'col' grid, in increasing order
+    of angle (Farey order): (1, 0), the right-upward slopes, (0, 1), then
+    the left-upward slopes.
+    """
+    right_upward = [(q, p) for p, q in get_bounded_fractions(row - 1, col - 1)]
+    slopes = []
+    if col > 1: slopes.append((1, 0))
+    slopes += right_upward
+    if row > 1: slopes.append((0, 1))
+    slopes += [(-a, b) for a, b in reversed(right_upward)]
+    return tuple(slopes)
+
+# Same, as a read-only NumPy array, for clipping
+@lru_cache(maxsize=32)
+def get_grid_slope_array(row, col):
+    """
+    Return get_grid_slopes('row', 'col') as a read-only (number of slopes, 2) array
+    """
+    slopes = np.array(get_grid_slopes(row, col), dtype=np.int64).reshape(-1, 2)
+    slopes.setflags(write=False)
+    return slopes
+
+# Slopes available from a point, by clipping the slopes of the grid
+def get_point_slope_ids(current_col, current_row, row, col):
+    """
+    Return ids (in get_grid_slopes('row', 'col')) of the slopes whose first
+    step from point ('current_col', 'current_row') stays in the grid
+    """
+    slopes = get_grid_slope_array(row, col)
+    next_cols = current_col + slopes[:, 0]
+    available = (next_cols >= 1) & (next_cols <= col) & (current_row + slopes[:, 1] <= row)
+    return np.flatnonzero(available)
@@ -0,0 +1,134 @@
+from pathlib import Path
+import json
+import numpy as np
+
+# Points of a 'size'*'size' grid are numbered row by row, from 0
+def point_to_index(point, size):
+    """
+    Return the number of point ['i', 'j'] (column, row, from 1)
+    """
+    return (point[1] - 1) * size + point[0] - 1
+
+def index_to_point(index, size):
+    """
+    Return point [i, j] of number 'index'
+    """
+    return [index % size + 1, index // size + 1]
+
+# Folder of the binary files of a sample
+def get_nodes_path(size, index):
+    """
+    Return path of the folder holding the binary unreachable nodes of
+    sample 'index' of size 'size'
+    """
+    return Path(__file__).parent/"Unreachable_nodes"/f"Size{size}"/f"sample{index}"
+
+class UnreachableNodes:
+    """
+    Unreachable nodes of one maze in CSR form: the unreachable points of
+    point number p (see point_to_index) are numbered
+    indices[offsets[p]:offsets[p + 1]]. Saved as two .npy files, so that
+    both arrays can be memory-mapped instead of loaded.
+    Can be used like the dictionary of get_unreachable_nodes, keyed "i_j".
+    """
+    def __init__(self, offsets, indices, size):
+        self.offsets = offsets
+        self.indices = indices
+        self.size = size
+
+    @classmethod
+    def from_dict(cls, unreachable_nodes, size):
+        """
+        Build from the dictionary of get_unreachable_nodes. Missing keys
+        (points on walls) get no unreachable point.
+        """
+        counts = np.zeros(size * size, dtype=np.int64)
+        rows = [None] * (size * size)
+        for key, points in unreachable_nodes.items():
+            i, j = map(int, key.split("_"))
+            number = point_to_index([i, j], size)
+            rows[number] = [point_to_index(point, size) for point in points]
+            counts[number] = len(points)
+        offsets = np.zeros(size * size + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        # Smallest type that fits every point number
+        dtype = np.uint16 if size * size <= np.iinfo(np.uint16).max + 1 else np.int32
+        indices = np.fromiter(
+            (number for row in rows if row for number in row), dtype=dtype, count=int(offsets[-1]),
+        )
+        return cls(offsets, indices, size)
+
+    @classmethod
+    def load(cls, size, index, mmap_mode="r"):
+        """
+        Load the binary unreachable nodes of sample 'index' of size 'size',
+        memory-mapped with 'mmap_mode' (None to read into memory)
+        """
+        path = get_nodes_path(size, index)
+        offsets = np.load(path/"offsets.npy", mmap_mode=mmap_mode)
+        indices = np.load(path/"indices.npy", mmap_mode=mmap_mode)
+        return cls(offsets, indices, size)
+
+    def save(self, index):
+        """
+        Save as binary unreachable nodes of sample 'index'
+        """
+        path = get_nodes_path(self.size, index)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path/"offsets.npy", np.asarray(self.offsets))
+        np.save(path/"indices.npy", np.asarray(self.indices))
+
+    def get_indices(self, point):
+        """
+        Return numbers of the points unreachable from 'point'
+        """
+        number = point_to_index(point, self.size)
+        return self.indices[self.offsets[number]:self.offsets[number + 1]]
+
+    def __getitem__(self, key):
+        i, j = map(int, key.split("_"))
+        numbers = self.get_indices([i, j]).astype(np.int64)
+        return np.stack([numbers % self.size + 1, numbers // self.size + 1], axis=1).tolist()
+
+    def to_dict(self):
+        """
+        Return the dictionary of get_unreachable_nodes (points on walls,
+        which have no unreachable point, are kept with an empty list)
+        """
+        return {
+            f"{i}_{j}": self[f"{i}_{j}"]
+            for j in range(1, self.size + 1) for i in range(1, self.size + 1)
+        }
+
+# Unreachable nodes for the MILP builders: binary if available, else JSON
+def load_unreachable_nodes(size, index, mmap_mode="r"):
+    """
+    Return unreachable nodes of sample 'index' of size 'size', as
+    UnreachableNodes if the binary files exist, else as the JSON dictionary,
+    None if neither exists
+    """
+    if (get_nodes_path(size, index)/"offsets.npy").exists():
+        return UnreachableNodes.load(size, index, mmap_mode=mmap_mode)
+    nodes_path = Path(__file__).parent/"Unreachable_nodes"/f"Size{size}"/f"sample{index}.json"
+    if not nodes_path.exists(): return None
+    with open(nodes_path, "r") as f:
+        return json.load(f)
+
+# Converter from the JSON files
+def convert_json_files(sizes=None):
+    """
+    Convert every Unreachable_nodes/Size{size}/sample{index}.json (for all
+    sizes if 'sizes' is None) to binary unreachable nodes. Return list of
+    converted (size, index).
+    """
+    converted = []
+    for size_path in sorted((Path(__file__).parent/"Unreachable_nodes").glob("Size*")):
+        size = int(size_path.name[len("Size"):])
+        if sizes is not None and size not in sizes: continue
+        for nodes_path in sorted(size_path.glob("sample*.json")):
+            index = int(nodes_path.stem[len("sample"):])
+            with open(nodes_path, "r") as f:
+                unreachable_nodes = json.load(f)
+            UnreachableNodes.from_dict(unreachable_nodes, size).save(index)
+            converted.append((size, index))
+    return converted
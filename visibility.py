@@ -0,0 +1,231 @@
+from bisect import bisect_left, insort
+from pathlib import Path
+import json
+import math
+import random
+import time
+import numpy as np
+from walls import WallArray, get_blocked_step_arrays, NO_BLOCK
+
+# Crossing points of every pair of walls, as exact rationals
+def get_wall_crossings(walls):
+    """
+    Return (x_num, y_num, den, first, second) arrays, den > 0: the point
+    (x_num/den, y_num/den) is a crossing of walls first and second of
+    'walls'.
+    """
+    first, second = np.triu_indices(len(walls), k=1)
+    a1, b1 = walls.a1[first], walls.b1[first]
+    wx, wy = walls.a2[first] - a1, walls.b2[first] - b1
+    qx, qy = walls.a1[second] - a1, walls.b1[second] - b1
+    vx, vy = walls.a2[second] - walls.a1[second], walls.b2[second] - walls.b1[second]
+    den = wx*vy - wy*vx
+    t = qx*vy - qy*vx
+    u = qx*wy - qy*wx
+    sign = np.where(den < 0, -1, 1)
+    den, t, u = den*sign, t*sign, u*sign
+    crossing = (den != 0) & (t >= 0) & (t <= den) & (u >= 0) & (u <= den)
+    den, t = den[crossing], t[crossing]
+    return a1[crossing]*den + t*wx[crossing], b1[crossing]*den + t*wy[crossing], den, first[crossing], second[crossing]
+
+class VisibilitySweep:
+    """
+    Visibility from single lattice points, by one angular sweep around the
+    point. Wall endpoints (and wall crossings) sorted by angle split the
+    plane into sectors, each seeing a single nearest wall: this is the
+    visibility polygon of the point. The sweep keeps the walls met by the
+    ray ordered by distance, and only updates the walls of each event, in
+    O((W + C) log W) for W walls and C crossings. The reach along any
+    slope is then a lookup of its sector, plus one exact test against that
+    sector's wall. Can be used as 'edge_list' in get_furthest_reach.
+    """
+    # Slopes closer than this (in radians) to a sector boundary are tested
+    # exactly against every wall
+    boundary_tolerance = 1e-9
+
+    def __init__(self, edge_list):
+        self.walls = WallArray(edge_list)
+        self.crossings = get_wall_crossings(self.walls)
+
+    def __len__(self):
+        return len(self.walls)
+
+    def is_on_wall(self, point):
+        """
+        Check if 'point' lies on a wall
+        """
+        walls = self.walls
+        qx1, qy1 = walls.a1 - point[0], walls.b1 - point[1]
+        qx2, qy2 = walls.a2 - point[0], walls.b2 - point[1]
+        return bool(((qx1*qy2 - qy1*qx2 == 0) & (qx1*qx2 + qy1*qy2 <= 0)).any())
+
+    def get_visibility(self, point):
+        """
+        Return (angles, nearest): sector k spans from angles[k] to
+        angles[k + 1] (cyclically), and nearest[k] is the id of the wall
+        seen from 'point' in that sector, -1 if none.
+        """
+        walls = self.walls
+        x_num, y_num, den, first, second = self.crossings
+        # Directions of all events and their walls, reduced so that equal
+        # directions match
+        directions = np.concatenate([
+            np.stack([walls.a1 - point[0], walls.b1 - point[1]], axis=1),
+            np.stack([walls.a2 - point[0], walls.b2 - point[1]], axis=1),
+            np.stack([x_num - point[0]*den, y_num - point[1]*den], axis=1),
+            np.stack([x_num - point[0]*den, y_num - point[1]*den], axis=1),
+        ])
+        wall_ids = np.arange(len(walls))
+        event_walls = np.concatenate([wall_ids, wall_ids, first, second])
+        kept = (directions != 0).any(axis=1)
+        directions, event_walls = directions[kept], event_walls[kept]
+        directions //= np.gcd(directions[:, 0], directions[:, 1])[:, None]
+        angles, event_ids = np.unique(np.arctan2(directions[:, 1], directions[:, 0]), return_inverse=True)
+        if len(angles) == 0: return angles, np.zeros(0, dtype=np.int64)
+        # Walls of each event, in order of angle
+        order = np.argsort(event_ids, kind="stable")
+        bounds = np.searchsorted(event_ids[order], np.arange(len(angles) + 1)).tolist()
+        event_walls = event_walls[order].tolist()
+
+        next_angles = np.append(angles[1:], angles[0] + 2*math.pi)
+        middle = (angles + next_angles) / 2
+        ray_x, ray_y = np.cos(middle).tolist(), np.sin(middle).tolist()
+        qx, qy = (walls.a1 - point[0]).tolist(), (walls.b1 - point[1]).tolist()
+        wx, wy = (walls.a2 - walls.a1).tolist(), (walls.b2 - walls.b1).tolist()
+
+        # Distance to wall w along the middle ray of sector k (inf if missed)
+        def get_distance(k, w):
+            rx, ry = ray_x[k], ray_y[k]
+            d = rx*wy[w] - ry*wx[w]
+            if d == 0: return math.inf
+            t = (qx[w]*wy[w] - qy[w]*wx[w]) / d
+            u = (qx[w]*ry - qy[w]*rx) / d
+            return t if t > 0 and 0 <= u <= 1 else math.inf
+
+        # Walls met by the ray of sector 0, nearest first
+        active = sorted(
+            (w for w in range(len(walls)) if get_distance(0, w) < math.inf),
+            key=lambda w: get_distance(0, w),
+        )
+        nearest = [active[0] if active else -1]
+        # Between two events no wall starts, ends or crosses another, so the
+        # order of the other walls stays the same
+        for k in range(1, len(angles)):
+            involved = set(event_walls[bounds[k]:bounds[k + 1]])
+            for w in involved:
+                index = bisect_left(active, get_distance(k - 1, w), key=lambda v: get_distance(k - 1, v))
+                # Overlapping walls are at the same distance
+                while index < len(active) and active[index] != w and get_distance(k - 1, active[index]) == get_distance(k - 1, w):
+                    index += 1
+                if index < len(active) and active[index] == w: del active[index]
+            for w in involved:
+                if get_distance(k, w) < math.inf: insort(active, w, key=lambda v: get_distance(k, v))
+            nearest.append(active[0] if active else -1)
+        return angles, np.array(nearest, dtype=np.int64)
+
+    def get_blocked_steps(self, point, slopes):
+        """
+        Return, for every slope, the smallest k >= 1 such that segment
+        ['point', 'point' + k*slope] meets a wall (NO_BLOCK if none)
+        """
+        slopes = np.asarray(slopes, dtype=np.int64).reshape(-1, 2)
+        steps = np.full(len(slopes), NO_BLOCK)
+        if len(self) == 0 or len(slopes) == 0: return steps
+        if self.is_on_wall(point):
+            steps[:] = 1
+            return steps
+        walls = self.walls
+        angles, nearest = self.get_visibility(point)
+
+        # Locate each slope in its sector
+        slope_angles = np.arctan2(slopes[:, 1], slopes[:, 0])
+        after = np.searchsorted(angles, slope_angles) % len(angles)
+        before = (after - 1) % len(angles)
+        gap = np.minimum(
+            np.abs((slope_angles - angles[after] + math.pi) % (2*math.pi) - math.pi),
+            np.abs((slope_angles - angles[before] + math.pi) % (2*math.pi) - math.pi),
+        )
+        on_boundary = gap < self.boundary_tolerance
+
+        # Inside a sector: only the nearest wall can block
+        inside = np.flatnonzero(~on_boundary & (nearest[before] >= 0))
+        wall_ids = nearest[before[inside]]
+        steps[inside] = get_blocked_step_arrays(
+            point[0], point[1], slopes[inside, 0], slopes[inside, 1],
+            walls.a1[wall_ids], walls.b1[wall_ids], walls.a2[wall_ids], walls.b2[wall_ids],
+        )
+        # On a sector boundary: test every wall
+        boundary = np.flatnonzero(on_boundary)
+        if len(boundary):
+            steps[boundary] = get_blocked_step_arrays(
+                point[0], point[1], slopes[boundary, 0, None], slopes[boundary, 1, None],
+                walls.a1[None, :], walls.b1[None, :], walls.a2[None, :], walls.b2[None, :],
+            ).min(axis=1)
+        return steps
+
+    def get_reaches(self, point, slopes, max_reaches):
+        """
+        Return the largest r < max_reach such that segment
+        ['point', 'point' + r*slope] meets no wall, for every slope
+        """
+        steps = self.get_blocked_steps(point, slopes)
+        return np.minimum(steps - 1, np.asarray(max_reaches, dtype=np.int64) - 1).clip(min=0)
+
+    def get_reach(self, point, slope, max_reach):
+        """
+        get_reaches for a single slope
+        """
+        return int(self.get_reaches(point, [slope], [max_reach])[0])
+
+# Benchmark the sweep against binary search (get_furthest_reach)
+def benchmark(sizes=(4, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100), points_per_maze=100, seed=0):
+    """
+    For every sample of every size in 'sizes', time the reach of every slope
+    from 'points_per_maze' random free points, with binary search and with
+    the visibility sweep, and check that both agree.
+    Return a list of dictionaries, one per sample.
+    """
+    from fun_with_dijkstar import get_furthest_reach, get_max_reach, get_points_between
+    from reach import get_all_slopes
+    rng = random.Random(seed)
+    results = []
+    for size in sizes:
+        all_slopes = get_all_slopes(size, size)
+        for grid_path in sorted((Path(__file__).parent/"Samples"/f"Size{size}").glob("sample*.json")):
+            with open(grid_path, "r") as f:
+                edges = json.load(f)["edges"]
+            redundant_points = set()
+            for edge in edges:
+                for point in get_points_between(edge[0], edge[1]):
+                    redundant_points.add(tuple(point))
+            free_points = [[i, j] for j in range(1, size + 1) for i in range(1, size + 1) if (i, j) not in redundant_points]
+            points = rng.sample(free_points, min(points_per_maze, len(free_points)))
+            queries = [
+                (point, [slope for slope in all_slopes if 1 <= point[0] + slope[0] <= size and point[1] + slope[1] <= size])
+                for point in points
+            ]
+
+            binary_start = time.time()
+            expected = [[get_furthest_reach(point, slope, size, size, edges) for slope in slopes] for point, slopes in queries]
+            binary_time = time.time() - binary_start
+
+            sweep_start = time.time()
+            sweep = VisibilitySweep(edges)
+            obtained = [
+                sweep.get_reaches(point, slopes, [get_max_reach(point, slope, size, size) for slope in slopes]).tolist()
+                for point, slopes in queries
+            ]
+            sweep_time = time.time() - sweep_start
+
+            result = {
+                "size": size,
+                "sample": grid_path.stem,
+                "walls": len(edges),
+                "queries": sum(len(slopes) for point, slopes in queries),
+                "binary_search_s": binary_time,
+                "visibility_s": sweep_time,
+                "identical": expected == obtained,
+            }
+            print(result)
+            results.append(result)
+    return results
@@ -0,0 +1,322 @@
+import numpy as np
+from instrument import profiler
+
+# Vectorized version of check_intersection, for both models.
+# All arguments are integer NumPy arrays (or scalars) broadcastable to a
+# common shape, so that one segment can be tested against every wall, or a
+# batch of segments against every wall, in one call.
+def check_intersection_arrays(x1, y1, x2, y2, a1, b1, a2, b2):
+    """
+    Check intersection of segments [('x1', 'y1'), ('x2', 'y2')] with walls
+    [('a1', 'b1'), ('a2', 'b2')], element-wise. Return a boolean array with
+    exactly the same answers as check_intersection.
+    """
+    """
+    Same system as in check_intersection:
+    u*(a1 - a2) - v*(x1 - x2) = x2 - a2
+    u*(b1 - b2) - v*(y1 - y2) = y2 - b2
+    Condition of intersection: u, v in [0, 1]
+    """
+    d = (a2 - a1)*(y1 - y2) + (b1 - b2)*(x1 - x2)
+    d1 = (a2 - x2)*(y1 - y2) + (y2 - b2)*(x1 - x2)
+    d2 = (a1 - a2)*(y2 - b2) + (b2 - b1)*(x2 - a2)
+
+    # Proper case (d != 0)
+    cond_u = ((d > 0) & (d1 >= 0) & (d1 <= d)) | ((d < 0) & (d1 <= 0) & (d1 >= d))
+    cond_v = ((d > 0) & (d2 >= 0) & (d2 <= d)) | ((d < 0) & (d2 <= 0) & (d2 >= d))
+    proper = cond_u & cond_v
+
+    # Collinear case (d = d1 = d2 = 0), rare in practice. Compare rows if
+    # the wall is vertical, columns otherwise, with the same four sign cases
+    # as check_intersection.
+    parallel = d == 0
+    if not np.any(parallel): return proper
+    vertical = (a1 - a2) == 0
+    p1 = np.where(vertical, y1, x1)
+    p2 = np.where(vertical, y2, x2)
+    q1 = np.where(vertical, b1, a1)
+    q2 = np.where(vertical, b2, a2)
+    q12 = q1 - q2
+    p12 = p1 - p2
+    case_1 = (q12 > 0) & (p12 > 0)
+    case_2 = (q12 > 0) & (p12 < 0)
+    case_3 = (q12 < 0) & (p12 > 0)
+    overlap = np.where(
+        case_1, (p1 - q2 >= 0) & (p2 - q1 <= 0), np.where(
+        case_2, (p2 - q2 >= 0) & (p1 - q1 <= 0), np.where(
+        case_3, (p2 - q2 <= 0) & (p1 - q1 >= 0),
+        (p1 - q2 <= 0) & (p2 - q1 >= 0),
+    )))
+    collinear = (d1 == 0) & (d2 == 0) & overlap
+
+    return np.where(parallel, collinear, proper)
+
+class WallArray:
+    """
+    All walls of a maze held as integer NumPy arrays. Drop-in replacement
+    for 'edge_list' in get_furthest_reach: every probe tests the whole
+    wall set with one vectorized call instead of a Python loop.
+    """
+    def __init__(self, edge_list):
+        edges = np.asarray(edge_list, dtype=np.int64).reshape(-1, 2, 2)
+        self.a1 = edges[:, 0, 0]
+        self.b1 = edges[:, 0, 1]
+        self.a2 = edges[:, 1, 0]
+        self.b2 = edges[:, 1, 1]
+
+    def __len__(self):
+        return len(self.a1)
+
+    def check_intersection(self, point1, point2):
+        """
+        Return boolean array, True at walls meeting segment ['point1', 'point2']
+        """
+        if profiler.enabled: profiler.count("check_intersection", len(self))
+        return check_intersection_arrays(
+            point1[0], point1[1], point2[0], point2[1],
+            self.a1, self.b1, self.a2, self.b2,
+        )
+
+    def intersects(self, point1, point2):
+        """
+        Check if segment ['point1', 'point2'] meets any wall
+        """
+        return bool(self.check_intersection(point1, point2).any())
+
+    def check_intersection_batch(self, points1, points2):
+        """
+        Test a batch of segments ['points1'[s], 'points2'[s]] against every
+        wall. Return boolean array of shape (number of segments, number of walls).
+        """
+        points1 = np.asarray(points1, dtype=np.int64).reshape(-1, 2)
+        points2 = np.asarray(points2, dtype=np.int64).reshape(-1, 2)
+        if profiler.enabled: profiler.count("check_intersection", len(points1) * len(self))
+        return check_intersection_arrays(
+            points1[:, 0, None], points1[:, 1, None],
+            points2[:, 0, None], points2[:, 1, None],
+            self.a1[None, :], self.b1[None, :], self.a2[None, :], self.b2[None, :],
+        )
+
+    def intersects_batch(self, points1, points2):
+        """
+        Return boolean array, True at segments meeting any wall
+        """
+        return self.check_intersection_batch(points1, points2).any(axis=1)
+
+    def get_reach(self, point, slope, max_reach):
+        """
+        Return the largest r < 'max_reach' such that segment
+        ['point', 'point' + r*'slope'] meets no wall. All candidate
+        segments are tested in one batch.
+        """
+        return int(self.get_reaches(point, [slope], [max_reach])[0])
+
+    def get_reaches(self, point, slopes, max_reaches):
+        """
+        Batched get_reach over several slopes from the same 'point'
+        """
+        slopes = np.asarray(slopes, dtype=np.int64).reshape(-1, 2)
+        max_reaches = np.asarray(max_reaches, dtype=np.int64)
+        reaches = np.maximum(max_reaches - 1, 0)
+        counts = reaches
+        total = int(counts.sum())
+        if total == 0 or len(self) == 0: return reaches
+        if profiler.enabled: profiler.count("reach_probes", total)
+        # One segment ['point', 'point' + k*slope] per slope and per k
+        group = np.repeat(np.arange(len(slopes)), counts)
+        steps = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+        ends = np.asarray(point, dtype=np.int64) + steps[:, None] * slopes[group]
+        blocked = self.intersects_batch(np.broadcast_to(point, ends.shape), ends)
+        # First blocked step of each slope
+        first_blocked = np.full(len(slopes), np.iinfo(np.int64).max)
+        np.minimum.at(first_blocked, group[blocked], steps[blocked])
+        return np.minimum(reaches, first_blocked - 1)
+
+# Integer ceiling division, for exact rational comparisons below
+def ceil_div(a, b):
+    """
+    Return ceil('a' / 'b') for integers, 'b' > 0
+    """
+    return -(-a // b)
+
+# Exact first blocked step along a ray, against a single wall
+def get_blocked_step(point, slope, edge):
+    """
+    Return the smallest k >= 1 such that segment ['point', 'point' + k*'slope']
+    meets 'edge', or None if no such k exists. Agrees with check_intersection
+    on every such segment.
+    """
+    px, py = point[0], point[1]
+    sx, sy = slope[0], slope[1]
+    a1, b1 = edge[0][0], edge[0][1]
+    wx, wy = edge[1][0] - a1, edge[1][1] - b1
+    qx, qy = a1 - px, b1 - py
+    # Ray: point + t*slope, wall: edge[0] + u*(edge[1] - edge[0])
+    d = sx*wy - sy*wx
+    if d != 0:
+        t = qx*wy - qy*wx
+        u = qx*sy - qy*sx
+        if d < 0: d, t, u = -d, -t, -u
+        if u < 0 or u > d or t < 0: return None
+        return max(1, ceil_div(t, d))
+    # Parallel: only collinear walls can meet the ray
+    if qx*sy - qy*sx != 0: return None
+    length = sx*sx + sy*sy
+    t1 = qx*sx + qy*sy
+    t2 = (qx + wx)*sx + (qy + wy)*sy
+    if max(t1, t2) < 0: return None
+    return max(1, ceil_div(min(t1, t2), length))
+
+# Cells of a uniform grid met by a segment, used by WallIndex
+def get_cells_on_segment(point1, point2, cell_size):
+    """
+    Return the cells (cx, cy), covering [cx*'cell_size', (cx + 1)*'cell_size']
+    * [cy*'cell_size', (cy + 1)*'cell_size'] (boundary included), met by
+    segment ['point1', 'point2']. Cost grows with segment length.
+    """
+    if point1[1] > point2[1]: point1, point2 = point2, point1
+    x1, y1, x2, y2 = point1[0], point1[1], point2[0], point2[1]
+    c = cell_size
+    cells = []
+    if y1 == y2:
+        for cy in range(ceil_div(y1, c) - 1, y1 // c + 1):
+            for cx in range(ceil_div(min(x1, x2), c) - 1, max(x1, x2) // c + 1):
+                cells.append((cx, cy))
+        return cells
+    dx, dy = x2 - x1, y2 - y1
+    for cy in range(ceil_div(y1, c) - 1, y2 // c + 1):
+        y_low, y_high = max(y1, cy*c), min(y2, (cy + 1)*c)
+        if y_low > y_high: continue
+        # Column range of the segment inside this row of cells, as x = num/dy
+        num_low = x1*dy + (y_low - y1)*dx
+        num_high = x1*dy + (y_high - y1)*dx
+        num_low, num_high = min(num_low, num_high), max(num_low, num_high)
+        for cx in range(ceil_div(num_low, dy*c) - 1, num_high // (dy*c) + 1):
+            cells.append((cx, cy))
+    return cells
+
+class WallIndex:
+    """
+    Uniform grid of buckets over the walls of a maze, built once from
+    'edges'. A query only tests the walls registered in the cells its
+    segment passes through, so its cost grows with segment length rather
+    than with the number of walls. Can be used as 'edge_list' in
+    get_furthest_reach.
+    Counters: 'queries' (number of queries), 'tested' (number of candidate
+    walls tested over all queries), compared to len(self) walls per query
+    for a full scan.
+    """
+    def __init__(self, edge_list, cell_size=4):
+        self.edges = [[list(edge[0]), list(edge[1])] for edge in edge_list]
+        self.cell_size = cell_size
+        self.buckets = dict()
+        for wall_id, edge in enumerate(self.edges):
+            for cell in get_cells_on_segment(edge[0], edge[1], cell_size):
+                self.buckets.setdefault(cell, []).append(wall_id)
+        self.reset_counters()
+
+    def __len__(self):
+        return len(self.edges)
+
+    def reset_counters(self):
+        self.queries = 0
+        self.tested = 0
+
+    def get_stats(self):
+        """
+        Return the candidate counters, next to the cost of a full scan
+        """
+        return {
+            "queries": self.queries,
+            "tested": self.tested,
+            "total": self.queries * len(self),
+            "mean_tested_per_query": self.tested / self.queries if self.queries else 0,
+            "walls": len(self),
+        }
+
+    def get_candidates(self, point1, point2):
+        """
+        Return ids of walls sharing a cell with segment ['point1', 'point2']
+        """
+        candidates = set()
+        for cell in get_cells_on_segment(point1, point2, self.cell_size):
+            candidates.update(self.buckets.get(cell, ()))
+        return candidates
+
+    def intersects(self, point1, point2):
+        """
+        Check if segment ['point1', 'point2'] meets any wall
+        """
+        self.queries += 1
+        if point1[0] == point2[0] and point1[1] == point2[1]:
+            # Degenerate segment, fall back on a full scan
+            self.tested += len(self)
+            return bool(WallArray(self.edges).intersects(point1, point2))
+        slope = [point2[0] - point1[0], point2[1] - point1[1]]
+        for wall_id in self.get_candidates(point1, point2):
+            self.tested += 1
+            if get_blocked_step(point1, slope, self.edges[wall_id]) == 1:
+                return True
+        return False
+
+    def get_reach(self, point, slope, max_reach):
+        """
+        Return the largest r < 'max_reach' such that segment
+        ['point', 'point' + r*'slope'] meets no wall. Cells are visited
+        one step at a time, so the walk stops at the first blocking wall.
+        """
+        self.queries += 1
+        seen_walls = set()
+        seen_cells = set()
+        best = max_reach
+        for k in range(1, max_reach):
+            step_start = [point[0] + (k - 1)*slope[0], point[1] + (k - 1)*slope[1]]
+            step_end = [point[0] + k*slope[0], point[1] + k*slope[1]]
+            for cell in get_cells_on_segment(step_start, step_end, self.cell_size):
+                if cell in seen_cells: continue
+                seen_cells.add(cell)
+                for wall_id in self.buckets.get(cell, ()):
+                    if wall_id in seen_walls: continue
+                    seen_walls.add(wall_id)
+                    self.tested += 1
+                    step = get_blocked_step(point, slope, self.edges[wall_id])
+                    if step is not None and step < best: best = step
+            # Every wall meeting the ray before step_end has been seen
+            if best <= k: return best - 1
+        return max_reach - 1
+
+    def get_reaches(self, point, slopes, max_reaches):
+        """
+        get_reach over several slopes from the same 'point'
+        """
+        return np.array(
+            [self.get_reach(point, slope, max_reach) for slope, max_reach in zip(slopes, max_reaches)],
+            dtype=np.int64,
+        )
+
+# Returned by get_blocked_step_arrays when a ray never meets a wall
+NO_BLOCK = np.iinfo(np.int64).max // 4
+
+# Vectorized version of get_blocked_step
+def get_blocked_step_arrays(px, py, sx, sy, a1, b1, a2, b2):
+    """
+    Element-wise get_blocked_step for rays 'p' + k*'s' against walls
+    [('a1', 'b1'), ('a2', 'b2')]. Missing steps are returned as NO_BLOCK.
+    """
+    wx, wy = a2 - a1, b2 - b1
+    qx, qy = a1 - px, b1 - py
+    d = sx*wy - sy*wx
+    t = qx*wy - qy*wx
+    u = qx*sy - qy*sx
+    sign = np.where(d < 0, -1, 1)
+    d, t, u = d*sign, t*sign, u*sign
+    safe_d = np.where(d == 0, 1, d)
+    proper = (d != 0) & (u >= 0) & (u <= d) & (t >= 0)
+    proper_step = np.maximum(1, -(-t // safe_d))
+    # Parallel walls meet the ray only if collinear with it
+    length = sx*sx + sy*sy
+    t1 = qx*sx + qy*sy
+    t2 = (qx + wx)*sx + (qy + wy)*sy
+    collinear = (d == 0) & (u == 0) & (np.maximum(t1, t2) >= 0)
+    collinear_step = np.maximum(1, -(-np.minimum(t1, t2) // length))
+    return np.where(proper, proper_step, np.where(collinear, collinear_step, NO_BLOCK))